@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from event_arrays import EVENT_CODES, PURCHASE, sort_events
+
+MODELS = ['last_touch', 'first_touch', 'linear', 'time_decay', 'position_based']
+
+
+def pool_context():
+    """Prefer fork: the audit scripts run at import time, and spawned workers
+    would re-import (and re-run) the calling script."""
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def _credit_weights(conv, rank, length, age_seconds, half_life_seconds, n_paths):
+    """Credit share of every touch in its path, for each attribution model."""
+    last = rank == length - 1
+    first = rank == 0
+
+    decay = np.exp2(-age_seconds / half_life_seconds)
+    decay_total = np.bincount(conv, weights=decay, minlength=n_paths)
+
+    # Position-based (U-shaped): 40% first, 40% last, 20% spread over the middle
+    middle = np.maximum(length - 2, 1)
+    position = np.where(first | last, 0.4, 0.2 / middle)
+    position = np.where(length == 2, 0.5, position)
+    position = np.where(length == 1, 1.0, position)
+
+    return {
+        'last_touch': last.astype(float),
+        'first_touch': first.astype(float),
+        'linear': 1.0 / length,
+        'time_decay': decay / decay_total[conv],
+        'position_based': position,
+    }
+
+
+def _attribute_partition(args):
+    """Credit every purchase in one partition of users to the touches before it.
+
+    Returns per-ad credited purchases and revenue for each model, as arrays
+    aligned with `ads`, so partitions merge by simple addition.
+    """
+    events, ads, touch_types, lookback, half_life, order_value = args
+    n_ads = len(ads)
+    credited = {m: (np.zeros(n_ads), np.zeros(n_ads)) for m in MODELS}
+    if events.empty:
+        return credited, 0
+
+    ev = sort_events(events, ads, by_campaign=False)
+    is_purchase = ev.event_type == PURCHASE
+    is_touch = np.isin(ev.event_type, [EVENT_CODES[t] for t in touch_types]) & (ev.ad >= 0)
+
+    # Each touch belongs to the next purchase of the same user: its global
+    # purchase ordinal is the count of purchases strictly before it
+    purchases_before = np.cumsum(is_purchase) - is_purchase
+    purchase_rows = np.flatnonzero(is_purchase)
+    n_paths = len(purchase_rows)
+    conv = purchases_before
+    has_next = conv < n_paths
+    has_next[has_next] = ev.segment[purchase_rows[conv[has_next]]] == ev.segment[has_next]
+
+    rows = np.flatnonzero(is_touch & has_next)
+    conv = conv[rows]
+    age = ev.ts[purchase_rows[conv]] - ev.ts[rows]
+    in_window = age <= lookback
+    rows, conv, age = rows[in_window], conv[in_window], age[in_window]
+
+    # Touches of one path are contiguous and time-ordered after the sort
+    length_by_path = np.bincount(conv, minlength=n_paths)
+    path_start = np.concatenate(([0], np.cumsum(length_by_path)[:-1]))
+    rank = np.arange(len(rows)) - path_start[conv]
+    length = length_by_path[conv]
+
+    # Purchase value: scalar, or per-campaign AOV keyed by campaign_id
+    purchase_campaign = ev.campaign_ids[ev.campaign[purchase_rows]]
+    if np.isscalar(order_value):
+        value = np.full(n_paths, float(order_value))
+    else:
+        value = pd.Series(order_value).reindex(purchase_campaign).fillna(0).to_numpy(float)
+
+    weights = _credit_weights(conv, rank, length, age, half_life, n_paths)
+    touch_ad = ev.ad[rows]
+    for model, w in weights.items():
+        credited[model] = (
+            np.bincount(touch_ad, weights=w, minlength=n_ads),
+            np.bincount(touch_ad, weights=w * value[conv], minlength=n_ads),
+        )
+    unattributed = int(n_paths - (length_by_path > 0).sum())
+    return credited, unattributed
+
+
+def attribute(events: pd.DataFrame, ads: pd.DataFrame, order_value=1.0,
+              touch_types=('Impression', 'Click'), lookback='30D',
+              half_life='7D', n_partitions: int = 1, max_workers=None):
+    """Multi-touch attribution of purchases to the ads a user saw before buying.
+
+    A user's path for a purchase is their touches (events in `touch_types`)
+    since their previous purchase and within `lookback`. Credit is split with
+    last-touch, first-touch, linear, time-decay (exponential, `half_life`) and
+    position-based (40/20/40) models.
+
+    `order_value` is the revenue of one purchase: a number, or a mapping of
+    campaign_id -> AOV (the campaign of the purchased ad).
+
+    With n_partitions > 1 users are hash-partitioned and processed in a
+    process pool. A user's path never spans partitions, so the result is the
+    same as a single pass.
+
+    Returns (credits, unattributed_purchases): credits has one row per ad with
+    `<model>_purchases` and `<model>_revenue` columns.
+    """
+    lookback = pd.Timedelta(lookback).total_seconds()
+    half_life = pd.Timedelta(half_life).total_seconds()
+    ads = ads[['ad_id', 'campaign_id']].reset_index(drop=True)
+
+    if n_partitions > 1:
+        part = pd.util.hash_array(events['user_id'].to_numpy()) % n_partitions
+        tasks = [(events[part == p], ads, touch_types, lookback, half_life, order_value)
+                 for p in range(n_partitions)]
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=pool_context()) as pool:
+            results = list(pool.map(_attribute_partition, tasks))
+    else:
+        results = [_attribute_partition(
+            (events, ads, touch_types, lookback, half_life, order_value))]
+
+    credits = ads.copy()
+    for model in MODELS:
+        credits[f'{model}_purchases'] = sum(r[0][model][0] for r in results)
+        credits[f'{model}_revenue'] = sum(r[0][model][1] for r in results)
+    unattributed = sum(r[1] for r in results)
+    return credits, unattributed
+
+
+def campaign_credits(credits: pd.DataFrame) -> pd.DataFrame:
+    """Roll per-ad credits up to campaigns."""
+    return credits.drop(columns='ad_id').groupby('campaign_id').sum().round(2).reset_index()
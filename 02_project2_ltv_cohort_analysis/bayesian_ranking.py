@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+def beta_prior(successes, trials, groups, min_group_size: int = 3):
+    """Empirical-Bayes Beta(alpha, beta) prior per group by method of moments.
+
+    The spread of observed rates within a group, minus the spread expected
+    from binomial noise alone, gives the prior's concentration. Groups that
+    are too small (or show no excess spread) borrow the all-campaign prior.
+    Returns (alpha, beta) arrays aligned with the input rows.
+    """
+    successes = np.asarray(successes, dtype=float)
+    trials = np.asarray(trials, dtype=float)
+    has_trials = trials > 0
+    rate = np.divide(successes, trials, out=np.zeros_like(trials), where=has_trials)
+
+    def moments(frame):
+        grouped = frame.groupby('group')
+        mean = grouped['successes'].sum() / grouped['trials'].sum()
+        between = grouped['rate'].var(ddof=0)
+        noise = grouped['inv_trials'].mean() * mean * (1 - mean)
+        strength = mean * (1 - mean) / (between - noise) - 1
+        strength = strength.where((between > noise) & (grouped.size() >= min_group_size))
+        return mean, strength.clip(1, 1e6)
+
+    frame = pd.DataFrame({
+        'group': np.asarray(groups, dtype=object),
+        'successes': successes,
+        'trials': trials,
+        'rate': rate,
+        'inv_trials': np.divide(1.0, trials, out=np.zeros_like(trials), where=has_trials),
+    })[has_trials]
+    mean, strength = moments(frame)
+    global_mean, global_strength = moments(frame.assign(group='all'))
+    fallback_strength = global_strength.fillna(10.0).iloc[0] if len(global_strength) else 10.0
+    fallback_mean = global_mean.iloc[0] if len(global_mean) else 0.5
+
+    row_mean = pd.Series(groups).map(mean).fillna(fallback_mean).to_numpy(float)
+    row_strength = pd.Series(groups).map(strength).fillna(fallback_strength).to_numpy(float)
+    row_mean = np.clip(row_mean, 1e-6, 1 - 1e-6)
+    return row_mean * row_strength, (1 - row_mean) * row_strength
+
+
+def bayesian_scores(table: pd.DataFrame, group_col: str, n_samples: int = 1000,
+                    seed: int = 42) -> pd.DataFrame:
+    """Posterior P(ROAS > breakeven ROAS) and expected loss for every row at once.
+
+    `table` needs impressions, clicks, purchases, cost_per_impression,
+    avg_order_value, breakeven_roas and `group_col`. CTR and click-to-purchase
+    rate get Beta-Binomial posteriors with per-group empirical-Bayes priors,
+    and ROAS = CTR * CVR * AOV / cost per impression is sampled for all rows
+    as one (rows x n_samples) array.
+
+    expected_monthly_loss is the posterior mean profit shortfall below
+    break-even, in dollars of monthly spend.
+    """
+    rng = np.random.default_rng(seed)
+    impressions = table['impressions'].to_numpy(float)
+    clicks = np.minimum(table['clicks'].to_numpy(float), impressions)
+    purchases = np.minimum(table['purchases'].to_numpy(float), clicks)
+    groups = table[group_col].to_numpy(object)
+
+    ctr_a, ctr_b = beta_prior(clicks, impressions, groups)
+    cvr_a, cvr_b = beta_prior(purchases, clicks, groups)
+    shape = (len(table), n_samples)
+    ctr = rng.beta((ctr_a + clicks)[:, None], (ctr_b + impressions - clicks)[:, None], shape)
+    cvr = rng.beta((cvr_a + purchases)[:, None], (cvr_b + clicks - purchases)[:, None], shape)
+
+    value_per_impression = (table['avg_order_value'] / table['cost_per_impression']).to_numpy(float)
+    roas = ctr * cvr * value_per_impression[:, None]
+    breakeven = table['breakeven_roas'].to_numpy(float)[:, None]
+    shortfall = np.maximum(breakeven - roas, 0)
+
+    scores = pd.DataFrame(index=table.index)
+    scores['posterior_ctr'] = ((ctr_a + clicks) / (ctr_a + ctr_b + impressions) * 100).round(3)
+    scores['posterior_conversion_rate'] = (
+        (cvr_a + purchases) / (cvr_a + cvr_b + clicks) * 100).round(3)
+    scores['posterior_roas'] = roas.mean(axis=1).round(2)
+    scores['roas_p05'], scores['roas_p95'] = np.percentile(roas, [5, 95], axis=1).round(2)
+    scores['prob_beats_breakeven'] = (roas > breakeven).mean(axis=1).round(3)
+    scores['expected_roas_loss'] = shortfall.mean(axis=1).round(3)
+    if 'monthly_spend' in table:
+        # profit = spend * (roas / breakeven - 1), so the shortfall scales the same way
+        scores['expected_monthly_loss'] = (
+            table['monthly_spend'].to_numpy(float) * scores['expected_roas_loss']
+            / breakeven[:, 0]).round(2)
+    # Ties on probability (common for strong campaigns) break on expected loss, then ROAS
+    ranked = scores.sort_values(['prob_beats_breakeven', 'expected_roas_loss', 'posterior_roas'],
+                                ascending=[False, True, False]).index
+    scores.loc[ranked, 'bayes_rank'] = np.arange(1, len(ranked) + 1)
+    scores['bayes_rank'] = scores['bayes_rank'].astype(int)
+    return scores
+
+
+def campaign_scores(funnel: pd.DataFrame, n_samples: int = 1000, seed: int = 42) -> pd.DataFrame:
+    """Score campaigns, with priors per dominant platform (Facebook/Instagram)."""
+    table = funnel[['campaign_id', 'name', 'impressions', 'clicks', 'purchases',
+                    'monthly_spend', 'avg_order_value', 'breakeven_roas']].copy()
+    table['platform'] = np.where(
+        funnel['facebook_impressions'] >= funnel['instagram_impressions'], 'Facebook', 'Instagram')
+    monthly_impressions = funnel['impressions'] / funnel['duration_days'] * 30
+    table['cost_per_impression'] = funnel['monthly_spend'] / monthly_impressions.replace(0, np.nan)
+    table = table.dropna(subset=['cost_per_impression'])
+    return table.join(bayesian_scores(table, 'platform', n_samples, seed)).sort_values('bayes_rank')
+
+
+def ad_scores(df: pd.DataFrame, funnel: pd.DataFrame, group_col: str = 'ad_type',
+              n_samples: int = 1000, seed: int = 42) -> pd.DataFrame:
+    """Score ad creatives from the merged event frame.
+
+    An ad is charged its campaign's cost per impression, so an ad's ROAS
+    differs from its campaign's only through its own CTR and conversion rate.
+    """
+    counts = pd.crosstab(df['ad_id'], df['event_type']).reindex(
+        columns=['Impression', 'Click', 'Purchase'], fill_value=0)
+    counts.columns = ['impressions', 'clicks', 'purchases']
+    attrs = df.drop_duplicates('ad_id').set_index('ad_id')[['campaign_id', 'ad_platform', 'ad_type']]
+    table = counts.join(attrs).reset_index()
+
+    campaign = funnel.set_index('campaign_id')
+    monthly_impressions = campaign['impressions'] / campaign['duration_days'] * 30
+    cpi = campaign['monthly_spend'] / monthly_impressions.replace(0, np.nan)
+    table['cost_per_impression'] = table['campaign_id'].map(cpi)
+    table['avg_order_value'] = table['campaign_id'].map(campaign['avg_order_value'])
+    table['breakeven_roas'] = table['campaign_id'].map(campaign['breakeven_roas'])
+    table = table.dropna(subset=['cost_per_impression', 'avg_order_value'])
+    return table.join(bayesian_scores(table, group_col, n_samples, seed)).sort_values('bayes_rank')
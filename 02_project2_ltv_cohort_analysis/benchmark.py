@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import argparse
+import ast
+import contextlib
+import io
+import os
+import re
+import resource
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from generate_events import DIMENSION_FILES, generate_events
+
+HERE = Path(__file__).resolve().parent
+SECTION = re.compile(r'^# ── (.+?) ─+\s*$', re.M)
+
+# campaign_audit.py banner -> benchmark stage; other sections keep their own name
+STAGES = {
+    'FUNNEL MODE': 'setup',
+    'LOAD DATA': 'load',
+    'INVALID TRAFFIC FILTER': 'traffic filter',
+    'MERGE': 'merge',
+    'FUNNEL BY CAMPAIGN (not split by platform)': 'funnel',
+    'SEQUENTIAL FUNNEL': 'funnel',
+    'FUNNEL RATES': 'funnel',
+    'REALISTIC CAC CALCULATION': 'funnel',
+    'AOV AND CONTRIBUTION MARGIN': 'funnel',
+    'CAMPAIGN RISK CLASSIFIER': 'classification',
+    'EXPORT EXCEL REPORT': 'export',
+}
+
+
+def split_sections(source: str) -> list:
+    """(banner title, code) for each '# ── TITLE ───' section of a script.
+
+    Code is padded with blank lines so tracebacks keep the script's line
+    numbers. Everything before the first banner is returned as 'SETUP'.
+    """
+    matches = list(SECTION.finditer(source))
+    bounds = [0] + [m.start() for m in matches] + [len(source)]
+    titles = ['SETUP'] + [m.group(1).strip() for m in matches]
+    sections = []
+    for title, begin, end in zip(titles, bounds[:-1], bounds[1:]):
+        padding = '\n' * source.count('\n', 0, begin)
+        sections.append((title, padding + source[begin:end]))
+    return sections
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's peak-RSS counter (Linux only) so peaks are per stage."""
+    try:
+        Path('/proc/self/clear_refs').write_text('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> float:
+    try:
+        for line in Path('/proc/self/status').read_text().splitlines():
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_audit(script: Path, data_dir: Path, overrides: dict | None = None,
+              verbose: bool = False) -> pd.DataFrame:
+    """Execute campaign_audit.py section by section in data_dir.
+
+    Returns one row per section with wall time and peak RSS. overrides
+    (e.g. {'run_attribution': True}) are applied after the config block,
+    right before LOAD DATA. Where the peak counter cannot be reset, peak
+    RSS is the process high-water mark so far.
+    """
+    sections = split_sections(script.read_text())
+    namespace = {'__name__': '__audit__', '__file__': str(script)}
+    rows = []
+    cwd = os.getcwd()
+    sys.path.insert(0, str(script.parent))
+    os.chdir(data_dir)
+    try:
+        for title, code in sections:
+            if title == 'LOAD DATA' and overrides:
+                namespace.update(overrides)
+            per_stage = _reset_peak_rss()
+            out = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+            start = time.perf_counter()
+            with out:
+                exec(compile(code, str(script), 'exec'), namespace)
+            rows.append({
+                'section': title,
+                'stage': STAGES.get(title, 'setup' if title == 'SETUP' else title.lower()),
+                'seconds': round(time.perf_counter() - start, 3),
+                'peak_rss_mb': round(_peak_rss_mb(), 1),
+                'peak_is_per_stage': per_stage,
+            })
+    finally:
+        os.chdir(cwd)
+        sys.path.remove(str(script.parent))
+    timings = pd.DataFrame(rows)
+    timings.attrs['events'] = len(namespace.get('events', ()))
+    return timings
+
+
+def summarize(timings: pd.DataFrame) -> pd.DataFrame:
+    """Per-stage seconds and peak RSS (max over the stage's sections)."""
+    stages = timings.groupby('stage', sort=False).agg(
+        seconds=('seconds', 'sum'), peak_rss_mb=('peak_rss_mb', 'max'))
+    stages.loc['total'] = [timings['seconds'].sum(), timings['peak_rss_mb'].max()]
+    return stages.reset_index()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Time campaign_audit.py stage by stage")
+    ap.add_argument("--data_dir", default="bench_data",
+                    help="directory holding campaigns/ads/users/ad_events.csv; reports are written here")
+    ap.add_argument("--rows", type=float, nargs='*', default=[],
+                    help="generate ad_events.csv with this many rows first (one run per value)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--set", action='append', default=[], metavar='NAME=VALUE',
+                    help="override an audit config variable, e.g. --set run_attribution=True")
+    ap.add_argument("--out", default=None, help="append per-section timings to this CSV")
+    ap.add_argument("--verbose", action='store_true', help="show the audit's own output")
+    args = ap.parse_args()
+
+    overrides = {}
+    for item in args.set:
+        name, _, value = item.partition('=')
+        overrides[name.strip()] = ast.literal_eval(value.strip())
+
+    data_dir = Path(args.data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    for name in DIMENSION_FILES:
+        if not (data_dir / name).exists():
+            (data_dir / name).write_bytes((HERE / name).read_bytes())
+    dims = [pd.read_csv(data_dir / name) for name in DIMENSION_FILES]
+
+    results = []
+    for n_rows in args.rows or [None]:
+        if n_rows is not None:
+            print(f"Generating {int(n_rows):,} events (seed {args.seed})...")
+            generate_events(data_dir / 'ad_events.csv', int(n_rows), *dims,
+                            seed=args.seed, verbose=False)
+        timings = run_audit(HERE / 'campaign_audit.py', data_dir, overrides, verbose=args.verbose)
+        n_events = timings.attrs['events']
+        print(f"\n--- BENCHMARK: {n_events:,} events ---")
+        print(summarize(timings).to_string(index=False))
+        timings.insert(0, 'events', n_events)
+        results.append(timings)
+
+    if args.out:
+        out = pd.concat(results, ignore_index=True)
+        out.to_csv(args.out, mode='a', header=not Path(args.out).exists(), index=False)
+        print(f"\nTimings appended to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import heapq
+
+import numpy as np
+import pandas as pd
+
+
+def fit_response_curves(funnel: pd.DataFrame, elasticity=None,
+                        spend_col='monthly_spend', revenue_col='monthly_revenue'):
+    """Fit diminishing-returns curves revenue = scale * spend ** elasticity.
+
+    One campaign gives one (spend, revenue) point, so the elasticity is shared:
+    fitted as the slope of log revenue on log spend across campaigns (clipped
+    to 0.1-0.9 so returns always diminish) unless given. Each campaign's scale
+    then puts its curve through its own observed point.
+
+    Returns (scale, elasticity).
+    """
+    spend = funnel[spend_col].to_numpy(float)
+    revenue = funnel[revenue_col].fillna(0).to_numpy(float)
+    observed = (spend > 0) & (revenue > 0)
+
+    if elasticity is None:
+        if observed.sum() >= 3 and np.ptp(np.log(spend[observed])) > 0:
+            elasticity = np.polyfit(np.log(spend[observed]), np.log(revenue[observed]), 1)[0]
+        else:
+            elasticity = 0.5
+        elasticity = float(np.clip(elasticity, 0.1, 0.9))
+
+    scale = np.zeros(len(funnel))
+    scale[observed] = revenue[observed] / spend[observed] ** elasticity
+    return scale, elasticity
+
+
+def _spend_bounds(funnel, spend, min_share, max_share):
+    lower = funnel['min_spend'].to_numpy(float) if 'min_spend' in funnel else spend * min_share
+    upper = funnel['max_spend'].to_numpy(float) if 'max_spend' in funnel else spend * max_share
+    return lower, np.maximum(upper, lower)
+
+
+def _greedy(scale, b, cm_pct, lower, upper, remaining, n_steps, spend_all):
+    """Hand out the budget in equal steps, each to the campaign whose next step
+    adds the most contribution-margin profit (max-heap on marginal profit)."""
+    step = remaining / n_steps
+    # Plain Python floats: scalar NumPy math is slow inside the heap loop
+    active = np.flatnonzero(upper > lower)
+    alloc, scale, upper = lower.tolist(), scale.tolist(), upper.tolist()
+
+    def gain(i, s):
+        nxt = min(s + step, upper[i])
+        return cm_pct * scale[i] * (nxt ** b - s ** b) - (nxt - s), nxt
+
+    heap = []
+    for i in active.tolist():
+        g, _ = gain(i, alloc[i])
+        heap.append((-g, i))
+    heapq.heapify(heap)
+
+    while heap and remaining > step * 1e-6:
+        neg_gain, i = heap[0]
+        if -neg_gain <= 0 and not spend_all:
+            break
+        s = alloc[i]
+        nxt = min(s + step, upper[i], s + remaining)
+        remaining -= nxt - s
+        alloc[i] = nxt
+        if nxt < upper[i]:
+            heapq.heapreplace(heap, (-gain(i, nxt)[0], i))
+        else:
+            heapq.heappop(heap)
+    return np.array(alloc)
+
+
+def _lp(scale, b, cm_pct, lower, upper, remaining, n_segments, spend_all):
+    """Same allocation as an LP: each curve is cut into linear segments between
+    its min and max spend, maximize total segment profit under the budget.
+
+    With a single budget row the LP optimum is the fractional knapsack
+    solution: fill segments in order of falling profit per dollar. Solving it
+    by sort + cumsum is exact and avoids a degenerate simplex run over
+    campaigns x segments variables. Curves are concave, so within a campaign
+    the segments are filled in order, as they should be.
+    """
+    edges = lower[:, None] + (upper - lower)[:, None] * np.linspace(0, 1, n_segments + 1)
+    width = np.diff(edges, axis=1).ravel()
+    revenue = cm_pct * scale[:, None] * edges ** b
+    slope = np.divide(np.diff(revenue, axis=1).ravel(), width,
+                      out=np.zeros_like(width), where=width > 0) - 1.0
+
+    order = np.argsort(-slope, kind='stable')
+    if not spend_all:
+        order = order[slope[order] > 0]
+    filled_before = np.concatenate(([0.0], np.cumsum(width[order])[:-1]))
+    take = np.clip(remaining - filled_before, 0, width[order])
+
+    x = np.zeros_like(width)
+    x[order] = take
+    return lower + x.reshape(len(scale), n_segments).sum(axis=1)
+
+
+def optimize_budget(funnel: pd.DataFrame, cm_pct: float, total_budget=None,
+                    method='greedy', min_share=0.5, max_share=2.0,
+                    elasticity=None, n_steps=100_000, n_segments=20,
+                    spend_all=False) -> pd.DataFrame:
+    """Reallocate monthly spend across campaigns to maximize profit after ads.
+
+    Profit of a campaign at spend s is cm_pct * scale * s ** elasticity - s.
+    Every campaign stays between its min and max spend: `min_spend` /
+    `max_spend` columns if present, else min_share / max_share of today's
+    spend. `total_budget` defaults to today's total. Unless spend_all is set,
+    budget that would only lose money is left unspent.
+
+    method='greedy' allocates in n_steps increments by marginal profit;
+    method='lp' solves the piecewise-linear LP with n_segments per campaign.
+    """
+    spend = funnel['monthly_spend'].to_numpy(float)
+    scale, b = fit_response_curves(funnel, elasticity)
+    lower, upper = _spend_bounds(funnel, spend, min_share, max_share)
+
+    if total_budget is None:
+        total_budget = spend.sum()
+    remaining = total_budget - lower.sum()
+    if remaining < 0:
+        raise ValueError(
+            f"Total budget {total_budget:,.2f} is below the sum of minimum spends {lower.sum():,.2f}")
+    remaining = min(remaining, (upper - lower).sum())
+
+    if method == 'greedy':
+        alloc = _greedy(scale, b, cm_pct, lower, upper, remaining, n_steps, spend_all)
+    elif method == 'lp':
+        alloc = _lp(scale, b, cm_pct, lower, upper, remaining, n_segments, spend_all)
+    else:
+        raise ValueError(f"Unknown method {method!r}, expected 'greedy' or 'lp'")
+
+    def profit(s):
+        return cm_pct * scale * s ** b - s
+
+    plan = funnel[['campaign_id', 'name']].copy()
+    plan['current_spend'] = spend.round(2)
+    plan['recommended_spend'] = alloc.round(2)
+    plan['spend_change'] = (alloc - spend).round(2)
+    plan['current_profit'] = profit(spend).round(2)
+    plan['expected_profit'] = profit(alloc).round(2)
+    plan['expected_roas'] = np.divide(scale * alloc ** b, alloc,
+                                      out=np.zeros_like(alloc), where=alloc > 0).round(2)
+    # Marginal ROAS: revenue from the next dollar at the recommended spend
+    plan['marginal_roas'] = np.divide(b * scale * alloc ** b, alloc,
+                                      out=np.zeros_like(alloc), where=alloc > 0).round(2)
+    plan.attrs['elasticity'] = b
+    return plan
@@ -1,20 +1,95 @@
 import pandas as pd
 import numpy as np
 
+from attribution import attribute, campaign_credits
+from bayesian_ranking import ad_scores, campaign_scores
+from budget_optimizer import optimize_budget
+from campaign_calendar import daily_calendar
+from frequency_analysis import count_frequency, frequency_caps, frequency_distribution
+from interest_targeting import targeting_match, targeting_report
+from keyed_join import attach, encode_keys
+from sequential_funnel import sequential_funnel
+from traffic_filter import flag_invalid_traffic, invalid_traffic_report
+from uncertainty import classify_with_intervals, metric_intervals
+
+# ── FUNNEL MODE ────────────────────────────────────────────
+# 'independent' counts every Impression/Click/Purchase row on its own.
+# 'sequential' only counts a click if the same user saw an impression of the
+# campaign within click_window before it, and a purchase if it follows such a
+# click within purchase_window.
+funnel_mode = 'independent'
+click_window = '1D'
+purchase_window = '7D'
+
+# Invalid traffic (duplicate events, click bursts, impossibly fast
+# click-to-purchase): 'off', 'flag' (report only) or 'drop' (exclude from funnel)
+traffic_filter_mode = 'flag'
+
+# Multi-touch attribution of purchases over each user's ad path
+# (last/first touch, linear, time decay, position based)
+run_attribution = False
+attribution_partitions = 4
+
+# Poisson-bootstrap intervals on CTR, conversion rate, CAC and ROAS, and a
+# second risk classification that only labels campaigns the interval supports
+run_uncertainty = True
+bootstrap_replicates = 1000
+interval_level = 0.90
+
+# Bayesian ranking: P(ROAS > break-even) and expected loss per campaign and
+# per ad, with empirical-Bayes priors per platform (campaigns) / ad_type (ads)
+run_bayesian_ranking = True
+posterior_samples = 1000
+
+# Daily calendar from the actual start_date/end_date overlaps: spend, active
+# campaigns and events per day, for true daily CAC / ROAS
+run_calendar = True
+
+# Interest / gender / age targeting match of every event (bitset AND + popcount)
+run_targeting = True
+
+# Impressions-per-user distribution and CVR by exposure count per campaign;
+# the recommended cap is where one more impression lifts conversion by less
+# than frequency_min_lift x the single-impression rate
+run_frequency = True
+frequency_max = 30
+frequency_min_lift = 0.10
+
+# Budget reallocation: 'greedy' (marginal profit heap) or 'lp'; each campaign
+# stays between min_share and max_share of its current monthly spend
+run_budget_optimizer = True
+budget_method = 'greedy'
+budget_min_share = 0.5
+budget_max_share = 2.0
+
 # ── LOAD DATA ──────────────────────────────────────────────
 campaigns = pd.read_csv('campaigns.csv')
 ads = pd.read_csv('ads.csv')
 users = pd.read_csv('users.csv')
 events = pd.read_csv('ad_events.csv')
 
+# Factorize ad/campaign/user keys once; the traffic filter, the merge and
+# the later stages all reuse them
+keys = encode_keys(events, ads, campaigns, users)
+
+# ── INVALID TRAFFIC FILTER ─────────────────────────────────
+traffic_report = None
+if traffic_filter_mode in ('flag', 'drop'):
+    traffic_flags = flag_invalid_traffic(events, keys=keys)
+    traffic_report = invalid_traffic_report(attach(events, keys, ['campaign_id']), traffic_flags)
+    print("--- INVALID TRAFFIC ---")
+    print(traffic_flags.sum().to_string())
+    print(f"Invalid traffic share: {traffic_flags['is_invalid'].mean() * 100:.2f}%\n")
+    if traffic_filter_mode == 'drop':
+        valid = ~traffic_flags['is_invalid'].to_numpy()
+        events = events[valid].reset_index(drop=True)
+        keys = keys.subset(valid)
+
 # ── MERGE ──────────────────────────────────────────────────
-df = events.merge(ads[['ad_id', 'campaign_id', 'ad_platform', 'ad_type']],
-                  on='ad_id', how='left')
-df = df.merge(campaigns[['campaign_id', 'name', 'total_budget',
-                          'duration_days', 'start_date', 'end_date']],
-              on='campaign_id', how='left')
-df = df.merge(users[['user_id', 'user_gender', 'age_group', 'country']],
-              on='user_id', how='left')
+# Attach only the dimension columns this report uses by array take
+# (no full-frame hash merges)
+df = attach(events, keys, ['campaign_id', 'ad_platform', 'ad_type',
+                           'name', 'total_budget', 'duration_days'])
 
 print(f"Total events loaded: {len(df):,}")
 print(f"Event types:\n{df['event_type'].value_counts()}")
@@ -32,6 +107,18 @@ funnel = df.groupby(['campaign_id', 'name', 'total_budget', 'duration_days']).ag
         (x == 'Impression') & (df.loc[x.index, 'ad_platform'] == 'Instagram')).sum()),
 ).reset_index()
 
+# ── SEQUENTIAL FUNNEL ──────────────────────────────────────
+time_to_convert = None
+if funnel_mode == 'sequential':
+    sequential, time_to_convert = sequential_funnel(
+        events, ads, click_window=click_window, purchase_window=purchase_window)
+    funnel = funnel.merge(sequential.drop(columns=['impressions', 'clicks', 'purchases']),
+                          on='campaign_id', how='left')
+    print(f"\nPurchases without a qualifying click: "
+          f"{funnel['unsequenced_purchases'].sum():,} of {funnel['purchases'].sum():,}")
+    funnel['clicks'] = funnel['sequential_clicks']
+    funnel['purchases'] = funnel['sequential_purchases']
+
 # ── FUNNEL RATES ───────────────────────────────────────────
 funnel['ctr'] = (funnel['clicks'] / funnel['impressions'] * 100).round(2)
 funnel['conversion_rate'] = (funnel['purchases'] / funnel['clicks'] * 100).round(2)
@@ -87,6 +174,20 @@ def classify_campaign(row):
 
 funnel['risk_classification'] = funnel.apply(classify_campaign, axis=1)
 
+# ── UNCERTAINTY ────────────────────────────────────────────
+# Small purchase counts make point estimates noisy; classify on the interval
+intervals = None
+if run_uncertainty:
+    intervals = metric_intervals(funnel, n_replicates=bootstrap_replicates,
+                                 level=interval_level)
+    funnel['risk_classification_ci'] = classify_with_intervals(funnel, intervals)
+
+# ── BAYESIAN RANKING ───────────────────────────────────────
+campaign_ranking = ad_ranking = None
+if run_bayesian_ranking:
+    campaign_ranking = campaign_scores(funnel, n_samples=posterior_samples)
+    ad_ranking = ad_scores(df, funnel, n_samples=posterior_samples)
+
 # ── PRINT DIAGNOSTICS ──────────────────────────────────────
 print("\n--- DIAGNOSTIC: SAMPLE CAMPAIGNS ---")
 print(funnel[['name', 'total_budget', 'duration_days', 'purchases',
@@ -101,6 +202,13 @@ print(f"Average break-even CAC: ${funnel['breakeven_cac'].mean():.2f}")
 
 print("\n--- CAMPAIGN RISK CLASSIFICATION ---")
 print(funnel['risk_classification'].value_counts())
+if intervals is not None:
+    print(f"\n--- RISK CLASSIFICATION ON {interval_level:.0%} INTERVALS ---")
+    print(funnel['risk_classification_ci'].value_counts())
+if campaign_ranking is not None:
+    print("\n--- BAYESIAN RANKING: P(ROAS > BREAK-EVEN) ---")
+    print(campaign_ranking[['name', 'purchases', 'posterior_roas', 'prob_beats_breakeven',
+                            'expected_monthly_loss']].head(10).to_string())
 
 # ── DOLLAR IMPACT ──────────────────────────────────────────
 print("\n--- DOLLAR IMPACT BY CLASSIFICATION ---")
@@ -118,6 +226,79 @@ danger_monthly_spend = funnel[funnel['risk_classification'].isin(
 print(f"\nMonthly spend on dangerous campaigns: ${danger_monthly_spend:,.2f}")
 print(f"Annualized risk exposure: ${danger_monthly_spend * 12:,.2f}")
 
+# ── BUDGET REALLOCATION ────────────────────────────────────
+# Where the same monthly budget earns the most profit after ad spend
+budget_plan = None
+if run_budget_optimizer:
+    budget_plan = optimize_budget(funnel, cm_pct, method=budget_method,
+                                  min_share=budget_min_share, max_share=budget_max_share)
+    print("\n--- BUDGET REALLOCATION ---")
+    print(f"Fitted spend elasticity: {budget_plan.attrs['elasticity']:.2f}")
+    print(f"Current monthly profit: ${budget_plan['current_profit'].sum():,.2f}")
+    print(f"Expected monthly profit after reallocation: ${budget_plan['expected_profit'].sum():,.2f}")
+    print(budget_plan.sort_values('spend_change')[[
+        'name', 'current_spend', 'recommended_spend', 'spend_change']].head(10).to_string())
+
+# ── DAILY CALENDAR ─────────────────────────────────────────
+calendar = None
+if run_calendar:
+    calendar = daily_calendar(campaigns, df,
+                              order_value=funnel.set_index('campaign_id')['avg_order_value'])
+    active = calendar[calendar['active_campaigns'] > 0]
+    print("\n--- DAILY CALENDAR ---")
+    print(f"Days with active campaigns: {len(active):,}")
+    print(f"Peak concurrent campaigns: {calendar['active_campaigns'].max()}")
+    print(f"Peak daily spend: ${calendar['spend'].max():,.2f}")
+    print(f"Median daily CAC: ${active['cac'].median():,.2f}")
+    print(f"Median daily ROAS: {active['roas'].median():.2f}x")
+
+# ── TARGETING MATCH ────────────────────────────────────────
+targeting = None
+if run_targeting:
+    match = targeting_match(events, ads, users, campaigns, keys=keys)
+    targeting = targeting_report(df, match)
+    impressions_mask = df['event_type'] == 'Impression'
+    print("\n--- TARGETING MATCH ---")
+    print(f"Impressions reaching a matching interest: "
+          f"{match.loc[impressions_mask, 'interest_match'].mean() * 100:.1f}%")
+    print(f"Impressions matching gender targeting: "
+          f"{match.loc[impressions_mask, 'gender_match'].mean() * 100:.1f}%")
+    print(f"Impressions matching age targeting: "
+          f"{match.loc[impressions_mask, 'age_match'].mean() * 100:.1f}%")
+    print(targeting[0].to_string(index=False))
+
+# ── FREQUENCY & SATURATION ─────────────────────────────────
+frequency = None
+if run_frequency:
+    counter = count_frequency(events, keys, level='campaign')
+    campaign_ids = campaigns['campaign_id'].to_numpy()
+    names = funnel[['campaign_id', 'name']]
+    frequency = (
+        frequency_distribution(counter, campaign_ids).rename(columns={'group_id': 'campaign_id'}),
+        names.merge(frequency_caps(counter, campaign_ids, max_frequency=frequency_max,
+                                   min_lift=frequency_min_lift)
+                    .rename(columns={'group_id': 'campaign_id'}), on='campaign_id'),
+    )
+    caps = frequency[1]
+    print("\n--- FREQUENCY & SATURATION ---")
+    print(f"Median recommended frequency cap: {caps['recommended_cap'].median():.0f}")
+    print(f"Impressions served beyond the cap: {caps['impressions_beyond_cap'].sum():,} "
+          f"({caps['impressions_beyond_cap'].sum() / funnel['impressions'].sum() * 100:.1f}%)")
+    print(caps.sort_values('saturated_share', ascending=False).head(10).to_string(index=False))
+
+# ── MULTI-TOUCH ATTRIBUTION ────────────────────────────────
+attribution_credits = None
+if run_attribution:
+    ad_credits, unattributed = attribute(
+        events, ads,
+        order_value=funnel.set_index('campaign_id')['avg_order_value'],
+        n_partitions=attribution_partitions)
+    attribution_credits = campaign_credits(ad_credits)
+    print("\n--- MULTI-TOUCH ATTRIBUTION (credited purchases) ---")
+    print(attribution_credits[['campaign_id'] + [c for c in attribution_credits.columns
+                                                 if c.endswith('_purchases')]].head(10).to_string())
+    print(f"Purchases with no touch in the lookback window: {unattributed:,}")
+
 # ── EXPORT EXCEL REPORT ────────────────────────────────────
 total_monthly_spend = funnel['monthly_spend'].sum()
 total_monthly_revenue = funnel['monthly_revenue'].sum()
@@ -184,4 +365,50 @@ with pd.ExcelWriter('AI_Profit_Campaign_Risk_Report_v2.xlsx', engine='openpyxl')
                 'breakeven_cac', 'monthly_profit']].to_excel(
         writer, sheet_name='Profitable Campaigns', index=False)
 
+    # Tab 5: Metric intervals and interval-based classification
+    if intervals is not None:
+        intervals.merge(funnel[['campaign_id', 'name', 'purchases', 'risk_classification',
+                                'risk_classification_ci']], on='campaign_id').to_excel(
+            writer, sheet_name='Metric Intervals', index=False)
+
+    # Tab 6-7: Bayesian campaign and ad rankings
+    if campaign_ranking is not None:
+        campaign_ranking.to_excel(writer, sheet_name='Bayesian Campaign Ranking', index=False)
+        ad_ranking.to_excel(writer, sheet_name='Bayesian Ad Ranking', index=False)
+
+    # Tab 8: Recommended budget per campaign
+    if budget_plan is not None:
+        budget_plan.sort_values('spend_change').to_excel(
+            writer, sheet_name='Budget Reallocation', index=False)
+
+    # Tab 9: Daily spend, active campaigns, CAC and ROAS
+    if calendar is not None:
+        calendar.to_excel(writer, sheet_name='Daily Calendar', index=False)
+
+    # Tab 10-12: Targeting match funnels
+    if targeting is not None:
+        by_level, by_demographic, by_campaign = targeting
+        by_level.to_excel(writer, sheet_name='Interest Match Funnel', index=False)
+        by_demographic.to_excel(writer, sheet_name='Demographic Match Funnel', index=False)
+        by_campaign.to_excel(writer, sheet_name='Targeting Match By Campaign', index=False)
+
+    # Tab 13: Invalid traffic per campaign
+    if traffic_report is not None:
+        traffic_report.to_excel(writer, sheet_name='Invalid Traffic', index=False)
+
+    # Tab 14: Time-to-convert distributions (sequential mode only)
+    if time_to_convert is not None:
+        time_to_convert.to_excel(writer, sheet_name='Time To Convert', index=False)
+
+    # Tab 15: Attributed purchases and revenue per campaign
+    if attribution_credits is not None:
+        attribution_credits.to_excel(writer, sheet_name='Attribution', index=False)
+
+    # Tab 16-17: Frequency distribution and recommended caps per campaign
+    if frequency is not None:
+        frequency_dist, frequency_cap_table = frequency
+        frequency_dist.to_excel(writer, sheet_name='Frequency Distribution', index=False)
+        frequency_cap_table.sort_values('saturated_share', ascending=False).to_excel(
+            writer, sheet_name='Frequency Caps', index=False)
+
 print("\nReport exported: AI_Profit_Campaign_Risk_Report_v2.xlsx")
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from event_arrays import EVENT_CODES, to_epoch_seconds
+
+SECONDS_PER_DAY = 86400
+
+
+def _day_index(values) -> np.ndarray:
+    return to_epoch_seconds(values) // SECONDS_PER_DAY
+
+
+def daily_calendar(campaigns: pd.DataFrame, events: pd.DataFrame | None = None,
+                   order_value=2800.0) -> pd.DataFrame:
+    """Daily spend, active campaigns and (optionally) events, CAC and ROAS.
+
+    Each campaign runs from start_date up to end_date and spends its
+    total_budget evenly over those days. In campaigns.csv end_date is
+    start_date + duration_days and the events fill start_date .. end_date,
+    not end_date itself, so end_date is exclusive. Where the two columns
+    disagree end_date wins, being the actual calendar date; duration_days
+    is only used when there is no end_date column. Instead of expanding
+    every campaign into its days, the start and end of each interval are
+    written into a difference array (+budget at start, -budget at end) and
+    a cumulative sum turns that into spend per calendar day:
+    O(campaigns + days).
+
+    `events` (optional) needs timestamp and event_type; `order_value` is the
+    revenue per purchase, a number or a mapping campaign_id -> AOV (events
+    then need campaign_id).
+    """
+    start = _day_index(campaigns['start_date'])
+    if 'end_date' in campaigns:
+        end = np.maximum(_day_index(campaigns['end_date']), start)
+    else:
+        end = start + campaigns['duration_days'].to_numpy(np.int64)
+    duration = end - start
+    daily_spend = campaigns['total_budget'].to_numpy(float) / np.maximum(duration, 1)
+
+    if events is not None:
+        event_day = _day_index(events['timestamp'])
+        event_type = events['event_type'].map(EVENT_CODES).fillna(-1).to_numpy(np.int8)
+        first_day = min(start.min(), event_day.min())
+        last_day = max(end.max(), event_day.max() + 1)
+    else:
+        first_day, last_day = start.min(), end.max()
+    n_days = int(last_day - first_day)
+
+    def sweep(weights):
+        # +weight on the first active day, -weight the day after the last
+        diff = (np.bincount(start - first_day, weights=weights, minlength=n_days + 1)
+                - np.bincount(end - first_day, weights=weights, minlength=n_days + 1))
+        return np.cumsum(diff)[:n_days]
+
+    calendar = pd.DataFrame({
+        'date': pd.to_datetime(np.arange(first_day, last_day) * SECONDS_PER_DAY, unit='s'),
+        'active_campaigns': np.rint(sweep(np.ones(len(start)))).astype(int),
+        'spend': sweep(daily_spend).round(2),
+    })
+
+    if events is not None:
+        day = event_day - first_day
+        for name in ['Impression', 'Click', 'Purchase']:
+            calendar[name.lower() + 's'] = np.bincount(
+                day[event_type == EVENT_CODES[name]], minlength=n_days)
+
+        is_purchase = event_type == EVENT_CODES['Purchase']
+        if np.isscalar(order_value):
+            value = np.full(is_purchase.sum(), float(order_value))
+        else:
+            value = events['campaign_id'][is_purchase].map(pd.Series(order_value)).fillna(0).to_numpy(float)
+        calendar['revenue'] = np.bincount(day[is_purchase], weights=value, minlength=n_days).round(2)
+
+        purchases = calendar['purchases'].replace(0, np.nan)
+        calendar['cac'] = (calendar['spend'] / purchases).round(2)
+        calendar['roas'] = (calendar['revenue'] / calendar['spend'].replace(0, np.nan)).round(2)
+    return calendar
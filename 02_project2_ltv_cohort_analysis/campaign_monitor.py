@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from event_arrays import (CLICK, EVENT_CODES, EVENT_COLUMNS, IMPRESSION, PURCHASE,
+                          to_epoch_seconds)
+
+DANGER = ['Margin-Negative', 'Break-Even Risk', 'CAC Danger']
+
+
+def classify(purchases, roas, cac, breakeven_roas, breakeven_cac) -> np.ndarray:
+    """classify_campaign from campaign_audit.py, over arrays of campaigns."""
+    conditions = [
+        purchases == 0,
+        roas < breakeven_roas * 0.85,
+        roas < breakeven_roas,
+        cac > breakeven_cac * 1.2,
+    ]
+    labels = ['No Conversions', 'Margin-Negative', 'Break-Even Risk', 'CAC Danger']
+    return np.select(conditions, labels, default='Profitable').astype(object)
+
+
+class CampaignMonitor:
+    """Incremental per-campaign funnel counters with risk re-evaluation.
+
+    Each ingested batch is added to the counters with one bincount per event
+    type, and only campaigns whose counters moved are re-classified. Purchases
+    are extrapolated to a 30-day month over the days elapsed since the
+    campaign started (not its full duration, which the batch audit uses).
+    """
+
+    def __init__(self, campaigns: pd.DataFrame, ads: pd.DataFrame, cm_pct: float = 0.30,
+                 avg_order_value=2800.0, on_alert=None):
+        self.campaigns = campaigns.reset_index(drop=True)
+        n = len(self.campaigns)
+        self.ad_index = pd.Index(ads['ad_id'])
+        self.ad_campaign = pd.Index(self.campaigns['campaign_id']).get_indexer(ads['campaign_id'])
+
+        self.counts = np.zeros((3, n), dtype=np.int64)  # impressions, clicks, purchases
+        self.start = to_epoch_seconds(self.campaigns['start_date'])
+        self.duration = self.campaigns['duration_days'].to_numpy(float)
+        self.last_seen = self.start.copy()
+        self.monthly_spend = self.campaigns['total_budget'].to_numpy(float) / self.duration * 30
+
+        if np.isscalar(avg_order_value):
+            self.aov = np.full(n, float(avg_order_value))
+        else:
+            self.aov = pd.Series(avg_order_value).reindex(
+                self.campaigns['campaign_id']).to_numpy(float)
+        self.breakeven_roas = round(1 / cm_pct, 2)
+        self.breakeven_cac = self.aov * cm_pct
+
+        self.status = np.full(n, 'No Conversions', dtype=object)
+        self.on_alert = on_alert or print_alert
+        self.events_seen = 0
+        self.rows_skipped = 0
+
+    def metrics(self, idx: np.ndarray) -> dict:
+        """Derived ROAS / CAC for the campaigns at positions idx."""
+        elapsed_days = np.clip((self.last_seen[idx] - self.start[idx]) / 86400, 1, self.duration[idx])
+        monthly_purchases = self.counts[2, idx] / elapsed_days * 30
+        monthly_spend = self.monthly_spend[idx]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {
+                'purchases': self.counts[2, idx],
+                'roas': monthly_purchases * self.aov[idx] / monthly_spend,
+                'cac': np.where(monthly_purchases > 0, monthly_spend / monthly_purchases, np.inf),
+            }
+
+    def ingest(self, batch: pd.DataFrame) -> list:
+        """Add a batch of events and return the alerts it triggered.
+
+        Rows with an unknown ad or event type or an unparseable timestamp are
+        skipped (counted in rows_skipped).
+        """
+        if batch.empty:
+            return []
+        ad_pos = self.ad_index.get_indexer(batch['ad_id'])
+        campaign = np.where(ad_pos >= 0, self.ad_campaign[np.maximum(ad_pos, 0)], -1)
+        event_type = batch['event_type'].map(EVENT_CODES).fillna(-1).to_numpy(np.int8)
+        ts = pd.to_datetime(batch['timestamp'], errors='coerce')
+        known = (campaign >= 0) & (event_type >= 0) & ts.notna().to_numpy()
+        self.rows_skipped += int((~known).sum())
+        campaign, event_type = campaign[known], event_type[known]
+        ts = to_epoch_seconds(ts[known])
+        if not len(campaign):
+            return []
+
+        n = len(self.campaigns)
+        for code in (IMPRESSION, CLICK, PURCHASE):
+            self.counts[code] += np.bincount(campaign[event_type == code], minlength=n)
+        np.maximum.at(self.last_seen, campaign, ts)
+        self.events_seen += int(known.sum())
+
+        changed = np.unique(campaign)
+        m = self.metrics(changed)
+        new_status = classify(m['purchases'], m['roas'], m['cac'],
+                              self.breakeven_roas, self.breakeven_cac[changed])
+        flipped = new_status != self.status[changed]
+
+        alerts = []
+        for j in np.flatnonzero(flipped):
+            pos = changed[j]
+            alerts.append({
+                'campaign_id': self.campaigns.at[pos, 'campaign_id'],
+                'name': self.campaigns.at[pos, 'name'],
+                'previous': self.status[pos],
+                'current': new_status[j],
+                'roas': round(float(m['roas'][j]), 2),
+                'cac': round(float(m['cac'][j]), 2),
+                'as_of': pd.Timestamp(int(self.last_seen[pos]), unit='s'),
+            })
+        self.status[changed] = new_status
+        for alert in alerts:
+            if alert['current'] in DANGER or alert['previous'] in DANGER:
+                self.on_alert(alert)
+        return alerts
+
+    def snapshot(self) -> pd.DataFrame:
+        """Current counters, derived metrics and classification per campaign."""
+        idx = np.arange(len(self.campaigns))
+        m = self.metrics(idx)
+        out = self.campaigns[['campaign_id', 'name']].copy()
+        out['impressions'], out['clicks'], out['purchases'] = self.counts
+        out['roas'] = np.round(m['roas'], 2)
+        out['cac'] = np.round(m['cac'], 2)
+        out['risk_classification'] = self.status
+        return out
+
+
+def print_alert(alert: dict) -> None:
+    print(f"[{alert['as_of']}] {alert['name']}: {alert['previous']} -> {alert['current']} "
+          f"(ROAS {alert['roas']:.2f}x, CAC ${alert['cac']:,.2f})")
+
+
+# ── EVENT SOURCES ──────────────────────────────────────────
+
+async def tail_csv_files(directory: Path, queue: asyncio.Queue, pattern: str = '*.csv',
+                         poll_seconds: float = 1.0, closed_seconds: float = 300.0) -> None:
+    """Follow every CSV in `directory` (new files and appended rows) into the queue.
+
+    Only complete lines are consumed: a partially written last line waits
+    until its newline arrives. A file not modified for closed_seconds counts
+    as closed, and its last line is then read even without a newline.
+    """
+    offsets: dict[Path, int] = {}
+    headers: dict[Path, str] = {}
+
+    def read_new(path: Path):
+        stat = path.stat()
+        with open(path, 'rb') as f:
+            f.seek(offsets.get(path, 0))
+            chunk = f.read()
+        # Closed: idle long enough, and nothing appended since the stat
+        closed = (time.time() - stat.st_mtime > closed_seconds
+                  and offsets.get(path, 0) + len(chunk) == stat.st_size)
+        end = len(chunk) if closed else chunk.rfind(b'\n') + 1
+        if end == 0:
+            return None
+        offsets[path] = offsets.get(path, 0) + end
+        text = chunk[:end].decode()
+        if path not in headers:
+            header, _, text = text.partition('\n')
+            headers[path] = header
+        if not text:
+            return None
+        return pd.read_csv(io.StringIO(headers[path] + '\n' + text), on_bad_lines='skip')
+
+    while True:
+        for path in sorted(directory.glob(pattern)):
+            batch = await asyncio.to_thread(read_new, path)
+            if batch is not None:
+                await queue.put(batch)
+        await asyncio.sleep(poll_seconds)
+
+
+async def serve_socket(host: str, port: int, queue: asyncio.Queue, read_bytes: int = 1 << 20):
+    """Accept CSV event lines (EVENT_COLUMNS order, no header) over TCP.
+
+    The stream is read in large chunks and every complete line received so
+    far is parsed as one batch, so parsing cost is per chunk, not per event.
+    A trailing partial line waits for its newline, or for the connection to
+    close.
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        pending = b''
+        while True:
+            chunk = await reader.read(read_bytes)
+            closed = chunk == b''
+            pending += chunk
+            end = len(pending) if closed else pending.rfind(b'\n') + 1
+            if end > 0 and pending[:end].strip():
+                data, pending = pending[:end].decode(), pending[end:]
+                await queue.put(pd.read_csv(io.StringIO(data), names=EVENT_COLUMNS,
+                                             on_bad_lines='skip'))
+            if closed:
+                break
+        writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def run_monitor(monitor: CampaignMonitor, queue: asyncio.Queue) -> None:
+    """Consume event batches from the queue forever.
+
+    A batch that fails is reported and skipped; the monitor keeps running.
+    """
+    while True:
+        batch = await queue.get()
+        try:
+            monitor.ingest(batch)
+        except Exception as exc:
+            print(f"Skipped a batch of {len(batch):,} events: {exc!r}")
+        finally:
+            queue.task_done()
+
+
+async def main_async(args) -> None:
+    campaigns = pd.read_csv(args.campaigns)
+    ads = pd.read_csv(args.ads)
+    monitor = CampaignMonitor(campaigns, ads, cm_pct=args.cm_pct,
+                              avg_order_value=args.avg_order_value)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+
+    tasks = [asyncio.create_task(run_monitor(monitor, queue))]
+    if args.watch_dir:
+        tasks.append(asyncio.create_task(tail_csv_files(Path(args.watch_dir), queue)))
+    if args.port:
+        server = await serve_socket(args.host, args.port, queue)
+        tasks.append(asyncio.create_task(server.serve_forever()))
+        print(f"Listening for events on {args.host}:{args.port}")
+    await asyncio.gather(*tasks)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Real-time campaign risk monitor")
+    ap.add_argument("--campaigns", default="campaigns.csv")
+    ap.add_argument("--ads", default="ads.csv")
+    ap.add_argument("--watch_dir", default=None, help="directory of event CSVs to follow")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=None, help="TCP port for CSV event lines")
+    ap.add_argument("--cm_pct", type=float, default=0.30)
+    ap.add_argument("--avg_order_value", type=float, default=2800.0)
+    args = ap.parse_args()
+    if not args.watch_dir and not args.port:
+        raise SystemExit("Nothing to monitor: pass --watch_dir and/or --port")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
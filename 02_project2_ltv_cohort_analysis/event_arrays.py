@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Column order of ad_events.csv (and of header-less CSV event streams)
+EVENT_COLUMNS = ['event_id', 'ad_id', 'user_id', 'timestamp', 'day_of_week',
+                 'time_of_day', 'event_type']
+
+# Event types as small integers so we never compare strings per row
+EVENT_CODES = {'Impression': 0, 'Click': 1, 'Purchase': 2}
+IMPRESSION, CLICK, PURCHASE = 0, 1, 2
+
+
+@dataclass
+class SortedEvents:
+    """Ad events as parallel NumPy arrays sorted by (user, campaign, timestamp).
+
+    `segment` numbers each contiguous (user, campaign) run, so per-user work
+    becomes array operations over segments instead of a Python loop per user.
+    """
+    user: np.ndarray
+    campaign: np.ndarray
+    ad: np.ndarray
+    ts: np.ndarray
+    event_type: np.ndarray
+    segment: np.ndarray
+    order: np.ndarray
+    campaign_ids: np.ndarray
+    user_ids: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+
+def to_epoch_seconds(values) -> np.ndarray:
+    """Parse timestamps into int64 seconds since epoch."""
+    return pd.to_datetime(values).to_numpy().astype('datetime64[s]').astype(np.int64)
+
+
+def sort_events(events: pd.DataFrame, ads: pd.DataFrame,
+                by_campaign: bool = True) -> SortedEvents:
+    """Encode events once and sort them by user (and campaign) and timestamp.
+
+    Campaign comes from the ad the event belongs to. Ties on the same second
+    are broken Impression -> Click -> Purchase so a funnel logged within one
+    second still reads in the right order.
+    """
+    ad_pos = pd.Index(ads['ad_id']).get_indexer(events['ad_id'])
+    ad_campaign = ads['campaign_id'].to_numpy()
+    campaign_raw = np.where(ad_pos >= 0, ad_campaign[np.maximum(ad_pos, 0)], -1)
+    campaign, campaign_ids = pd.factorize(campaign_raw, sort=True)
+    user, user_ids = pd.factorize(events['user_id'])
+    ts = to_epoch_seconds(events['timestamp'])
+    event_type = events['event_type'].map(EVENT_CODES).fillna(-1).to_numpy(np.int8)
+
+    keys = [event_type, ts] + ([campaign] if by_campaign else []) + [user]
+    order = np.lexsort(keys)
+
+    user = user[order].astype(np.int32)
+    campaign = campaign[order].astype(np.int32)
+    new_segment = np.empty(len(order), dtype=bool)
+    new_segment[:1] = True
+    new_segment[1:] = user[1:] != user[:-1]
+    if by_campaign:
+        new_segment[1:] |= campaign[1:] != campaign[:-1]
+
+    return SortedEvents(
+        user=user,
+        campaign=campaign,
+        ad=ad_pos[order].astype(np.int32),
+        ts=ts[order],
+        event_type=event_type[order],
+        segment=np.cumsum(new_segment) - 1,
+        order=order,
+        campaign_ids=np.asarray(campaign_ids),
+        user_ids=np.asarray(user_ids),
+    )
+
+
+def last_index_where(mask: np.ndarray, segment: np.ndarray,
+                     inclusive: bool = True) -> np.ndarray:
+    """For every row, position of the latest row in the same segment where `mask`
+    is True (forward fill of positions). Rows with no such row get -1.
+
+    With inclusive=False the row itself is not considered, only earlier rows.
+    """
+    n = len(mask)
+    positions = np.where(mask, np.arange(n), -1)
+    last = np.maximum.accumulate(positions) if n else positions
+    if not inclusive:
+        last = np.concatenate(([-1], last[:-1]))
+    found = last >= 0
+    found[found] = segment[last[found]] == segment[found]
+    return np.where(found, last, -1)
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from event_arrays import EVENT_CODES
+
+FREQUENCY_BUCKETS = [1, 2, 3, 4, 6, 11, 21]
+FREQUENCY_LABELS = ['1', '2', '3', '4-5', '6-10', '11-20', '21+']
+
+
+class FrequencyCounter:
+    """Streaming impressions / clicks / purchases per (group, user) pair.
+
+    A group is a campaign or an ad, as integer codes. Pairs are encoded as
+    group * n_users + user and counted with bincount. Small grids keep dense
+    arrays; large ones keep sorted pair keys and merge each chunk in, so the
+    counter can be fed the full event history chunk by chunk.
+    """
+
+    def __init__(self, n_groups: int, n_users: int, dense_limit: int = 5_000_000):
+        self.n_groups, self.n_users = n_groups, n_users
+        self.dense = n_groups * n_users <= dense_limit
+        if self.dense:
+            self.counts = np.zeros((3, n_groups * n_users), dtype=np.int32)
+        else:
+            self.keys = np.zeros(0, dtype=np.int64)
+            self.counts = np.zeros((3, 0), dtype=np.int32)
+
+    def update(self, group: np.ndarray, user: np.ndarray, event_type: np.ndarray) -> None:
+        known = (group >= 0) & (user >= 0) & (event_type >= 0)
+        pair = group[known].astype(np.int64) * self.n_users + user[known]
+        event_type = event_type[known]
+        if self.dense:
+            for code in range(3):
+                self.counts[code] += np.bincount(
+                    pair[event_type == code], minlength=self.counts.shape[1]).astype(np.int32)
+            return
+        keys, inverse = np.unique(np.concatenate([self.keys, pair]), return_inverse=True)
+        merged = np.zeros((3, len(keys)), dtype=np.int32)
+        old = inverse[:len(self.keys)]
+        new = inverse[len(self.keys):]
+        for code in range(3):
+            merged[code] = np.bincount(old, weights=self.counts[code], minlength=len(keys))
+            merged[code] += np.bincount(new[event_type == code], minlength=len(keys)).astype(np.int32)
+        self.keys, self.counts = keys, merged
+
+    def pairs(self) -> tuple:
+        """(group, impressions, clicks, purchases) for every reached pair."""
+        if self.dense:
+            keys = np.flatnonzero(self.counts[0])
+            counts = self.counts[:, keys]
+        else:
+            reached = self.counts[0] > 0
+            keys, counts = self.keys[reached], self.counts[:, reached]
+        return keys // self.n_users, counts[0], counts[1], counts[2]
+
+
+def frequency_distribution(counter: FrequencyCounter, group_ids) -> pd.DataFrame:
+    """Users reached per frequency bucket, plus reach and mean frequency per group."""
+    group, impressions, _, purchases = counter.pairs()
+    bucket = np.searchsorted(FREQUENCY_BUCKETS, impressions, side='right') - 1
+    nb = len(FREQUENCY_LABELS)
+    users = np.bincount(group * nb + bucket, minlength=counter.n_groups * nb)
+    converters = np.bincount(group * nb + bucket, weights=purchases > 0,
+                             minlength=counter.n_groups * nb)
+
+    out = pd.DataFrame({
+        'group_id': np.repeat(np.asarray(group_ids), nb),
+        'frequency': np.tile(FREQUENCY_LABELS, counter.n_groups),
+        'users': users,
+        'converters': converters.astype(int),
+    })
+    out['conversion_rate'] = (out['converters'] / out['users'].replace(0, np.nan) * 100).round(2)
+    reach = np.bincount(group, minlength=counter.n_groups)
+    total = np.bincount(group, weights=impressions, minlength=counter.n_groups)
+    out['reach'] = np.repeat(reach, nb)
+    out['mean_frequency'] = np.repeat(np.round(total / np.maximum(reach, 1), 2), nb)
+    return out
+
+
+def frequency_caps(counter: FrequencyCounter, group_ids, max_frequency: int = 30,
+                   min_lift: float = 0.10) -> pd.DataFrame:
+    """Recommended frequency cap per group from conversion rate by exposure count.
+
+    Conversion rate at exactly f impressions is made monotone (running max),
+    and the cap is the first f where one more impression adds less than
+    min_lift x the single-impression conversion rate. Impressions served
+    beyond the cap are reported as saturated.
+    """
+    group, impressions, _, purchases = counter.pairs()
+    f = np.minimum(impressions, max_frequency)
+    cells = counter.n_groups * (max_frequency + 1)
+    users = np.bincount(group * (max_frequency + 1) + f, minlength=cells)
+    conv = np.bincount(group * (max_frequency + 1) + f, weights=purchases > 0, minlength=cells)
+    users = users.reshape(counter.n_groups, -1)[:, 1:]
+    conv = conv.reshape(counter.n_groups, -1)[:, 1:]
+
+    rate = np.divide(conv, users, out=np.zeros_like(conv), where=users > 0)
+    rate = np.maximum.accumulate(rate, axis=1)
+    lift = np.diff(rate, axis=1)
+    small = lift < min_lift * np.maximum(rate[:, :1], 1e-12)
+    cap = np.where(small.any(axis=1), small.argmax(axis=1) + 1, max_frequency)
+
+    wasted = np.bincount(group, weights=np.maximum(impressions - cap[group], 0),
+                         minlength=counter.n_groups)
+    served = np.bincount(group, weights=impressions, minlength=counter.n_groups)
+    return pd.DataFrame({
+        'group_id': np.asarray(group_ids),
+        'recommended_cap': cap,
+        'conversion_rate_at_1': (rate[:, 0] * 100).round(2),
+        'conversion_rate_at_cap': (rate[np.arange(len(cap)), cap - 1] * 100).round(2),
+        'impressions_beyond_cap': wasted.astype(int),
+        'saturated_share': (wasted / np.maximum(served, 1) * 100).round(2),
+    })
+
+
+def count_frequency(events: pd.DataFrame, keys, level: str = 'campaign',
+                    chunk_rows: int = 5_000_000) -> FrequencyCounter:
+    """Feed an event frame through a FrequencyCounter in chunks.
+
+    `keys` are keyed_join.EventKeys for the events; level is 'campaign' or 'ad'.
+    """
+    group = keys.campaign if level == 'campaign' else keys.ad
+    n_groups = len(keys.dims['campaigns'] if level == 'campaign' else keys.dims['ads'])
+    counter = FrequencyCounter(n_groups, len(keys.dims['users']))
+    event_type = events['event_type'].map(EVENT_CODES).fillna(-1).to_numpy(np.int8)
+    user = keys.user
+    for start in range(0, len(events), chunk_rows):
+        stop = start + chunk_rows
+        counter.update(group[start:stop], user[start:stop], event_type[start:stop])
+    return counter
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import argparse
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from event_arrays import EVENT_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # optional: ~5x faster CSV writing
+    pa = None
+
+DIMENSION_FILES = ['campaigns.csv', 'ads.csv', 'users.csv']
+DAY_NAMES = np.array(['Thursday', 'Friday', 'Saturday', 'Sunday', 'Monday', 'Tuesday', 'Wednesday'])
+# hour of day -> time_of_day label
+TIME_OF_DAY = np.array(['Night'] * 6 + ['Morning'] * 6 + ['Afternoon'] * 6 + ['Evening'] * 6)
+EVENT_TYPES = np.array(['Impression', 'Click', 'Purchase'])
+
+
+class EventModel:
+    """Per-ad rates and flight windows drawn once from the dimension tables.
+
+    CTR varies by ad (log-normal around base_ctr) and click-to-purchase
+    conversion by campaign, so the audit sees a spread of profitable and
+    dangerous campaigns. Every event falls inside its campaign's
+    start_date .. start_date + duration_days.
+    """
+
+    def __init__(self, campaigns: pd.DataFrame, ads: pd.DataFrame, users: pd.DataFrame,
+                 seed: int = 42, base_ctr: float = 0.08, base_cvr: float = 0.25):
+        rng = np.random.default_rng([seed, 0])
+        campaign_pos = pd.Index(campaigns['campaign_id']).get_indexer(ads['campaign_id'])
+        # Ads pointing at unknown campaigns have no flight window and are skipped
+        ads = ads[campaign_pos >= 0]
+        campaign_pos = campaign_pos[campaign_pos >= 0]
+
+        self.ad_ids = ads['ad_id'].to_numpy()
+        self.user_ids = users['user_id'].to_numpy()
+        start = pd.to_datetime(campaigns['start_date']).to_numpy('datetime64[s]').astype(np.int64)
+        duration = campaigns['duration_days'].to_numpy(np.int64) * 86400
+        self.ad_start = start[campaign_pos]
+        self.ad_span = np.maximum(duration[campaign_pos], 1)
+
+        self.ad_ctr = np.clip(base_ctr * rng.lognormal(0, 0.35, len(ads)), 0.001, 0.5)
+        campaign_cvr = np.clip(base_cvr * rng.lognormal(0, 0.5, len(campaigns)), 0.005, 0.9)
+        self.ad_cvr = campaign_cvr[campaign_pos]
+        # Heavier budgets buy proportionally more impressions
+        weight = campaigns['total_budget'].to_numpy(float)[campaign_pos] / ads.groupby(
+            'campaign_id')['ad_id'].transform('size').to_numpy()
+        self.ad_weight = weight / weight.sum()
+
+    def chunk(self, rng: np.random.Generator, n_impressions: int) -> dict:
+        """Impressions plus the clicks and purchases they lead to, as time-ordered codes."""
+        ad = rng.choice(len(self.ad_ids), n_impressions, p=self.ad_weight)
+        user = rng.integers(0, len(self.user_ids), n_impressions)
+        ts = self.ad_start[ad] + (rng.random(n_impressions) * self.ad_span[ad]).astype(np.int64)
+
+        clicked = np.flatnonzero(rng.random(n_impressions) < self.ad_ctr[ad])
+        click_ts = ts[clicked] + rng.exponential(600, len(clicked)).astype(np.int64) + 1
+        bought = clicked[rng.random(len(clicked)) < self.ad_cvr[ad[clicked]]]
+        purchase_ts = (click_ts[np.searchsorted(clicked, bought)]
+                       + rng.exponential(86400, len(bought)).astype(np.int64) + 1)
+
+        ad = np.concatenate([ad, ad[clicked], ad[bought]])
+        user = np.concatenate([user, user[clicked], user[bought]])
+        ts = np.concatenate([ts, click_ts, purchase_ts])
+        event_type = np.repeat(np.array([0, 1, 2], dtype=np.int8),
+                               [n_impressions, len(clicked), len(bought)])
+        order = np.argsort(ts, kind='stable')
+        return {
+            'ad': ad[order],
+            'user': user[order],
+            'ts': ts[order],
+            'event_type': event_type[order],
+        }
+
+
+def _write_chunk(f, model: EventModel, chunk: dict, first_id: int) -> None:
+    """Append one chunk as CSV rows (pyarrow's writer when installed, else pandas)."""
+    ts = chunk['ts']
+    columns = {
+        'event_id': np.arange(first_id, first_id + len(ts)),
+        'ad_id': model.ad_ids[chunk['ad']],
+        'user_id': (chunk['user'], model.user_ids),
+        'timestamp': ts.astype('datetime64[s]'),
+        'day_of_week': (((ts // 86400) % 7).astype(np.int8), DAY_NAMES),
+        'time_of_day': (((ts // 3600) % 24).astype(np.int8), TIME_OF_DAY),
+        'event_type': (chunk['event_type'], EVENT_TYPES),
+    }
+    if pa is None:
+        frame = pd.DataFrame({name: values[1][values[0]] if isinstance(values, tuple) else values
+                              for name, values in columns.items()})
+        frame.to_csv(f, header=False, index=False)
+        return
+    # String columns stay dictionary-encoded (codes + small dictionary) until written
+    table = pa.table({
+        name: pa.DictionaryArray.from_arrays(values[0], pa.array(values[1].astype(str)))
+        if isinstance(values, tuple) else pa.array(values)
+        for name, values in columns.items()
+    })
+    pa_csv.write_csv(table, f, pa_csv.WriteOptions(include_header=False,
+                                                          quoting_style='none'))
+
+
+def generate_events(out_path, n_rows: int, campaigns: pd.DataFrame, ads: pd.DataFrame,
+                    users: pd.DataFrame, seed: int = 42, chunk_rows: int = 2_000_000,
+                    verbose: bool = True) -> int:
+    """Write n_rows synthetic ad events to out_path, chunk by chunk.
+
+    Chunk i draws from default_rng([seed, i + 1]), so a given (seed,
+    chunk_rows) always produces the same file, and memory stays at one
+    chunk regardless of n_rows. Events are time-ordered within a chunk and
+    every chunk spans all campaign flights. The last chunk is sized to the
+    rows still needed (with a small margin) and thinned uniformly at random
+    to the exact count, so the file covers every campaign's dates.
+    """
+    model = EventModel(campaigns, ads, users, seed=seed)
+    # Clicks and purchases ride on top of impressions; size chunks so the
+    # expected row count per chunk is about chunk_rows
+    events_per_impression = 1 + model.ad_ctr.mean() * (1 + model.ad_cvr.mean())
+    written, i = 0, 0
+    start = time.perf_counter()
+    with open(out_path, 'wb') as f:
+        f.write((','.join(EVENT_COLUMNS) + '\n').encode())
+        while written < n_rows:
+            rng = np.random.default_rng([seed, i + 1])
+            wanted = min(chunk_rows, int((n_rows - written) * 1.05) + 100)
+            chunk = model.chunk(rng, int(wanted / events_per_impression) + 1)
+            if len(chunk['ts']) > n_rows - written:
+                keep = np.sort(rng.choice(len(chunk['ts']), n_rows - written, replace=False))
+                chunk = {name: values[keep] for name, values in chunk.items()}
+            _write_chunk(f, model, chunk, written + 1)
+            written += len(chunk['ts'])
+            i += 1
+            if verbose:
+                rate = written / (time.perf_counter() - start)
+                print(f"  {written:,} / {n_rows:,} rows ({rate:,.0f} rows/s)")
+    return written
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Seeded synthetic ad_events.csv generator")
+    ap.add_argument("--rows", type=float, default=1e6, help="number of event rows (1e6 .. 1e9)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--chunk_rows", type=int, default=2_000_000)
+    ap.add_argument("--data_dir", default=".", help="directory with campaigns/ads/users.csv")
+    ap.add_argument("--out_dir", default=".", help="ad_events.csv is written here")
+    args = ap.parse_args()
+
+    data_dir, out_dir = Path(args.data_dir), Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # The audit reads all four files from one directory
+    for name in DIMENSION_FILES:
+        if not (out_dir / name).exists():
+            shutil.copy(data_dir / name, out_dir / name)
+
+    n = generate_events(out_dir / 'ad_events.csv', int(args.rows),
+                        pd.read_csv(data_dir / 'campaigns.csv'), pd.read_csv(data_dir / 'ads.csv'),
+                        pd.read_csv(data_dir / 'users.csv'), seed=args.seed,
+                        chunk_rows=args.chunk_rows)
+    print(f"Wrote {n:,} events to {out_dir / 'ad_events.csv'}")
+
+
+if __name__ == "__main__":
+    main()
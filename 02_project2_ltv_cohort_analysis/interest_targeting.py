@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from event_arrays import EVENT_CODES
+from keyed_join import encode_keys
+
+# Byte popcount table for NumPy builds without np.bitwise_count (< 2.0)
+_POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Set bits per row of a (rows x words) uint64 array."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int64)
+    as_bytes = np.ascontiguousarray(words).view(np.uint8).reshape(len(words), -1)
+    return _POPCOUNT8[as_bytes].sum(axis=1, dtype=np.int64)
+
+
+def _tokens(values: pd.Series) -> pd.Series:
+    """'art, technology' -> one row per interest, indexed by source row position."""
+    exploded = pd.Series(values.fillna('').to_numpy()).str.split(',').explode().str.strip()
+    return exploded[exploded != '']
+
+
+class InterestVocabulary:
+    """Maps interest names to bit positions; encodes comma-separated lists as bitsets.
+
+    String splitting happens once per ads/users row, never per event. Each
+    row becomes `n_words` uint64 words, so any vocabulary size works.
+    """
+
+    def __init__(self, interests):
+        self.interests = sorted(set(interests))
+        self.index = pd.Index(self.interests)
+        self.n_words = max(1, (len(self.interests) + 63) // 64)
+
+    @classmethod
+    def fit(cls, *columns: pd.Series) -> InterestVocabulary:
+        return cls(pd.concat([_tokens(col) for col in columns]).unique())
+
+    def encode(self, values: pd.Series) -> np.ndarray:
+        tokens = _tokens(values)
+        bit = self.index.get_indexer(tokens.to_numpy())
+        known = bit >= 0
+        rows, bit = tokens.index.to_numpy()[known], bit[known]
+        bits = np.zeros((len(values), self.n_words), dtype=np.uint64)
+        np.bitwise_or.at(bits, (rows, bit // 64), np.left_shift(np.uint64(1), (bit % 64).astype(np.uint64)))
+        return bits
+
+
+def targeting_match(events: pd.DataFrame, ads: pd.DataFrame, users: pd.DataFrame,
+                    campaigns: pd.DataFrame, keys=None) -> pd.DataFrame:
+    """Per-event interest overlap and gender / age-group targeting match.
+
+    Returns a frame aligned with `events` with interest_overlap (number of
+    shared interests, -1 when the ad or user is unknown), interest_match,
+    gender_match and age_match. All per-event work is array takes, a bitwise
+    AND and a popcount.
+    """
+    if keys is None:
+        keys = encode_keys(events, ads, campaigns, users)
+    ad, user = keys.ad, keys.user
+    known = (ad >= 0) & (user >= 0)
+    ad_k, user_k = np.maximum(ad, 0), np.maximum(user, 0)
+
+    vocab = InterestVocabulary.fit(ads['target_interests'], users['interests'])
+    ad_bits = vocab.encode(ads['target_interests'])
+    user_bits = vocab.encode(users['interests'])
+    overlap = popcount(ad_bits[ad_k] & user_bits[user_k])
+
+    # 'All' targets everyone; otherwise compare on shared integer codes
+    def attribute_match(target_col, user_col):
+        codes, _ = pd.factorize(pd.concat([ads[target_col], users[user_col]], ignore_index=True))
+        target, actual = codes[:len(ads)], codes[len(ads):]
+        targets_all = (ads[target_col] == 'All').to_numpy()
+        return (targets_all[ad_k] | (target[ad_k] == actual[user_k])) & known
+
+    return pd.DataFrame({
+        'interest_overlap': np.where(known, overlap, -1),
+        'interest_match': (overlap > 0) & known,
+        'gender_match': attribute_match('target_gender', 'user_gender'),
+        'age_match': attribute_match('target_age_group', 'age_group'),
+    }, index=events.index)
+
+
+def _funnel_by(codes: np.ndarray, event_type: np.ndarray, n: int) -> pd.DataFrame:
+    out = pd.DataFrame({
+        name.lower() + 's': np.bincount(codes[event_type == EVENT_CODES[name]], minlength=n)
+        for name in ['Impression', 'Click', 'Purchase']
+    })
+    out['ctr'] = (out['clicks'] / out['impressions'] * 100).round(2)
+    out['conversion_rate'] = (out['purchases'] / out['clicks'] * 100).round(2)
+    out['purchase_rate'] = (out['purchases'] / out['impressions'] * 100).round(4)
+    return out
+
+
+def targeting_report(events: pd.DataFrame, match: pd.DataFrame, max_level: int = 3):
+    """Funnel metrics per interest match level and per gender/age match.
+
+    Returns (by_level, by_demographic, by_campaign). Levels above max_level
+    are pooled as 'N+'; events is expected to carry campaign_id.
+    """
+    event_type = events['event_type'].map(EVENT_CODES).fillna(-1).to_numpy(np.int8)
+    known = match['interest_overlap'].to_numpy() >= 0
+    event_type = np.where(known, event_type, -1)
+
+    level = np.minimum(np.maximum(match['interest_overlap'].to_numpy(), 0), max_level)
+    by_level = _funnel_by(level, event_type, max_level + 1)
+    by_level.insert(0, 'shared_interests',
+                    [str(i) for i in range(max_level)] + [f'{max_level}+'])
+
+    demo = match['gender_match'].to_numpy().astype(int) * 2 + match['age_match'].to_numpy()
+    by_demo = _funnel_by(demo, event_type, 4)
+    by_demo.insert(0, 'gender_match', [False, False, True, True])
+    by_demo.insert(1, 'age_match', [False, True, False, True])
+
+    impressions = event_type == EVENT_CODES['Impression']
+    by_campaign = pd.DataFrame({
+        'campaign_id': events['campaign_id'][impressions].to_numpy(),
+        'interest_match': match['interest_match'].to_numpy()[impressions],
+        'gender_match': match['gender_match'].to_numpy()[impressions],
+        'age_match': match['age_match'].to_numpy()[impressions],
+    }).groupby('campaign_id').mean().mul(100).round(1).add_suffix('_rate').reset_index()
+    return by_level, by_demo, by_campaign
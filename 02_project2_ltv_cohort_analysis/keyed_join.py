@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class EventKeys:
+    """Row positions of each event's ad, campaign and user in the dimension tables.
+
+    Codes are int32 positions (-1 when the key is missing from the dimension),
+    so attaching an attribute is one array take instead of a hash merge that
+    copies the whole event frame. User codes (the expensive string hashing)
+    are only computed the first time a users column is requested.
+    """
+    ad: np.ndarray
+    campaign: np.ndarray
+    user_keys: pd.Series
+    dims: dict = field(default_factory=dict)
+    _user: np.ndarray | None = None
+
+    @property
+    def user(self) -> np.ndarray:
+        if self._user is None:
+            self._user = _positions(self.dims['users']['user_id'], self.user_keys)
+        return self._user
+
+    def codes_for(self, dim: str) -> np.ndarray:
+        if dim == 'users':
+            return self.user
+        return {'ads': self.ad, 'campaigns': self.campaign}[dim]
+
+    def subset(self, mask) -> 'EventKeys':
+        """Keys of the events where mask is True, in the same order (no re-encoding)."""
+        mask = np.asarray(mask, dtype=bool)
+        return EventKeys(ad=self.ad[mask], campaign=self.campaign[mask],
+                         user_keys=self.user_keys[mask].reset_index(drop=True), dims=self.dims,
+                         _user=None if self._user is None else self._user[mask])
+
+
+def _positions(dim_keys, keys) -> np.ndarray:
+    """Position of every key in the dimension's key column (-1 if absent).
+
+    Duplicate dimension keys resolve to their first row. (users.csv has ~50
+    colliding 5-char user_ids; a hash merge would duplicate those users' events.)
+    """
+    index = pd.Index(dim_keys)
+    if index.is_unique:
+        return index.get_indexer(keys).astype(np.int32)
+    first = ~index.duplicated()
+    pos = index[first].get_indexer(keys)
+    return np.where(pos >= 0, np.flatnonzero(first)[pos], -1).astype(np.int32)
+
+
+def encode_keys(events: pd.DataFrame, ads: pd.DataFrame, campaigns: pd.DataFrame,
+                users: pd.DataFrame) -> EventKeys:
+    """Factorize the event keys against ads, campaigns and users once.
+
+    The campaign code goes through the ad (events only carry ad_id), so it is
+    computed on the 200-row ads table and then gathered per event.
+    """
+    ad = _positions(ads['ad_id'], events['ad_id'])
+    ad_campaign = _positions(campaigns['campaign_id'], ads['campaign_id'])
+    campaign = np.where(ad >= 0, ad_campaign[np.maximum(ad, 0)], -1).astype(np.int32)
+    return EventKeys(ad=ad, campaign=campaign, user_keys=events['user_id'],
+                     dims={'ads': ads, 'campaigns': campaigns, 'users': users})
+
+
+def take_column(values, codes: np.ndarray):
+    """Gather dimension values by code; -1 becomes missing, like a left merge."""
+    values = pd.Series(values)
+    if (codes < 0).any():
+        # Integer columns need a float/NA-capable dtype to hold the gaps
+        if values.dtype.kind in 'iub':
+            values = values.astype('float64')
+        return values.array.take(codes, allow_fill=True)
+    # Keep the column's own array type (e.g. Arrow strings): no object round trip
+    return values.array.take(codes)
+
+
+def attach(events: pd.DataFrame, keys: EventKeys, columns) -> pd.DataFrame:
+    """Event frame with the requested dimension columns attached by take.
+
+    Each column is looked up in ads, then campaigns, then users. Only the
+    listed columns are materialized; the event frame itself is not copied
+    column by column through a merge.
+    """
+    out = {name: events[name] for name in events.columns}
+    for column in columns:
+        for dim in ('ads', 'campaigns', 'users'):
+            table = keys.dims[dim]
+            if column in table:
+                out[column] = take_column(table[column], keys.codes_for(dim))
+                break
+        else:
+            raise KeyError(f"Column {column!r} not found in ads, campaigns or users")
+    return pd.DataFrame(out, index=events.index, copy=False)
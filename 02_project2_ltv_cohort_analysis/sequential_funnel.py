@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from event_arrays import CLICK, IMPRESSION, PURCHASE, last_index_where, sort_events
+
+# Time-to-convert histogram buckets (upper edges, in seconds)
+TIME_BUCKETS = [60, 300, 900, 3600, 6 * 3600, 86400, 3 * 86400, 7 * 86400, 30 * 86400]
+TIME_BUCKET_LABELS = ['<1m', '1-5m', '5-15m', '15m-1h', '1-6h', '6-24h',
+                      '1-3d', '3-7d', '7-30d', '30d+']
+
+
+def _seconds(window) -> int:
+    return int(pd.Timedelta(window).total_seconds())
+
+
+def sequential_funnel(events: pd.DataFrame, ads: pd.DataFrame,
+                      click_window='1D', purchase_window='7D'):
+    """Count only Impression -> Click -> Purchase sequences per user and campaign.
+
+    A click is valid when the same user saw an impression of the same campaign
+    at most `click_window` earlier. A purchase is valid when it follows a valid
+    click within `purchase_window`. Events are sorted once; everything after
+    that is forward fills and bincounts over the sorted arrays.
+
+    Returns (summary, time_distribution):
+      summary            one row per campaign_id with raw and sequential counts
+                         plus median / p90 time-to-click and time-to-purchase
+      time_distribution  campaign_id x stage x bucket counts
+    """
+    ev = sort_events(events, ads)
+    etype, ts, seg = ev.event_type, ev.ts, ev.segment
+
+    # Step 1: every click looks back to the latest impression in its segment
+    last_imp = last_index_where(etype == IMPRESSION, seg)
+    is_click = etype == CLICK
+    time_to_click = ts - ts[np.maximum(last_imp, 0)]
+    valid_click = is_click & (last_imp >= 0) & (time_to_click <= _seconds(click_window))
+
+    # Step 2: every purchase looks back to the latest *valid* click
+    last_click = last_index_where(valid_click, seg)
+    is_purchase = etype == PURCHASE
+    time_to_purchase = ts - ts[np.maximum(last_click, 0)]
+    valid_purchase = (is_purchase & (last_click >= 0)
+                      & (time_to_purchase <= _seconds(purchase_window)))
+
+    n_campaigns = len(ev.campaign_ids)
+    camp = ev.campaign
+
+    def count(mask):
+        return np.bincount(camp[mask], minlength=n_campaigns)
+
+    summary = pd.DataFrame({
+        'campaign_id': ev.campaign_ids,
+        'impressions': count(etype == IMPRESSION),
+        'clicks': count(is_click),
+        'purchases': count(is_purchase),
+        'sequential_clicks': count(valid_click),
+        'sequential_purchases': count(valid_purchase),
+    })
+    summary['unsequenced_purchases'] = summary['purchases'] - summary['sequential_purchases']
+    summary['sequential_ctr'] = (
+        summary['sequential_clicks'] / summary['impressions'] * 100).round(2)
+    summary['sequential_conversion_rate'] = (
+        summary['sequential_purchases'] / summary['sequential_clicks'] * 100).round(2)
+
+    # Time-to-convert: quantiles per campaign over the valid rows only
+    stages = {
+        'time_to_click': (valid_click, time_to_click),
+        'time_to_purchase': (valid_purchase, time_to_purchase),
+    }
+    distribution = []
+    for stage, (mask, seconds) in stages.items():
+        minutes = pd.Series(seconds[mask] / 60, index=camp[mask])
+        quantiles = minutes.groupby(level=0).quantile([0.5, 0.9]).unstack()
+        quantiles = quantiles.reindex(index=range(n_campaigns), columns=[0.5, 0.9])
+        summary[f'median_{stage}_min'] = quantiles[0.5].round(1).to_numpy()
+        summary[f'p90_{stage}_min'] = quantiles[0.9].round(1).to_numpy()
+
+        # Histogram as one bincount over flattened (campaign, bucket) codes
+        n_buckets = len(TIME_BUCKET_LABELS)
+        bucket = np.searchsorted(TIME_BUCKETS, seconds[mask], side='right')
+        counts = np.bincount(camp[mask] * n_buckets + bucket,
+                             minlength=n_campaigns * n_buckets)
+        distribution.append(pd.DataFrame({
+            'campaign_id': np.repeat(ev.campaign_ids, n_buckets),
+            'stage': stage,
+            'bucket': np.tile(TIME_BUCKET_LABELS, n_campaigns),
+            'events': counts,
+        }))
+
+    # Events whose ad is not in ads.csv have no campaign (same as the left merge)
+    distribution = pd.concat(distribution, ignore_index=True)
+    summary = summary[summary['campaign_id'] != -1].reset_index(drop=True)
+    distribution = distribution[distribution['campaign_id'] != -1].reset_index(drop=True)
+    return summary, distribution
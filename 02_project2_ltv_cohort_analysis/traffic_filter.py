@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from event_arrays import CLICK, EVENT_CODES, PURCHASE, last_index_where, to_epoch_seconds
+
+FLAGS = ['is_duplicate', 'is_click_burst', 'is_fast_purchase']
+
+
+def _runs_to_mask(starts: np.ndarray, stops: np.ndarray, n: int) -> np.ndarray:
+    """Union of [start, stop] index ranges as a boolean mask (difference array)."""
+    diff = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(diff, starts, 1)
+    np.add.at(diff, stops + 1, -1)
+    return np.cumsum(diff[:n]) > 0
+
+
+def _group_codes(codes, keys) -> np.ndarray:
+    """Dimension positions as group codes, keys missing from the dimension (-1)
+    coded on their own after the dimension's rows (only those rows are hashed)."""
+    codes = np.asarray(codes, dtype=np.int64).copy()
+    missing = np.flatnonzero(codes < 0)
+    if len(missing):
+        extra, _ = pd.factorize(np.asarray(keys)[missing], use_na_sentinel=False)
+        codes[missing] = codes.max(initial=-1) + 1 + extra
+    return codes
+
+
+def flag_invalid_traffic(events: pd.DataFrame, burst_window='60s', burst_clicks: int = 5,
+                         min_click_to_purchase='5s', keys=None) -> pd.DataFrame:
+    """Flag suspicious events with sorted-array windows over user x ad x time.
+
+    - is_duplicate: same user, ad, event type and timestamp as an earlier row
+    - is_click_burst: part of burst_clicks or more clicks by one user on one ad
+      within burst_window
+    - is_fast_purchase: purchase less than min_click_to_purchase after the
+      user's last click on that ad
+
+    `keys` (optional) are keyed_join.EventKeys for the events: their ad and
+    user codes are reused instead of hashing user_id and ad_id again.
+    Returns boolean flags plus is_invalid, aligned with `events`.
+    """
+    n = len(events)
+    if keys is None:
+        user, _ = pd.factorize(events['user_id'])
+        ad, _ = pd.factorize(events['ad_id'])
+    else:
+        user = _group_codes(keys.user, events['user_id'])
+        ad = _group_codes(keys.ad, events['ad_id'])
+    ts = to_epoch_seconds(events['timestamp'])
+    etype = events['event_type'].map(EVENT_CODES).fillna(-1).to_numpy(np.int8)
+
+    order = np.lexsort((etype, ts, ad, user))
+    user, ad, ts, etype = user[order], ad[order], ts[order], etype[order]
+    new_segment = np.ones(n, dtype=bool)
+    new_segment[1:] = (user[1:] != user[:-1]) | (ad[1:] != ad[:-1])
+    segment = np.cumsum(new_segment) - 1
+
+    # Duplicates sit next to each other after the sort
+    duplicate = np.zeros(n, dtype=bool)
+    duplicate[1:] = ~new_segment[1:] & (ts[1:] == ts[:-1]) & (etype[1:] == etype[:-1])
+
+    # Click bursts: on the click-only subsequence, a composite (segment, time)
+    # key lets one searchsorted find the first click inside each click's window
+    window = int(pd.Timedelta(burst_window).total_seconds())
+    clicks = np.flatnonzero((etype == CLICK) & ~duplicate)
+    burst = np.zeros(n, dtype=bool)
+    if len(clicks):
+        rel = ts[clicks] - ts[clicks].min()
+        span = int(rel.max()) + window + 1
+        key = segment[clicks].astype(np.int64) * span + rel
+        first_in_window = np.searchsorted(key, key - window, side='left')
+        ends = np.arange(len(clicks))
+        in_burst = ends - first_in_window + 1 >= burst_clicks
+        burst[clicks] = _runs_to_mask(first_in_window[in_burst], ends[in_burst], len(clicks))
+
+    # Impossibly fast purchases: time since the last click of the same user on the same ad
+    last_click = last_index_where((etype == CLICK) & ~duplicate, segment)
+    fast = ((etype == PURCHASE) & (last_click >= 0)
+            & (ts - ts[np.maximum(last_click, 0)] < pd.Timedelta(min_click_to_purchase).total_seconds()))
+
+    flags = pd.DataFrame(index=events.index)
+    inverse = np.empty(n, dtype=np.int64)
+    inverse[order] = np.arange(n)
+    for name, values in zip(FLAGS, [duplicate, burst, fast]):
+        flags[name] = values[inverse]
+    flags['is_invalid'] = flags[FLAGS].any(axis=1)
+    return flags
+
+
+def invalid_traffic_report(events: pd.DataFrame, flags: pd.DataFrame) -> pd.DataFrame:
+    """Invalid-traffic share per campaign and event type (events need campaign_id)."""
+    frame = pd.concat([events[['campaign_id', 'event_type']], flags], axis=1)
+    report = frame.pivot_table(index='campaign_id', columns='event_type',
+                               values='is_invalid', aggfunc=['sum', 'mean'], fill_value=0)
+    report.columns = [f"invalid_{etype.lower()}s" if agg == 'sum'
+                      else f"invalid_{etype.lower()}_share" for agg, etype in report.columns]
+    totals = frame.groupby('campaign_id')[FLAGS + ['is_invalid']].sum()
+    totals['invalid_share'] = frame.groupby('campaign_id')['is_invalid'].mean()
+    report = totals.join(report)
+    share_cols = [c for c in report.columns if c.endswith('_share')]
+    report[share_cols] = (report[share_cols] * 100).round(2)
+    return report.reset_index()
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def incidence_matrix(invoice, stock_code):
+    """Invoice x item 0/1 CSR matrix from one row per line item.
+
+    Returns (matrix, invoices, items); repeated lines of an item on the
+    same invoice count once.
+    """
+    rows, invoices = pd.factorize(np.asarray(invoice))
+    cols, items = pd.factorize(np.asarray(stock_code))
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                               shape=(len(invoices), len(items)))
+    matrix.data[:] = 1
+    return matrix, invoices, items
+
+
+def co_occurrence(matrix: sparse.csr_matrix, chunk_rows: int = 100_000) -> sparse.csr_matrix:
+    """Item x item invoice counts (upper triangle, i < j) via X.T @ X.
+
+    The product is accumulated over blocks of invoices, so peak memory
+    follows the pairs present in a block rather than all pairs at once.
+    """
+    n_items = matrix.shape[1]
+    counts = sparse.csr_matrix((n_items, n_items), dtype=np.int64)
+    for start in range(0, matrix.shape[0], chunk_rows):
+        block = matrix[start:start + chunk_rows]
+        counts = counts + sparse.triu(block.T.dot(block), k=1, format='csr')
+    return counts
+
+
+def item_pairs(matrix: sparse.csr_matrix, items, min_support: float = 0.01,
+               top_k: int = 100, sort_by: str = 'lift') -> pd.DataFrame:
+    """Support, confidence and lift for the top_k item pairs.
+
+    Items bought on fewer than min_support of invoices cannot be in a pair
+    that reaches it, so they are dropped before the multiplication; with a
+    large catalog that is most of the columns. Pairs below min_support are
+    dropped next and only the top_k by sort_by are ranked and returned.
+    """
+    n_invoices = matrix.shape[0]
+    min_count = max(int(np.ceil(min_support * n_invoices)), 1)
+    item_count = np.asarray(matrix.sum(axis=0)).ravel()
+    keep = np.flatnonzero(item_count >= min_count)
+    counts = co_occurrence(matrix[:, keep]).tocoo()
+
+    frequent = counts.data >= min_count
+    a, b, n_ab = keep[counts.row[frequent]], keep[counts.col[frequent]], counts.data[frequent]
+    n_a, n_b = item_count[a], item_count[b]
+    pairs = pd.DataFrame({
+        'item_a': np.asarray(items)[a],
+        'item_b': np.asarray(items)[b],
+        'invoices': n_ab,
+        'support': n_ab / n_invoices,
+        'confidence_a_b': n_ab / n_a,
+        'confidence_b_a': n_ab / n_b,
+        'lift': n_ab * n_invoices / (n_a.astype(float) * n_b),
+    })
+    if len(pairs) > top_k:
+        top = np.argpartition(-pairs[sort_by].to_numpy(), top_k - 1)[:top_k]
+        pairs = pairs.iloc[top]
+    return pairs.sort_values([sort_by, 'invoices'], ascending=False).reset_index(drop=True)
+
+
+def repeat_drivers(first_matrix: sparse.csr_matrix, items, repeated,
+                   min_customers: int = 20, top_k: int = 50) -> pd.DataFrame:
+    """Items in customers' first orders that go with coming back.
+
+    first_matrix is the first-invoice x item incidence (one row per
+    customer) and repeated flags customers who ordered again. Per item:
+    first-order buyers, how many repeated (X.T @ repeated), their repeat
+    rate and its lift over the overall repeat rate.
+    """
+    repeated = np.asarray(repeated, dtype=np.int64)
+    buyers = np.asarray(first_matrix.sum(axis=0)).ravel()
+    repeaters = first_matrix.T.dot(repeated)
+    keep = np.flatnonzero(buyers >= min_customers)
+    base_rate = repeated.mean() if len(repeated) else np.nan
+    rate = repeaters[keep] / buyers[keep]
+    out = pd.DataFrame({
+        'item': np.asarray(items)[keep],
+        'first_order_customers': buyers[keep],
+        'repeat_customers': repeaters[keep],
+        'repeat_rate': rate,
+        'repeat_lift': rate / base_rate,
+    })
+    if len(out) > top_k:
+        out = out.iloc[np.argpartition(-out['repeat_lift'].to_numpy(), top_k - 1)[:top_k]]
+    return out.sort_values(['repeat_lift', 'first_order_customers'], ascending=False).reset_index(drop=True)
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+def month_index(dates) -> np.ndarray:
+    """Calendar month as int32: (year - 1970) * 12 + month - 1.
+
+    This is also the ordinal of pandas' Period('M'), so converting back is free.
+    """
+    return np.asarray(dates, dtype='datetime64[M]').astype(np.int64).astype(np.int32)
+
+
+@dataclass
+class CohortMatrices:
+    """Cohort x age (months since first purchase) matrices.
+
+    Row i is the cohort of calendar month first_month + i; cohorts with no
+    customers are kept as empty rows so row arithmetic stays trivial.
+    """
+    first_month: int
+    customers: np.ndarray  # distinct active customers per cell
+    revenue: np.ndarray
+    orders: np.ndarray
+
+    @property
+    def cohort_size(self) -> np.ndarray:
+        return self.customers[:, 0]
+
+    @property
+    def cohort_months(self) -> pd.PeriodIndex:
+        return pd.PeriodIndex.from_ordinals(
+            self.first_month + np.arange(len(self.customers)), freq='M')
+
+    def per_cohort_customer(self, values: np.ndarray) -> np.ndarray:
+        size = self.cohort_size[:, None].astype(float)
+        return np.divide(values, size, out=np.full(values.shape, np.nan), where=size > 0)
+
+    @property
+    def retention(self) -> np.ndarray:
+        """Active customers / cohort size, in percent."""
+        return self.per_cohort_customer(self.customers) * 100
+
+    @property
+    def revenue_per_customer(self) -> np.ndarray:
+        return self.per_cohort_customer(self.revenue)
+
+    @property
+    def cumulative_ltv(self) -> np.ndarray:
+        return np.cumsum(np.nan_to_num(self.revenue_per_customer), axis=1)
+
+    def frame(self, values: np.ndarray, observed_only: bool = True) -> pd.DataFrame:
+        """A matrix as a cohort_month x months_since_first DataFrame.
+
+        observed_only drops empty cohorts and ages no cohort has reached,
+        like a pivot_table of the long table would.
+        """
+        out = pd.DataFrame(values, index=self.cohort_months.rename('cohort_month'),
+                           columns=pd.RangeIndex(values.shape[1], name='months_since_first'))
+        if observed_only:
+            ages = np.flatnonzero(self.customers.any(axis=0))
+            out = out.loc[self.cohort_size > 0, ages[0]:ages[-1]] if len(ages) else out.iloc[:0, :0]
+        return out
+
+    def to_long(self) -> pd.DataFrame:
+        """One row per observed (cohort, age) cell, in cohort then age order."""
+        cohort, age = np.nonzero(self.customers)
+        return pd.DataFrame({
+            'cohort_month': self.cohort_months[cohort],
+            'months_since_first': age,
+            'customers': self.customers[cohort, age],
+            'revenue': self.revenue[cohort, age],
+            'orders': self.orders[cohort, age],
+            'cohort_size': self.cohort_size[cohort],
+        })
+
+
+def build_cohorts(customer, order_month: np.ndarray, revenue: np.ndarray,
+                  dense_pairs_limit: int = 50_000_000):
+    """Cohort matrices from one row per order, in linear time.
+
+    customer: customer keys (any hashable values, factorized here)
+    order_month: month_index() of each order; revenue: order revenue.
+
+    Returns (matrices, cohort_of_order, age_of_order) so callers can attach
+    the cohort and age to their order table. Distinct customers per cell
+    come from de-duplicating (customer, age) pairs: a bitmap over customers x
+    ages when that fits in dense_pairs_limit cells, np.unique otherwise.
+    """
+    codes, _ = pd.factorize(np.asarray(customer))
+    order_month = np.asarray(order_month, dtype=np.int32)
+    n_customers = int(codes.max()) + 1 if len(codes) else 0
+
+    first = np.full(n_customers, np.iinfo(np.int32).max, dtype=np.int32)
+    np.minimum.at(first, codes, order_month)
+    first_month = int(first.min()) if n_customers else 0
+    cohort = first[codes] - first_month
+    age = order_month - first[codes]
+    n_cohorts = int(cohort.max()) + 1 if len(cohort) else 0
+    n_ages = int(order_month.max()) - first_month + 1 if len(cohort) else 0
+    shape = (n_cohorts, n_ages)
+
+    cell = cohort.astype(np.int64) * n_ages + age
+    revenue_m = np.bincount(cell, weights=revenue, minlength=n_cohorts * n_ages)
+    orders_m = np.bincount(cell, minlength=n_cohorts * n_ages)
+
+    pair = codes.astype(np.int64) * n_ages + age
+    if n_customers * n_ages <= dense_pairs_limit:
+        seen = np.zeros(n_customers * n_ages, dtype=bool)
+        seen[pair] = True
+        pair = np.flatnonzero(seen)
+    else:
+        pair = np.unique(pair)
+    pair_customer, pair_age = np.divmod(pair, n_ages)
+    customers_m = np.bincount((first[pair_customer] - first_month).astype(np.int64) * n_ages + pair_age,
+                              minlength=n_cohorts * n_ages)
+
+    matrices = CohortMatrices(first_month, customers_m.reshape(shape),
+                              revenue_m.reshape(shape), orders_m.reshape(shape))
+    return matrices, cohort + first_month, age
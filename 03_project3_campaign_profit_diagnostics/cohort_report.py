@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from cohort_engine import CohortMatrices
+
+# LTV milestones: month index since first purchase (month 0 = first purchase month)
+LTV_MILESTONES = {'ltv_30d': 0, 'ltv_60d': 1, 'ltv_90d': 2, 'ltv_180d': 5}
+# Milestones that get a break-even CAC column
+BREAKEVEN_MILESTONES = ['30d', '90d', '180d']
+
+
+def cohort_table(cohorts: CohortMatrices) -> pd.DataFrame:
+    """Distinct customers, revenue, cohort size, retention % and revenue per
+    customer for each observed (cohort, age) cell."""
+    cohort_revenue = cohorts.to_long()[['cohort_month', 'months_since_first', 'customers',
+                                        'revenue', 'cohort_size']]
+
+    # Retention rate per cohort month
+    cohort_revenue['retention_rate'] = (
+        cohort_revenue['customers'] / cohort_revenue['cohort_size'] * 100
+    ).round(1)
+
+    # Revenue per customer in cohort
+    cohort_revenue['revenue_per_customer'] = (
+        cohort_revenue['revenue'] / cohort_revenue['cohort_size']
+    ).round(2)
+    return cohort_revenue
+
+
+def ltv_milestone_table(cohorts: CohortMatrices, cohort_revenue: pd.DataFrame,
+                        cm_pct: float) -> pd.DataFrame:
+    """Cumulative LTV per cohort at the LTV_MILESTONES, cohort size and break-even CAC.
+
+    Break-even CAC = LTV * CM%: the most you can spend to acquire a customer
+    and still be profitable over that period. Milestones a cohort table is
+    too short to reach are left out.
+    """
+    # Cumulative revenue per customer (rounded to cents) at each month
+    ltv_cumulative = cohorts.frame(np.round(cohorts.revenue_per_customer, 2)).cumsum(axis=1)
+
+    milestones = pd.DataFrame({'cohort_month': ltv_cumulative.index})
+    for name, month in LTV_MILESTONES.items():
+        if month in ltv_cumulative.columns:
+            milestones[name] = ltv_cumulative[month].values
+
+    # Merge cohort sizes (each cohort's month-0 customers)
+    cohort_sizes = cohort_revenue[cohort_revenue['months_since_first'] == 0][
+        ['cohort_month', 'cohort_size']].reset_index(drop=True)
+    milestones = milestones.merge(cohort_sizes, on='cohort_month', how='left')
+
+    for period in BREAKEVEN_MILESTONES:
+        if f'ltv_{period}' in milestones.columns:
+            milestones[f'breakeven_cac_{period}'] = (milestones[f'ltv_{period}'] * cm_pct).round(2)
+    return milestones
+
+
+def average_retention(cohort_revenue: pd.DataFrame) -> pd.Series:
+    """Mean retention rate across cohorts by months since first purchase."""
+    return cohort_revenue.groupby('months_since_first')['retention_rate'].mean().round(1)
+
+
+def average_ltv(milestones: pd.DataFrame) -> dict:
+    """Mean LTV across cohorts per milestone (0 when no cohort reaches it)."""
+    return {name: milestones[name].mean() if name in milestones.columns else 0
+            for name in LTV_MILESTONES}
+
+
+def executive_summary(total_customers: int, total_orders: int, total_revenue: float,
+                      avg_order_value: float, milestones: pd.DataFrame,
+                      avg_retention: pd.Series, cm_pct: float) -> pd.DataFrame:
+    """The report's Executive Summary tab: headline totals, LTV, retention and max safe CAC."""
+    avg_ltv = average_ltv(milestones)
+    return pd.DataFrame({
+        'Metric': [
+            'Total Customers Analyzed',
+            'Total Orders Analyzed',
+            'Total Revenue Analyzed',
+            'Average Order Value',
+            'Average 30-Day LTV',
+            'Average 90-Day LTV',
+            'Average 180-Day LTV',
+            'Average Month 1 Retention Rate',
+            'Average Month 2 Retention Rate',
+            'Max Safe CAC (30-day payback)',
+            'Max Safe CAC (90-day payback)',
+            'Max Safe CAC (180-day payback)'
+        ],
+        'Value': [
+            f"{total_customers:,}",
+            f"{total_orders:,}",
+            f"${total_revenue:,.2f}",
+            f"${avg_order_value:.2f}",
+            f"${avg_ltv['ltv_30d']:.2f}",
+            f"${avg_ltv['ltv_90d']:.2f}",
+            f"${avg_ltv['ltv_180d']:.2f}",
+            f"{avg_retention.get(1, 0):.1f}%",
+            f"{avg_retention.get(2, 0):.1f}%",
+            f"${avg_ltv['ltv_30d'] * cm_pct:.2f}",
+            f"${avg_ltv['ltv_90d'] * cm_pct:.2f}",
+            f"${avg_ltv['ltv_180d'] * cm_pct:.2f}"
+        ]
+    })
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Per-transaction columns, one .npy file each, all sorted by (customer, date)
+COLUMNS = {
+    'date': np.int64,       # InvoiceDate as nanoseconds since 1970
+    'revenue': np.float64,
+    'quantity': np.int64,
+    'invoice': np.int32,    # index into invoice_labels
+}
+
+
+def build_store(path, customer, invoice_date, revenue, quantity, invoice,
+                source: str | None = None) -> 'CustomerStore':
+    """Write transactions sorted by customer as .npy columns plus a CSR index.
+
+    offsets[i]:offsets[i + 1] is the row range of customer_ids[i], so a
+    customer's history is one binary search and a contiguous slice. The
+    store is written to a temporary directory and swapped in whole. source
+    (e.g. the Parquet cache name, which carries the workbook hash) is
+    recorded so load_store can tell whether the store is current.
+    """
+    path = Path(path)
+    customer = np.asarray(customer, dtype=np.int64)
+    dates = np.asarray(invoice_date, dtype='datetime64[ns]').astype(np.int64)
+    order = np.lexsort((dates, customer))
+    customer = customer[order]
+
+    customer_ids, starts = np.unique(customer, return_index=True)
+    offsets = np.append(starts, len(customer)).astype(np.int64)
+    invoice_codes, invoice_labels = pd.factorize(np.asarray(invoice)[order])
+    columns = {
+        'date': dates[order],
+        'revenue': np.asarray(revenue, dtype=np.float64)[order],
+        'quantity': np.asarray(quantity, dtype=np.int64)[order],
+        'invoice': invoice_codes.astype(np.int32),
+    }
+
+    tmp = path.with_name(path.name + '.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    np.save(tmp / 'customer_ids.npy', customer_ids)
+    np.save(tmp / 'offsets.npy', offsets)
+    np.save(tmp / 'invoice_labels.npy', np.asarray(invoice_labels, dtype=str))
+    for name, dtype in COLUMNS.items():
+        np.save(tmp / f'{name}.npy', columns[name].astype(dtype, copy=False))
+    (tmp / 'meta.json').write_text(json.dumps({'rows': len(customer), 'customers': len(customer_ids),
+                                               'source': source}))
+    shutil.rmtree(path, ignore_errors=True)
+    tmp.rename(path)
+    return CustomerStore(path)
+
+
+def load_store(path, source: str) -> 'CustomerStore | None':
+    """The store at path if it was built from source, else None (missing or stale)."""
+    meta = Path(path) / 'meta.json'
+    if not meta.exists() or json.loads(meta.read_text()).get('source') != source:
+        return None
+    return CustomerStore(path)
+
+
+class CustomerStore:
+    """Read-only, memory-mapped view of a store written by build_store.
+
+    Opening maps the files without reading them; a lookup touches only the
+    pages of that customer's rows.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.customer_ids = np.load(self.path / 'customer_ids.npy', mmap_mode='r')
+        self.offsets = np.load(self.path / 'offsets.npy', mmap_mode='r')
+        self.invoice_labels = np.load(self.path / 'invoice_labels.npy', mmap_mode='r')
+        self.columns = {name: np.load(self.path / f'{name}.npy', mmap_mode='r') for name in COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.customer_ids)
+
+    def __contains__(self, customer_id) -> bool:
+        i = np.searchsorted(self.customer_ids, customer_id)
+        return i < len(self.customer_ids) and self.customer_ids[i] == customer_id
+
+    def rows(self, customer_id) -> slice:
+        i = int(np.searchsorted(self.customer_ids, customer_id))
+        if i == len(self.customer_ids) or self.customer_ids[i] != customer_id:
+            raise KeyError(customer_id)
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def history(self, customer_id) -> pd.DataFrame:
+        """The customer's line items in date order."""
+        rows = self.rows(customer_id)
+        invoice = np.asarray(self.columns['invoice'][rows])
+        return pd.DataFrame({
+            'InvoiceDate': np.asarray(self.columns['date'][rows]).astype('datetime64[ns]'),
+            'Invoice': np.asarray(self.invoice_labels[invoice]),
+            'Quantity': np.asarray(self.columns['quantity'][rows]),
+            'revenue': np.asarray(self.columns['revenue'][rows]),
+        })
+
+    def summary(self, customer_id) -> dict:
+        """Order count, revenue, AOV and lifetime recomputed from the customer's rows."""
+        rows = self.rows(customer_id)
+        dates = np.asarray(self.columns['date'][rows]).astype('datetime64[ns]')
+        revenue = float(np.sum(self.columns['revenue'][rows]))
+        n_orders = len(np.unique(self.columns['invoice'][rows]))
+        return {
+            'customer_id': int(customer_id),
+            'total_revenue': round(revenue, 2),
+            'total_orders': n_orders,
+            'avg_order_value': round(revenue / n_orders, 2),
+            'first_purchase': pd.Timestamp(dates[0]),
+            'last_purchase': pd.Timestamp(dates[-1]),
+            'customer_lifetime_days': int((dates[-1] - dates[0]) // np.timedelta64(1, 'D')),
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Show one customer's history from the store.")
+    parser.add_argument('customer_id', type=int)
+    parser.add_argument('--store', default='.cache/customer_store')
+    args = parser.parse_args()
+
+    store = CustomerStore(args.store)
+    for key, value in store.summary(args.customer_id).items():
+        print(f"{key}: {value}")
+    print(store.history(args.customer_id).to_string(index=False))
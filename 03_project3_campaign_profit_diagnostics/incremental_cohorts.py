@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from cohort_engine import CohortMatrices, month_index
+
+_NEVER = np.iinfo(np.int32).min
+
+
+def _grow(matrix: np.ndarray, shape) -> np.ndarray:
+    """matrix zero-padded to shape (cohorts and ages only ever get added)."""
+    if matrix.shape == tuple(shape):
+        return matrix
+    out = np.zeros(shape, dtype=matrix.dtype)
+    out[:matrix.shape[0], :matrix.shape[1]] = matrix
+    return out
+
+
+@dataclass
+class CohortState:
+    """Cohort accumulators that can be carried from one refresh to the next.
+
+    customer_ids is sorted; first[i] / last_active[i] are the month_index()
+    of customer_ids[i]'s first and latest order. through is the latest order
+    timestamp ingested, so a refresh only has to pass the orders after it;
+    through_invoices are the invoices ingested at exactly `through`, so other
+    orders stamped with that same minute can still come in later.
+    """
+    customer_ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    first: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    last_active: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    matrices: CohortMatrices = field(default_factory=lambda: CohortMatrices(
+        0, np.zeros((0, 0), dtype=np.int64), np.zeros((0, 0)), np.zeros((0, 0), dtype=np.int64)))
+    through: np.datetime64 | None = None
+    through_invoices: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=str))
+
+    @property
+    def n_orders(self) -> int:
+        return int(self.matrices.orders.sum())
+
+    @property
+    def total_revenue(self) -> float:
+        return float(self.matrices.revenue.sum())
+
+    @classmethod
+    def from_orders(cls, customer, order_date, revenue, invoice=None) -> 'CohortState':
+        state = cls()
+        state.ingest(customer, order_date, revenue, invoice)
+        return state
+
+    def is_new(self, order_date, invoice=None) -> np.ndarray:
+        """Orders not ingested yet: after `through`, or at `through` with an
+        invoice not in through_invoices (without invoices, at `through` is old)."""
+        order_date = np.asarray(order_date, dtype='datetime64[ns]')
+        if self.through is None:
+            return np.ones(len(order_date), dtype=bool)
+        new = order_date > self.through
+        if invoice is not None:
+            at = order_date == self.through
+            new[at] = ~np.isin(np.asarray(invoice, dtype=str)[at], self.through_invoices)
+        return new
+
+    def _locate(self, keys: np.ndarray):
+        pos = np.searchsorted(self.customer_ids, keys)
+        known = pos < len(self.customer_ids)
+        known[known] = self.customer_ids[pos[known]] == keys[known]
+        return pos, known
+
+    def first_month_of(self, customer) -> np.ndarray:
+        """month_index() of each customer's first order (customers must be known)."""
+        keys = np.asarray(customer, dtype=np.int64)
+        pos, known = self._locate(keys)
+        if not known.all():
+            raise KeyError(f"{int((~known).sum())} customers not in the cohort state")
+        return self.first[pos]
+
+    def ingest(self, customer, order_date, revenue, invoice=None) -> None:
+        """Add one row per new order (see is_new) to the accumulators.
+
+        Work is proportional to the batch: customers are found by binary
+        search, new ones are inserted, matrices are padded for new cohorts /
+        ages, and only the batch's (cohort, age) cells are incremented. A
+        (customer, month) pair counts as a new active customer unless that
+        customer was already active in the month, which can only be the
+        month of `through` since batches are in time order. Orders before
+        `through`, or at it without a new invoice, raise ValueError: late data
+        needs a rebuild.
+        """
+        order_date = np.asarray(order_date, dtype='datetime64[ns]')
+        if len(order_date) == 0:
+            return
+        if not self.is_new(order_date, invoice).all():
+            raise ValueError(f"orders at or before {self.through} are already ingested; "
+                             "rebuild the state with CohortState.from_orders")
+        keys = np.asarray(customer, dtype=np.int64)
+        month = month_index(order_date)
+        revenue = np.asarray(revenue, dtype=float)
+
+        # Batch customers, their first month in the batch, and new customers
+        batch_ids, codes = np.unique(keys, return_inverse=True)
+        batch_first = np.full(len(batch_ids), np.iinfo(np.int32).max, dtype=np.int32)
+        np.minimum.at(batch_first, codes, month)
+        pos, known = self._locate(batch_ids)
+        if not known.all():
+            at = pos[~known]
+            self.customer_ids = np.insert(self.customer_ids, at, batch_ids[~known])
+            self.first = np.insert(self.first, at, batch_first[~known])
+            self.last_active = np.insert(self.last_active, at, _NEVER)
+            pos, _ = self._locate(batch_ids)
+
+        m = self.matrices
+        if m.customers.size == 0:
+            m.first_month = int(self.first.min())
+        cust_first = self.first[pos]
+        shape = (int(cust_first.max()) - m.first_month + 1, int(month.max()) - m.first_month + 1)
+        shape = (max(shape[0], m.customers.shape[0]), max(shape[1], m.customers.shape[1]))
+        m.customers, m.revenue, m.orders = (_grow(a, shape) for a in (m.customers, m.revenue, m.orders))
+
+        n_ages = shape[1]
+        order_first = cust_first[codes]
+        cell = (order_first - m.first_month).astype(np.int64) * n_ages + (month - order_first)
+        size = shape[0] * n_ages
+        m.revenue += np.bincount(cell, weights=revenue, minlength=size).reshape(shape)
+        m.orders += np.bincount(cell, minlength=size).reshape(shape)
+
+        # Distinct active customers: each (customer, month) pair once, skipping
+        # customers already counted for that month by an earlier batch
+        pair = np.unique(codes.astype(np.int64) * n_ages + (month - m.first_month))
+        pair_code, pair_month = np.divmod(pair, n_ages)
+        pair_month = (pair_month + m.first_month).astype(np.int32)
+        fresh = pair_month > self.last_active[pos[pair_code]]
+        pair_first = cust_first[pair_code[fresh]]
+        active_cell = (pair_first - m.first_month).astype(np.int64) * n_ages + (pair_month[fresh] - pair_first)
+        m.customers += np.bincount(active_cell, minlength=size).reshape(shape)
+
+        batch_last = np.full(len(batch_ids), _NEVER, dtype=np.int32)
+        np.maximum.at(batch_last, codes, month)
+        self.last_active[pos] = np.maximum(self.last_active[pos], batch_last)
+
+        through = order_date.max()
+        at_through = (np.asarray(invoice, dtype=str)[order_date == through] if invoice is not None
+                      else np.empty(0, dtype=str))
+        if through == self.through:
+            at_through = np.concatenate([self.through_invoices, at_through])
+        self.through = through
+        self.through_invoices = np.unique(at_through)
+
+    def save(self, path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp.npz')
+        np.savez(tmp, customer_ids=self.customer_ids, first=self.first,
+                 last_active=self.last_active, first_month=self.matrices.first_month,
+                 customers=self.matrices.customers, revenue=self.matrices.revenue,
+                 orders=self.matrices.orders,
+                 through=np.array([] if self.through is None else [self.through],
+                                  dtype='datetime64[ns]'),
+                 through_invoices=self.through_invoices)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path) -> 'CohortState':
+        with np.load(path) as data:
+            through = data['through']
+            through_invoices = (data['through_invoices'] if 'through_invoices' in data.files
+                                else np.empty(0, dtype=str))
+            return cls(data['customer_ids'], data['first'], data['last_active'],
+                       CohortMatrices(int(data['first_month']), data['customers'],
+                                      data['revenue'], data['orders']),
+                       through[0] if len(through) else None, through_invoices)
+
+
+def refresh_state(path, customer, order_date, revenue, invoice=None) -> CohortState:
+    """Load the state at path, ingest the orders not in it yet, save it.
+
+    Pass the full order history (e.g. the cleaned orders): a missing or
+    inconsistent state is rebuilt from them, otherwise only the new orders
+    are ingested. Consistency means the already ingested orders have the
+    same count and total revenue as the state, which catches a replaced or
+    restated history. Only the ingest scales with the new orders; the
+    caller still scans the history for the check. A feed of new orders
+    only can use CohortState.load(path).ingest(...) and save() instead.
+    """
+    path = Path(path)
+    order_date = np.asarray(order_date, dtype='datetime64[ns]')
+    revenue = np.asarray(revenue, dtype=float)
+    state = CohortState.load(path) if path.exists() else None
+    if state is not None and state.through is not None:
+        new = state.is_new(order_date, invoice)
+        old = ~new
+        if (int(old.sum()) == state.n_orders
+                and np.isclose(revenue[old].sum(), state.total_revenue, rtol=1e-9)):
+            state.ingest(np.asarray(customer)[new], order_date[new], revenue[new],
+                         None if invoice is None else np.asarray(invoice)[new])
+            state.save(path)
+            return state
+    state = CohortState.from_orders(customer, order_date, revenue, invoice)
+    state.save(path)
+    return state
@@ -3,54 +3,85 @@ import numpy as np
 import warnings
 warnings.filterwarnings('ignore')
 
+from basket_analysis import incidence_matrix, item_pairs, repeat_drivers
+from cohort_engine import month_index
+from cohort_report import (average_ltv, average_retention, cohort_table, executive_summary,
+                           ltv_milestone_table)
+from customer_store import build_store, load_store
+from incremental_cohorts import refresh_state
+from probabilistic_ltv import cohort_ltv, customer_features, predict_ltv
+from polars_engine import run_pipeline
+from retail_loader import retail_cache
+from retail_transforms import clean_lines, customer_level, order_level
+from rfm_segmentation import rfm_scores, value_segment
+from sampling import estimate_cohorts, stratified_sample
+from sparse_cohorts import GRANULARITIES, build_sparse_cohorts
+from survival import repeat_purchase_survival
+
 # ── LOAD DATA ──────────────────────────────────────────────
+# Both sheets are parsed in parallel on the first run and cached as Parquet
+# (.cache/), keyed by the workbook's hash; later runs read the cache
+#
+# engine = 'polars' runs loading, cleaning and the order collapse as one lazy
+# Polars plan over the Parquet cache (fused filters, only the needed columns
+# read, multi-threaded groupbys); order revenue is still summed the pandas
+# way, so the report is identical (polars_engine.py)
+engine = 'pandas'
 print("Loading data...")
-df = pd.read_excel('online_retail_II.xlsx', sheet_name='Year 2009-2010')
-df2 = pd.read_excel('online_retail_II.xlsx', sheet_name='Year 2010-2011')
-df = pd.concat([df, df2], ignore_index=True)
+cache_path = retail_cache('online_retail_II.xlsx')
+if engine == 'polars':
+    df, orders = run_pipeline(cache_path)
+else:
+    df = pd.read_parquet(cache_path)
 
-print(f"Raw records loaded: {len(df):,}")
-print(f"Columns: {df.columns.tolist()}")
-print(f"\nSample data:")
-print(df.head(3))
+    print(f"Raw records loaded: {len(df):,}")
+    print(f"Columns: {df.columns.tolist()}")
+    print(f"\nSample data:")
+    print(df.head(3))
 
 # ── CLEAN THE DATA ─────────────────────────────────────────
-# Step 1: Remove cancelled orders (Invoice starting with C)
-# In Shopify these would be refunded or cancelled orders
-df = df[~df['Invoice'].astype(str).str.startswith('C')]
-
-# Step 2: Remove rows with missing Customer ID
-# You cannot do cohort analysis without knowing who the customer is
-df = df.dropna(subset=['Customer ID'])
-
-# Step 3: Remove negative quantities (returns/adjustments)
-df = df[df['Quantity'] > 0]
-
-# Step 4: Remove zero or negative prices
-df = df[df['Price'] > 0]
-
-# Step 5: Convert Customer ID to integer
-df['Customer ID'] = df['Customer ID'].astype(int)
-
-# Step 6: Parse invoice date
-df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'])
-
-# Step 7: Calculate revenue per line item
-df['revenue'] = df['Quantity'] * df['Price']
+# Drop cancelled invoices, lines without a customer and non-positive
+# quantities / prices, then add revenue per line (retail_transforms.py; the
+# polars engine applies the same rules inside its query plan)
+if engine == 'pandas':
+    df = clean_lines(df)
 
 print(f"\nClean records: {len(df):,}")
 print(f"Unique customers: {df['Customer ID'].nunique():,}")
 print(f"Date range: {df['InvoiceDate'].min()} to {df['InvoiceDate'].max()}")
 print(f"Total revenue in dataset: ${df['revenue'].sum():,.2f}")
 
+# Per-customer lookups: line items sorted by customer as memory-mapped
+# arrays with an offsets index, so one customer's history is a single slice
+# (python customer_store.py <Customer ID>). Rebuilt only when the Parquet
+# cache (named by the workbook hash) has changed
+customer_store_path = '.cache/customer_store'
+customer_store = load_store(customer_store_path, cache_path.name)
+if customer_store is None:
+    customer_store = build_store(customer_store_path, df['Customer ID'], df['InvoiceDate'],
+                                 df['revenue'], df['Quantity'], df['Invoice'],
+                                 source=cache_path.name)
+
 ### BUILD ORDER-LEVEL SUMMARY ###
 # ── ORDER LEVEL ────────────────────────────────────────────
 # Collapse line items into one row per order
-orders = df.groupby(['Invoice', 'Customer ID', 'InvoiceDate', 'Country']).agg(
-    order_revenue=('revenue', 'sum'),
-    items_purchased=('Quantity', 'sum'),
-    unique_products=('StockCode', 'nunique')
-).reset_index()
+if engine == 'pandas':
+    orders = order_level(df)
+
+# Sampling mode for quick exploratory runs: set sample_fraction (e.g. 0.1) to
+# keep about that share of customers (not rows) in every first-purchase-month
+# cohort: those whose Customer ID hash is below it, so reruns pick the same
+# customers. Cohort, LTV and retention tables are scaled back to the full
+# cohorts, with standard errors in the 'Sampling Error' tab; customer-level
+# tables cover the sample.
+sample_fraction = None
+if sample_fraction:
+    customer_first = orders.groupby('Customer ID')['InvoiceDate'].min()
+    customer_sample = stratified_sample(customer_first.index, month_index(customer_first),
+                                        sample_fraction)
+    orders = orders[customer_sample.contains(orders['Customer ID'])].reset_index(drop=True)
+    df = df[customer_sample.contains(df['Customer ID'])]
+    print(f"\nSampled {customer_sample.sampled.sum():,} of {customer_sample.population.sum():,} customers")
 
 print(f"\nTotal orders: {len(orders):,}")
 print(f"Average order value: ${orders['order_revenue'].mean():.2f}")
@@ -58,43 +89,38 @@ print(f"Average items per order: {orders['items_purchased'].mean():.1f}")
 
 ### BUILD COHORT TABLE ###
 # ── COHORT ANALYSIS ────────────────────────────────────────
-
-# Step 1: Find each customer's first purchase date
-first_purchase = orders.groupby('Customer ID')['InvoiceDate'].min().reset_index()
-first_purchase.columns = ['Customer ID', 'first_purchase_date']
-first_purchase['cohort_month'] = first_purchase['first_purchase_date'].dt.to_period('M')
-
-# Step 2: Merge first purchase back to all orders
-orders = orders.merge(first_purchase[['Customer ID', 'cohort_month']], 
-                      on='Customer ID', how='left')
-
-# Step 3: Calculate months since first purchase for each order
-orders['order_month'] = orders['InvoiceDate'].dt.to_period('M')
-orders['months_since_first'] = (
-    orders['order_month'] - orders['cohort_month']
-).apply(lambda x: x.n)
-
-# Step 4: Build cohort revenue table
-cohort_revenue = orders.groupby(['cohort_month', 'months_since_first']).agg(
-    customers=('Customer ID', 'nunique'),
-    revenue=('order_revenue', 'sum')
-).reset_index()
-
-# Step 5: Calculate cohort sizes (how many customers in each cohort)
-cohort_sizes = cohort_revenue[cohort_revenue['months_since_first'] == 0][
-    ['cohort_month', 'customers']].rename(columns={'customers': 'cohort_size'})
-
-cohort_revenue = cohort_revenue.merge(cohort_sizes, on='cohort_month', how='left')
-
-# Step 6: Calculate retention rate per cohort month
-cohort_revenue['retention_rate'] = (
-    cohort_revenue['customers'] / cohort_revenue['cohort_size'] * 100
-).round(1)
-
-# Step 7: Calculate revenue per customer in cohort
-cohort_revenue['revenue_per_customer'] = (
-    cohort_revenue['revenue'] / cohort_revenue['cohort_size']
-).round(2)
+# Months are int32 indexes (the Period('M') ordinal), so cohort and age are
+# integer arithmetic; the cohort x age tables are bincounts (incremental_cohorts.py)
+
+# The cohort x age accumulators persist in cohort_state_path between runs:
+# a monthly refresh only ingests orders newer than the last run. A missing
+# or inconsistent state (e.g. a restated workbook) is rebuilt from scratch.
+# The full history is still loaded and collapsed above: the consistency
+# check and the rest of the report (customers, survival, baskets) need it
+cohort_state_path = '.cache/cohort_state.npz'
+
+# Step 1: Cohort (first purchase month) and months since first purchase per order
+if sample_fraction:
+    sampled_cohorts, cohort_index, months_since_first = estimate_cohorts(
+        customer_sample, orders['Customer ID'].to_numpy(),
+        month_index(orders['InvoiceDate']), orders['order_revenue'].to_numpy())
+    cohorts = sampled_cohorts.matrices
+else:
+    cohort_state = refresh_state(cohort_state_path,
+                                 orders['Customer ID'].to_numpy(),
+                                 orders['InvoiceDate'].to_numpy(),
+                                 orders['order_revenue'].to_numpy(),
+                                 orders['Invoice'].to_numpy())
+    cohorts = cohort_state.matrices
+    cohort_index = cohort_state.first_month_of(orders['Customer ID'].to_numpy())
+    months_since_first = month_index(orders['InvoiceDate']) - cohort_index
+orders['cohort_month'] = pd.PeriodIndex.from_ordinals(cohort_index, freq='M')
+orders['months_since_first'] = months_since_first
+
+# Steps 2-4: Cohort revenue table: distinct customers and revenue per (cohort, age),
+# each cohort's size (its month-0 customers), retention rate and revenue per
+# customer (cohort_report.py, shared with partitioned_cohorts.py)
+cohort_revenue = cohort_table(cohorts)
 
 print("\n--- COHORT TABLE SAMPLE ---")
 print(cohort_revenue[cohort_revenue['months_since_first'] <= 3].head(20))
@@ -104,42 +130,10 @@ print(cohort_revenue[cohort_revenue['months_since_first'] <= 3].head(20))
 # This is what tells you which acquisition channels are worth scaling.
 # ── LTV CALCULATIONS ───────────────────────────────────────
 
-# Cumulative revenue per customer at each month milestone
-ltv_summary = cohort_revenue.pivot_table(
-    index='cohort_month',
-    columns='months_since_first',
-    values='revenue_per_customer',
-    aggfunc='sum'
-).fillna(0)
-
-# Calculate cumulative LTV
-ltv_cumulative = ltv_summary.cumsum(axis=1)
-
-# Extract key LTV milestones
-ltv_milestones = pd.DataFrame()
-ltv_milestones['cohort_month'] = ltv_cumulative.index
-ltv_milestones = ltv_milestones.reset_index(drop=True)
-ltv_cumulative = ltv_cumulative.reset_index()
-
-# 30-day LTV (month 0 = first purchase month)
-if 0 in ltv_cumulative.columns:
-    ltv_milestones['ltv_30d'] = ltv_cumulative[0].values
-
-# 60-day LTV (month 1)
-if 1 in ltv_cumulative.columns:
-    ltv_milestones['ltv_60d'] = ltv_cumulative[1].values
-
-# 90-day LTV (month 2)
-if 2 in ltv_cumulative.columns:
-    ltv_milestones['ltv_90d'] = ltv_cumulative[2].values
-
-# 180-day LTV (month 5)
-if 5 in ltv_cumulative.columns:
-    ltv_milestones['ltv_180d'] = ltv_cumulative[5].values
-
-# Merge cohort sizes
-ltv_milestones = ltv_milestones.merge(
-    cohort_sizes, on='cohort_month', how='left')
+# Cumulative LTV at 30, 60, 90 and 180 days per cohort (month 0 = first
+# purchase month), with cohort sizes and the break-even CAC below
+cm_pct = 0.30  # contribution margin from Project 1
+ltv_milestones = ltv_milestone_table(cohorts, cohort_revenue, cm_pct)
 
 print("\n--- LTV BY COHORT ---")
 print(ltv_milestones.head(12).to_string())
@@ -148,18 +142,10 @@ print(ltv_milestones.head(12).to_string())
 # This is where LTV connects back to your Project 2 work. 
 # Now you know how much you can afford to pay to acquire a customer from each cohort.
 # ── BREAK-EVEN CAC ─────────────────────────────────────────
-cm_pct = 0.30  # contribution margin from Project 1
 
-# Break-even CAC = LTV * CM%
+# Break-even CAC = LTV * CM% (cm_pct above)
 # This is the maximum you can spend to acquire a customer
 # and still be profitable over that time period
-if 'ltv_30d' in ltv_milestones.columns:
-    ltv_milestones['breakeven_cac_30d'] = (ltv_milestones['ltv_30d'] * cm_pct).round(2)
-if 'ltv_90d' in ltv_milestones.columns:
-    ltv_milestones['breakeven_cac_90d'] = (ltv_milestones['ltv_90d'] * cm_pct).round(2)
-if 'ltv_180d' in ltv_milestones.columns:
-    ltv_milestones['breakeven_cac_180d'] = (ltv_milestones['ltv_180d'] * cm_pct).round(2)
-
 print("\n--- BREAK-EVEN CAC BY COHORT ---")
 cols = ['cohort_month', 'cohort_size', 'ltv_30d', 'ltv_90d', 
         'breakeven_cac_30d', 'breakeven_cac_90d']
@@ -171,15 +157,12 @@ print(ltv_milestones[available_cols].head(12).to_string())
 # Low retention means the brand is on a treadmill — constantly spending to acquire new customers because old ones never come back.
 # ── RETENTION ANALYSIS ─────────────────────────────────────
 
-# Retention pivot table
-retention_pivot = cohort_revenue.pivot_table(
-    index='cohort_month',
-    columns='months_since_first',
-    values='retention_rate'
-).round(1)
+# Retention pivot table (blank where a cohort had no active customers)
+retention_pivot = cohorts.frame(
+    np.where(cohorts.customers > 0, np.round(cohorts.retention, 1), np.nan))
 
 # Average retention by month
-avg_retention = cohort_revenue.groupby('months_since_first')['retention_rate'].mean().round(1)
+avg_retention = average_retention(cohort_revenue)
 
 print("\n--- AVERAGE RETENTION BY MONTH ---")
 print(avg_retention.head(12))
@@ -190,39 +173,50 @@ if 2 in retention_pivot.columns:
     print(f"\nBest 90-day retention cohort: {retention_90d.index[0]} at {retention_90d.iloc[0]}%")
     print(f"Worst 90-day retention cohort: {retention_90d.index[-1]} at {retention_90d.iloc[-1]}%")
 
+# Fine-grained cohorts for fast-moving brands: 'D' (daily), 'W' (weekly) or
+# 'M'. The cohort x age matrices are sparse, and only the cohorts starting in
+# [detail_start, detail_end] and ages up to detail_max_age are densified
+cohort_granularity = 'W'
+detail_start, detail_end = None, None
+detail_max_age = 26
+fine_cohorts, _, _ = build_sparse_cohorts(orders['Customer ID'].to_numpy(),
+                                          orders['InvoiceDate'].to_numpy(),
+                                          orders['order_revenue'].to_numpy(),
+                                          granularity=cohort_granularity)
+retention_detail = fine_cohorts.window(fine_cohorts.retention, detail_start, detail_end,
+                                       detail_max_age).round(1)
+ltv_detail = fine_cohorts.window(fine_cohorts.cumulative_ltv, detail_start, detail_end,
+                                 detail_max_age, fill=True).round(2)
+
+period_name = GRANULARITIES[cohort_granularity]
+print(f"\n--- AVERAGE RETENTION BY {period_name.upper()} ---")
+print(retention_detail.mean().round(1).head(12))
+
+### TIME TO SECOND PURCHASE
+# Retention shows who is active in a month; survival answers how long it takes
+# a new customer to come back. Customers who have not reordered yet are
+# censored at the last date in the data, so recent cohorts are not penalised.
+# ── REPEAT PURCHASE SURVIVAL ───────────────────────────────
+
+survival_days = [30, 60, 90, 180, 365]
+survival_curves, repeat_survival = repeat_purchase_survival(
+    orders['Customer ID'].to_numpy(), orders['InvoiceDate'].to_numpy(),
+    times=survival_days)
+
+print("\n--- TIME TO SECOND PURCHASE (share without a 2nd order) ---")
+print(repeat_survival.head(12).to_string(index=False))
+
 
 ### CUSTOMER SEGMENTATION
 # This segments customers into high value, mid value, and low value based on their total spend. 
 # In a real engagement this tells the founder which customers to prioritize for retention campaigns in Klaviyo.
 # ── CUSTOMER SEGMENTATION ──────────────────────────────────
 
-# Total revenue and orders per customer
-customer_summary = orders.groupby('Customer ID').agg(
-    total_revenue=('order_revenue', 'sum'),
-    total_orders=('Invoice', 'nunique'),
-    avg_order_value=('order_revenue', 'mean'),
-    first_purchase=('InvoiceDate', 'min'),
-    last_purchase=('InvoiceDate', 'max')
-).reset_index()
-
-customer_summary['avg_order_value'] = customer_summary['avg_order_value'].round(2)
-customer_summary['total_revenue'] = customer_summary['total_revenue'].round(2)
-
-# Customer lifetime in days
-customer_summary['customer_lifetime_days'] = (
-    customer_summary['last_purchase'] - customer_summary['first_purchase']
-).dt.days
-
-# Segment by total revenue
-def segment_customer(revenue):
-    if revenue >= customer_summary['total_revenue'].quantile(0.75):
-        return 'High Value'
-    elif revenue >= customer_summary['total_revenue'].quantile(0.25):
-        return 'Mid Value'
-    else:
-        return 'Low Value'
-
-customer_summary['segment'] = customer_summary['total_revenue'].apply(segment_customer)
+# Total revenue and orders per customer (rounded to cents), and lifetime in days
+customer_summary = customer_level(orders)
+
+# Segment by total revenue (25th / 75th percentiles, computed once)
+customer_summary['segment'] = value_segment(customer_summary['total_revenue'])
 
 print("\n--- CUSTOMER SEGMENTATION ---")
 segment_stats = customer_summary.groupby('segment').agg(
@@ -233,14 +227,83 @@ segment_stats = customer_summary.groupby('segment').agg(
 ).round(2)
 print(segment_stats)
 
+top_customer = customer_summary.loc[customer_summary['total_revenue'].idxmax(), 'Customer ID']
+print(f"\nTop customer {top_customer}: {customer_store.summary(top_customer)}")
+
+# RFM segmentation: recency (days since last order), frequency (orders) and
+# monetary (revenue) scores from 'quantile' or 'jenks' breakpoints
+rfm_bins = 5
+rfm_method = 'quantile'
+as_of_date = orders['InvoiceDate'].max().normalize() + pd.Timedelta(days=1)
+customer_summary['recency_days'] = (as_of_date - customer_summary['last_purchase']).dt.days
+rfm = rfm_scores(customer_summary['recency_days'], customer_summary['total_orders'],
+                 customer_summary['total_revenue'], n_bins=rfm_bins, method=rfm_method)
+customer_summary = pd.concat([customer_summary, rfm], axis=1)
+
+print("\n--- RFM SEGMENTS ---")
+rfm_stats = customer_summary.groupby('rfm_segment', observed=True).agg(
+    customers=('Customer ID', 'count'),
+    avg_recency_days=('recency_days', 'mean'),
+    avg_orders=('total_orders', 'mean'),
+    avg_revenue=('total_revenue', 'mean'),
+    total_revenue=('total_revenue', 'sum')
+).round(2)
+rfm_stats['revenue_share'] = (rfm_stats['total_revenue'] / rfm_stats['total_revenue'].sum() * 100).round(1)
+print(rfm_stats)
+
+### PROBABILISTIC LTV
+# Historical LTV only covers what cohorts have already spent. BG/NBD forecasts
+# each customer's future orders (and the chance they are still active), and
+# Gamma-Gamma their expected order value; together they give a forward LTV.
+# ── PROBABILISTIC LTV ──────────────────────────────────────
+
+ltv_horizons = [90, 180, 365]
+features = customer_features(customer_summary, as_of_date)
+predictions, bgnbd, gamma_gamma = predict_ltv(features, ltv_horizons)
+customer_summary = customer_summary.join(predictions)
+predicted_ltv = cohort_ltv(predictions, customer_summary['first_purchase'].dt.to_period('M'))
+
+print("\n--- PROBABILISTIC LTV ---")
+print(f"BG/NBD: r={bgnbd.r:.3f} alpha={bgnbd.alpha:.2f} a={bgnbd.a:.3f} b={bgnbd.b:.3f}")
+print(f"Gamma-Gamma: p={gamma_gamma.p:.3f} q={gamma_gamma.q:.3f} v={gamma_gamma.v:.2f}")
+print(predicted_ltv.to_string(index=False))
+
+### PRODUCT AFFINITY
+# Which products are bought together, and which first-order products bring
+# customers back. Invoices x StockCodes is a sparse 0/1 matrix; pair counts
+# come from X.T @ X after dropping products below the support threshold.
+# ── MARKET BASKET ──────────────────────────────────────────
+
+basket_min_support = 0.01   # share of invoices a pair must appear on
+basket_top_k = 50
+basket, basket_invoices, basket_items = incidence_matrix(df['Invoice'].to_numpy(),
+                                                         df['StockCode'].to_numpy())
+product_pairs = item_pairs(basket, basket_items, min_support=basket_min_support, top_k=basket_top_k)
+
+# Repeat drivers: products in each customer's first order vs ordering again
+first_orders = orders.sort_values('InvoiceDate').drop_duplicates('Customer ID')
+first_basket = basket[pd.Index(basket_invoices).get_indexer(first_orders['Invoice'])]
+repeated = first_orders['Customer ID'].map(
+    customer_summary.set_index('Customer ID')['total_orders']).to_numpy() > 1
+product_repeat_drivers = repeat_drivers(first_basket, basket_items, repeated, top_k=basket_top_k)
+
+descriptions = df.drop_duplicates('StockCode').set_index('StockCode')['Description']
+product_pairs.insert(1, 'description_a', product_pairs['item_a'].map(descriptions))
+product_pairs.insert(3, 'description_b', product_pairs['item_b'].map(descriptions))
+product_repeat_drivers.insert(1, 'description', product_repeat_drivers['item'].map(descriptions))
+
+print("\n--- TOP PRODUCT PAIRS (by lift) ---")
+print(product_pairs.head(10).round(3).to_string(index=False))
+print("\n--- FIRST-ORDER PRODUCTS THAT DRIVE REPEAT PURCHASE ---")
+print(product_repeat_drivers.head(10).round(3).to_string(index=False))
+
 ### SAFE SCALING THRESHOLDS
 # This is the output that directly informs scaling decisions. 
 # It answers: given what we know about LTV, what is the maximum safe CAC per channel?
 # ── SCALING THRESHOLDS ─────────────────────────────────────
 
-avg_ltv_30d = ltv_milestones['ltv_30d'].mean() if 'ltv_30d' in ltv_milestones.columns else 0
-avg_ltv_90d = ltv_milestones['ltv_90d'].mean() if 'ltv_90d' in ltv_milestones.columns else 0
-avg_ltv_180d = ltv_milestones['ltv_180d'].mean() if 'ltv_180d' in ltv_milestones.columns else 0
+avg_ltv = average_ltv(ltv_milestones)
+avg_ltv_30d, avg_ltv_90d, avg_ltv_180d = avg_ltv['ltv_30d'], avg_ltv['ltv_90d'], avg_ltv['ltv_180d']
 
 avg_retention_month1 = avg_retention.get(1, 0)
 avg_retention_month2 = avg_retention.get(2, 0)
@@ -257,39 +320,21 @@ print(f"Max safe CAC (180-day payback): ${avg_ltv_180d * cm_pct:.2f}")
 
 ### EXPORT CLIENT REPORT
 # ── EXPORT EXCEL REPORT ────────────────────────────────────
+# Totals come from the cohort matrices in sampling mode (scaled estimates)
+total_customers = customer_summary['Customer ID'].nunique()
+total_orders = len(orders)
+total_revenue = orders['order_revenue'].sum()
+if sample_fraction:
+    total_customers = int(cohorts.cohort_size.sum())
+    total_orders = int(round(cohorts.orders.sum()))
+    total_revenue = cohorts.revenue.sum()
+
 with pd.ExcelWriter('AI_Profit_LTV_Cohort_Report.xlsx', engine='openpyxl') as writer:
 
     # Tab 1: Executive Summary
-    summary = pd.DataFrame({
-        'Metric': [
-            'Total Customers Analyzed',
-            'Total Orders Analyzed',
-            'Total Revenue Analyzed',
-            'Average Order Value',
-            'Average 30-Day LTV',
-            'Average 90-Day LTV',
-            'Average 180-Day LTV',
-            'Average Month 1 Retention Rate',
-            'Average Month 2 Retention Rate',
-            'Max Safe CAC (30-day payback)',
-            'Max Safe CAC (90-day payback)',
-            'Max Safe CAC (180-day payback)'
-        ],
-        'Value': [
-            f"{customer_summary['Customer ID'].nunique():,}",
-            f"{len(orders):,}",
-            f"${orders['order_revenue'].sum():,.2f}",
-            f"${orders['order_revenue'].mean():.2f}",
-            f"${avg_ltv_30d:.2f}",
-            f"${avg_ltv_90d:.2f}",
-            f"${avg_ltv_180d:.2f}",
-            f"{avg_retention_month1:.1f}%",
-            f"{avg_retention_month2:.1f}%",
-            f"${avg_ltv_30d * cm_pct:.2f}",
-            f"${avg_ltv_90d * cm_pct:.2f}",
-            f"${avg_ltv_180d * cm_pct:.2f}"
-        ]
-    })
+    summary = executive_summary(total_customers, total_orders, total_revenue,
+                                orders['order_revenue'].mean(), ltv_milestones,
+                                avg_retention, cm_pct)
     summary.to_excel(writer, sheet_name='Executive Summary', index=False)
 
     # Tab 2: LTV by cohort
@@ -304,5 +349,26 @@ with pd.ExcelWriter('AI_Profit_LTV_Cohort_Report.xlsx', engine='openpyxl') as wr
     # Tab 5: Cohort detail
     cohort_revenue.to_excel(writer, sheet_name='Cohort Detail', index=False)
 
+    # Tab 6: RFM segment summary
+    rfm_stats.to_excel(writer, sheet_name='RFM Segments')
+
+    # Tab 7: Predicted LTV by cohort
+    predicted_ltv.to_excel(writer, sheet_name='Predicted LTV By Cohort', index=False)
+
+    # Tab 8-9: Retention and cumulative LTV at cohort_granularity
+    retention_detail.to_excel(writer, sheet_name=f'Retention By {period_name.title()}')
+    ltv_detail.to_excel(writer, sheet_name=f'LTV By {period_name.title()}')
+
+    # Tab 10: Kaplan-Meier time to second purchase per cohort
+    repeat_survival.to_excel(writer, sheet_name='Repeat Purchase Survival', index=False)
+
+    # Tab 11-12: Product affinity
+    product_pairs.round(4).to_excel(writer, sheet_name='Product Pairs', index=False)
+    product_repeat_drivers.round(4).to_excel(writer, sheet_name='Repeat Drivers', index=False)
+
+    # Tab 13 (sampling mode): standard errors of the scaled cohort cells
+    if sample_fraction:
+        sampled_cohorts.to_long().round(4).to_excel(writer, sheet_name='Sampling Error', index=False)
+
 print("\nReport exported: AI_Profit_LTV_Cohort_Report.xlsx")
 print("\n--- PROJECT 3 COMPLETE ---")
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cohort_engine import CohortMatrices, build_cohorts, month_index
+from cohort_report import average_retention, cohort_table, executive_summary, ltv_milestone_table
+from retail_loader import _pool_context, retail_cache
+from retail_transforms import clean_lines, customer_level, order_level
+from rfm_segmentation import rfm_scores, value_segment
+from sampling import customer_hash
+
+
+class QuantileSketch:
+    """Mergeable quantile summary: value -> count.
+
+    With relative_accuracy=None values are kept exactly (use for integer
+    metrics such as order counts or days, where the distinct values are
+    few) and quantile() equals np.quantile. Otherwise positive values go to
+    logarithmic buckets of width 2 * relative_accuracy (as in DDSketch), so
+    size stays small for any number of values and every quantile is within
+    relative_accuracy of a value in the data. Merging adds counts.
+    """
+
+    def __init__(self, relative_accuracy: float | None = None):
+        self.relative_accuracy = relative_accuracy
+        if relative_accuracy is not None:
+            self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.keys = np.empty(0)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def _key(self, values: np.ndarray) -> np.ndarray:
+        if self.relative_accuracy is None:
+            return values
+        if (values <= 0).any():
+            raise ValueError("relative-accuracy sketches take positive values only")
+        return np.ceil(np.log(values) / np.log(self._gamma))
+
+    def _value(self, keys: np.ndarray) -> np.ndarray:
+        if self.relative_accuracy is None:
+            return keys
+        return 2 * self._gamma ** keys / (self._gamma + 1)
+
+    def _combine(self, keys: np.ndarray, counts: np.ndarray) -> None:
+        keys = np.concatenate([self.keys, keys])
+        counts = np.concatenate([self.counts, counts])
+        self.keys, where = np.unique(keys, return_inverse=True)
+        self.counts = np.bincount(where, weights=counts).astype(np.int64)
+
+    def add(self, values) -> 'QuantileSketch':
+        keys, counts = np.unique(self._key(np.asarray(values, dtype=float)), return_counts=True)
+        self._combine(keys, counts)
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        self._combine(other.keys, other.counts)
+        return self
+
+    def quantile(self, q) -> np.ndarray:
+        """Linear interpolation between order statistics, like np.quantile."""
+        q = np.asarray(q, dtype=float)
+        position = q * (self.counts.sum() - 1)
+        below, above = np.floor(position), np.ceil(position)
+        ends = np.cumsum(self.counts)
+        values = self._value(self.keys)
+        low = values[np.searchsorted(ends, below, side='right')]
+        high = values[np.searchsorted(ends, above, side='right')]
+        return low + (position - below) * (high - low)
+
+
+def partition_lines(cache_path, out_dir, n_partitions: int, batch_rows: int = 1_000_000):
+    """Clean the cache batch by batch and write it as n_partitions Parquet files.
+
+    A customer's partition is floor(customer_hash * n_partitions), so each
+    customer's lines all land in one file. Memory is bounded by batch_rows.
+    Returns (paths, last order timestamp).
+    """
+    out_dir = Path(out_dir)
+    tmp = out_dir.with_name(out_dir.name + '.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    paths = [tmp / f'part-{i:03d}.parquet' for i in range(n_partitions)]
+    writers = [None] * n_partitions
+    last_order = None
+    try:
+        for batch in pq.ParquetFile(cache_path).iter_batches(batch_size=batch_rows):
+            lines = clean_lines(batch.to_pandas())
+            if lines.empty:
+                continue
+            batch_last = lines['InvoiceDate'].max()
+            last_order = batch_last if last_order is None else max(last_order, batch_last)
+            part = (customer_hash(lines['Customer ID']) * n_partitions).astype(np.int64)
+            for i, rows in lines.groupby(part).indices.items():
+                table = pa.Table.from_pandas(lines.iloc[rows], preserve_index=False)
+                if writers[i] is None:
+                    writers[i] = pq.ParquetWriter(paths[i], table.schema)
+                writers[i].write_table(table)
+    finally:
+        for writer in writers:
+            if writer is not None:
+                writer.close()
+    shutil.rmtree(out_dir, ignore_errors=True)
+    tmp.rename(out_dir)
+    return [out_dir / p.name for i, p in enumerate(paths) if writers[i] is not None], last_order
+
+
+@dataclass
+class Partials:
+    """What one partition contributes: additive cohort matrices, its customers' rows, sketches."""
+    matrices: CohortMatrices
+    customer_summary: pd.DataFrame
+    sketches: dict = field(default_factory=dict)
+
+
+def _sketches(customer_summary: pd.DataFrame, relative_accuracy: float | None) -> dict:
+    return {
+        'total_revenue': QuantileSketch(relative_accuracy).add(customer_summary['total_revenue']),
+        'total_orders': QuantileSketch().add(customer_summary['total_orders']),
+        'recency_days': QuantileSketch().add(customer_summary['recency_days']),
+    }
+
+
+def partition_partials(path, as_of_date, relative_accuracy: float | None = 0.001) -> Partials:
+    """Order collapse, cohort matrices and customer summary for one partition.
+
+    Same retail_transforms rollups as ltv_cohort.py. Customers never span partitions, so the
+    distinct-customer cells and per-customer rows are already final.
+    """
+    orders = order_level(pd.read_parquet(path))
+    matrices, _, _ = build_cohorts(orders['Customer ID'].to_numpy(),
+                                   month_index(orders['InvoiceDate']),
+                                   orders['order_revenue'].to_numpy())
+
+    customer_summary = customer_level(orders)
+    customer_summary['recency_days'] = (as_of_date - customer_summary['last_purchase']).dt.days
+    return Partials(matrices, customer_summary, _sketches(customer_summary, relative_accuracy))
+
+
+def merge_matrices(parts) -> CohortMatrices:
+    """Sum cohort matrices that may start at different months and have different shapes."""
+    parts = [m for m in parts if m.customers.size]
+    first = min(m.first_month for m in parts)
+    n_cohorts = max(m.first_month + m.customers.shape[0] for m in parts) - first
+    n_ages = max(m.first_month + m.customers.shape[1] for m in parts) - first
+    out = [np.zeros((n_cohorts, n_ages), dtype=dtype) for dtype in (np.int64, float, np.int64)]
+    for m in parts:
+        r, (rows, cols) = m.first_month - first, m.customers.shape
+        for total, part in zip(out, (m.customers, m.revenue, m.orders)):
+            total[r:r + rows, :cols] += part
+    return CohortMatrices(first, *out)
+
+
+def run_partitioned(cache_path, n_partitions: int = 8, workers: int | None = None,
+                    work_dir='.cache/partitions', rfm_bins: int = 5,
+                    relative_accuracy: float | None = 0.001):
+    """Cohort matrices and segmented customer summary via customer-hash partitions.
+
+    The driver streams the cache into partitions, a process pool computes
+    Partials per partition, and the driver merges them: matrices are
+    added, customer rows concatenated, and the quantile sketches merged to
+    give the value-segment and RFM breakpoints. Counts are exact; revenue
+    cells can differ from the single-process run in the last digits
+    (summation order); revenue breakpoints are within relative_accuracy,
+    or exact with relative_accuracy=None (a histogram of the distinct
+    revenues, bigger but still per customer rather than per line).
+    Returns (matrices, customer_summary, as_of_date); raises ValueError when
+    no line item survives cleaning.
+    """
+    paths, last_order = partition_lines(cache_path, work_dir, n_partitions)
+    if not paths:
+        raise ValueError(f"{cache_path}: no line items left after cleaning")
+    as_of_date = last_order.normalize() + pd.Timedelta(days=1)
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+
+    ctx = _pool_context() if workers > 1 else None
+    if ctx is not None:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            partials = list(pool.map(partition_partials, paths, [as_of_date] * len(paths),
+                                     [relative_accuracy] * len(paths)))
+    else:
+        partials = [partition_partials(p, as_of_date, relative_accuracy) for p in paths]
+
+    matrices = merge_matrices([p.matrices for p in partials])
+    customer_summary = pd.concat([p.customer_summary for p in partials], ignore_index=True)
+    customer_summary = customer_summary.sort_values('Customer ID', ignore_index=True)
+    sketches = partials[0].sketches
+    for p in partials[1:]:
+        for name, sketch in p.sketches.items():
+            sketches[name].merge(sketch)
+
+    customer_summary.insert(customer_summary.columns.get_loc('customer_lifetime_days') + 1, 'segment',
+                            value_segment(customer_summary['total_revenue'],
+                                          edges=sketches['total_revenue'].quantile([0.25, 0.75])))
+    inner = np.arange(1, rfm_bins) / rfm_bins
+    edges = [np.unique(sketches[name].quantile(inner))
+             for name in ('recency_days', 'total_orders', 'total_revenue')]
+    rfm = rfm_scores(customer_summary['recency_days'], customer_summary['total_orders'],
+                     customer_summary['total_revenue'], n_bins=rfm_bins, edges=edges)
+    return matrices, pd.concat([customer_summary, rfm], axis=1), as_of_date
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description="Customer-hash partitioned cohort / segmentation run")
+    ap.add_argument('--workbook', default='online_retail_II.xlsx')
+    ap.add_argument('--cache', default=None, help="Parquet lines file (default: the workbook's cache)")
+    ap.add_argument('--partitions', type=int, default=8)
+    ap.add_argument('--workers', type=int, default=None)
+    ap.add_argument('--relative_accuracy', type=float, default=0.001,
+                    help="revenue sketch accuracy; 0 keeps exact values (identical segments)")
+    ap.add_argument('--cm_pct', type=float, default=0.30,
+                    help="contribution margin for the break-even CAC columns")
+    ap.add_argument('--out', default='AI_Profit_LTV_Cohort_Partitioned.xlsx')
+    args = ap.parse_args()
+
+    start = time.perf_counter()
+    cache = args.cache or retail_cache(args.workbook)
+    cohorts, customer_summary, as_of_date = run_partitioned(
+        cache, args.partitions, args.workers, relative_accuracy=args.relative_accuracy or None)
+    print(f"{len(customer_summary):,} customers, {int(cohorts.orders.sum()):,} orders "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    # The report tabs of ltv_cohort.py, from the merged matrices
+    cohort_detail = cohort_table(cohorts)
+    ltv_milestones = ltv_milestone_table(cohorts, cohort_detail, args.cm_pct)
+    retention_pivot = cohorts.frame(np.where(cohorts.customers > 0, np.round(cohorts.retention, 1), np.nan))
+    total_orders, total_revenue = int(cohorts.orders.sum()), cohorts.revenue.sum()
+    summary = executive_summary(len(customer_summary), total_orders, total_revenue,
+                                total_revenue / total_orders, ltv_milestones,
+                                average_retention(cohort_detail), args.cm_pct)
+    print(retention_pivot.iloc[:12, :7])
+
+    with pd.ExcelWriter(args.out, engine='openpyxl') as writer:
+        summary.to_excel(writer, sheet_name='Executive Summary', index=False)
+        ltv_milestones.to_excel(writer, sheet_name='LTV By Cohort', index=False)
+        retention_pivot.to_excel(writer, sheet_name='Retention Table')
+        customer_summary.to_excel(writer, sheet_name='Customer Segments', index=False)
+        cohort_detail.to_excel(writer, sheet_name='Cohort Detail', index=False)
+    print(f"Report exported: {args.out}")
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import pandas as pd
+import polars as pl
+
+from retail_loader import DTYPES
+from retail_transforms import (CANCELLED_PREFIX, ORDER_KEYS, POSITIVE_COLUMNS, REQUIRED_COLUMNS,
+                               group_revenue)
+
+LINE_COLUMNS = ['Invoice', 'StockCode', 'Description', 'Quantity', 'InvoiceDate',
+                'Price', 'Customer ID', 'Country']
+
+
+def scan_lines(cache_path) -> pl.LazyFrame:
+    """The Parquet cache as a lazy scan: only the columns the plan uses are read."""
+    return pl.scan_parquet(cache_path).select(LINE_COLUMNS)
+
+
+def clean_lines(lines: pl.LazyFrame) -> pl.LazyFrame:
+    """retail_transforms' cleaning rules as one fused filter plus revenue.
+
+    Null handling mirrors pandas: a null Invoice is kept (pandas compares
+    the string '<NA>'), NaN values are dropped (polars orders NaN above 0).
+    """
+    keep = ~pl.col('Invoice').str.starts_with(CANCELLED_PREFIX).fill_null(False)
+    for column in REQUIRED_COLUMNS:
+        keep &= pl.col(column).is_not_null() & pl.col(column).is_not_nan()
+    for column in POSITIVE_COLUMNS:
+        keep &= (pl.col(column) > 0) & pl.col(column).is_not_nan()
+    return (
+        lines
+        .filter(keep)
+        .with_columns(pl.col('Customer ID').cast(pl.Int64),
+                      (pl.col('Quantity') * pl.col('Price')).alias('revenue'))
+    )
+
+
+def order_level(lines: pl.LazyFrame):
+    """Orders sorted by the keys like pandas groupby (null keys dropped), and
+    each line's order_code (its order's row; null where a key is null).
+
+    order_revenue is left out: run_pipeline adds it with group_revenue so
+    the float sums are pandas' own.
+    """
+    orders = (
+        lines
+        .drop_nulls(ORDER_KEYS)
+        .group_by(ORDER_KEYS)
+        .agg(items_purchased=pl.col('Quantity').sum(),
+             unique_products=pl.col('StockCode').drop_nulls().n_unique().cast(pl.Int64))
+        .sort(ORDER_KEYS)
+        .with_row_index('order_code')
+    )
+    codes = (
+        lines
+        .join(orders.select(*ORDER_KEYS, 'order_code'), on=ORDER_KEYS, how='left',
+              maintain_order='left')
+        .select('order_code', 'revenue')
+    )
+    return orders, codes
+
+
+def _to_pandas(frame: pl.DataFrame) -> pd.DataFrame:
+    """Back to the pandas dtypes the rest of ltv_cohort.py sees (string columns as 'string')."""
+    out = frame.to_pandas()
+    return out.astype({col: 'string' for col, dtype in DTYPES.items()
+                       if dtype == 'string' and col in out})
+
+
+def run_pipeline(cache_path):
+    """Clean lines and orders from one lazy plan.
+
+    Both share the scan and the fused cleaning filter and are collected
+    together; the filter and the groupby keys run on all cores. Order
+    revenue is summed by retail_transforms.group_revenue in line order, as
+    the pandas groupby does, so the (lines, orders) pandas frames returned
+    are identical to the pandas engine's; customer totals come from
+    retail_transforms.customer_level as for pandas.
+    """
+    lines = clean_lines(scan_lines(cache_path))
+    orders, codes = order_level(lines)
+    lines, orders, codes = pl.collect_all([lines, orders, codes])
+    codes = codes.drop_nulls('order_code')
+    revenue = group_revenue(codes['revenue'].to_numpy(), codes['order_code'].to_numpy())
+    orders = orders.drop('order_code').insert_column(len(ORDER_KEYS), pl.Series('order_revenue', revenue))
+    return _to_pandas(lines), _to_pandas(orders)
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+from scipy.special import gammaln, hyp2f1
+
+
+@dataclass
+class BGNBDParams:
+    """BG/NBD: purchase rate ~ Gamma(r, alpha), dropout probability ~ Beta(a, b)."""
+    r: float
+    alpha: float
+    a: float
+    b: float
+
+
+@dataclass
+class GammaGammaParams:
+    """Gamma-Gamma: order value ~ Gamma(p, nu), nu ~ Gamma(q, v)."""
+    p: float
+    q: float
+    v: float
+
+
+def customer_features(customer_summary: pd.DataFrame, as_of) -> pd.DataFrame:
+    """BG/NBD / Gamma-Gamma inputs per customer, in days.
+
+    frequency: repeat orders (total_orders - 1); recency: first to last
+    order; T: first order to as_of; monetary: mean order value.
+    """
+    first = customer_summary['first_purchase']
+    return pd.DataFrame({
+        'frequency': customer_summary['total_orders'].to_numpy() - 1,
+        'recency': (customer_summary['last_purchase'] - first).dt.days.to_numpy(),
+        'T': (pd.Timestamp(as_of) - first).dt.days.to_numpy(),
+        'monetary': (customer_summary['total_revenue'] / customer_summary['total_orders']).to_numpy(),
+    }, index=customer_summary.index)
+
+
+def _compress(*columns, inverse: bool = False):
+    """Unique rows of non-negative integer feature columns with their counts (weights).
+
+    With inverse=True also returns each input row's position among the unique rows.
+    """
+    columns = [np.asarray(c, dtype=np.int64) for c in columns]
+    key = np.zeros(len(columns[0]), dtype=np.int64)
+    for col in columns:
+        key = key * (int(col.max()) + 1) + col
+    _, first, where, counts = np.unique(key, return_index=True, return_inverse=True,
+                                        return_counts=True)
+    unique = [col[first] for col in columns]
+    if inverse:
+        return unique, counts.astype(float), where
+    return unique, counts.astype(float)
+
+
+def fit_bgnbd(frequency, recency, T) -> BGNBDParams:
+    """Maximum-likelihood BG/NBD fit (Fader, Hardie & Lee 2005, eq. 6).
+
+    Customers share (frequency, recency, T) tuples heavily (day resolution,
+    mostly one-time buyers), so the likelihood runs over the distinct tuples
+    weighted by their counts. Within that, the gammaln terms depend only on
+    frequency and the log terms only on recency or T, so each is evaluated
+    once per distinct value and gathered. Parameters are fitted on the log scale.
+    """
+    (x, t_x, t), w = _compress(frequency, recency, T)
+    xu, xi = np.unique(x, return_inverse=True)
+    txu, txi = np.unique(t_x, return_inverse=True)
+    tu, ti = np.unique(t, return_inverse=True)
+    xu, txu, tu = xu.astype(float), txu.astype(float), tu.astype(float)
+    repeat = x > 0
+    weight = w / w.sum()
+
+    def objective(log_params):
+        r, alpha, a, b = np.exp(log_params)
+        by_x = (gammaln(r + xu) - gammaln(r) + r * np.log(alpha)
+                + gammaln(a + b) + gammaln(b + xu) - gammaln(b) - gammaln(a + b + xu))
+        rx = (r + xu)[xi]
+        a3 = -rx * np.log(alpha + tu)[ti]
+        dropout = np.log(a) - np.log(np.maximum(b + xu - 1, 1e-12))
+        a4 = np.where(repeat, dropout[xi] - rx * np.log(alpha + txu)[txi], -np.inf)
+        return -(weight * (by_x[xi] + np.logaddexp(a3, a4))).sum()
+
+    start = np.log([1.0, max(np.average(t, weights=w), 1.0), 1.0, 1.0])
+    result = minimize(objective, start, method='L-BFGS-B', bounds=[(-10, 10)] * 4)
+    return BGNBDParams(*np.exp(result.x))
+
+
+def expected_purchases(params: BGNBDParams, horizon, frequency, recency, T) -> np.ndarray:
+    """Expected orders in the next `horizon` days, given each customer's history."""
+    r, alpha, a, b = params.r, params.alpha, params.a, params.b
+    x = np.asarray(frequency, dtype=float)
+    t_x = np.asarray(recency, dtype=float)
+    T = np.asarray(T, dtype=float)
+    z = horizon / (alpha + T + horizon)
+    head = (a + b + x - 1) / (a - 1)
+    body = 1 - ((alpha + T) / (alpha + T + horizon)) ** (r + x) * hyp2f1(r + x, b + x, a + b + x - 1, z)
+    return head * body / _alive_denominator(params, x, t_x, T)
+
+
+def _alive_denominator(params: BGNBDParams, x, t_x, T) -> np.ndarray:
+    ratio = ((params.alpha + T) / (params.alpha + t_x)) ** (params.r + x)
+    return 1 + np.where(x > 0, params.a / np.maximum(params.b + x - 1, 1e-12) * ratio, 0)
+
+
+def p_alive(params: BGNBDParams, frequency, recency, T) -> np.ndarray:
+    """Probability each customer has not dropped out by T."""
+    return 1 / _alive_denominator(params, np.asarray(frequency, dtype=float),
+                                  np.asarray(recency, dtype=float), np.asarray(T, dtype=float))
+
+
+def fit_gamma_gamma(frequency, monetary) -> GammaGammaParams:
+    """Gamma-Gamma fit of mean order value on repeat customers (Fader & Hardie 2013).
+
+    (orders, mean value in cents) pairs are de-duplicated into weights, and
+    the gammaln terms are evaluated once per distinct order count.
+    """
+    frequency = np.asarray(frequency)
+    monetary = np.asarray(monetary, dtype=float)
+    repeat = (frequency > 0) & (monetary > 0)
+    (x, cents), w = _compress(frequency[repeat] + 1, np.rint(monetary[repeat] * 100))
+    xu, xi = np.unique(x, return_inverse=True)
+    xu = xu.astype(float)
+    x, m = x.astype(float), cents / 100
+    log_m, log_x = np.log(m), np.log(x)
+    weight = w / w.sum()
+
+    def objective(log_params):
+        p, q, v = np.exp(log_params)
+        by_x = gammaln(p * xu + q) - gammaln(p * xu) - gammaln(q) + q * np.log(v)
+        px = p * x
+        ll = by_x[xi] + (px - 1) * log_m + px * log_x - (px + q) * np.log(v + m * x)
+        return -(weight * ll).sum()
+
+    start = np.log([1.0, 2.0, max(np.average(m, weights=w), 1.0)])
+    result = minimize(objective, start, method='L-BFGS-B', bounds=[(-10, 10), (-10, 10), (-10, 15)])
+    return GammaGammaParams(*np.exp(result.x))
+
+
+def expected_order_value(params: GammaGammaParams, frequency, monetary) -> np.ndarray:
+    """Posterior mean order value: a weighted blend of the population and own average."""
+    p, q, v = params.p, params.q, params.v
+    x = np.asarray(frequency, dtype=float) + 1
+    m = np.asarray(monetary, dtype=float)
+    return (p * (v + x * m)) / (p * x + q - 1)
+
+
+def predict_ltv(features: pd.DataFrame, horizons=(90, 180, 365)):
+    """Fit both models and predict revenue per customer over each horizon (days).
+
+    Returns (predictions, bgnbd_params, gamma_gamma_params); predictions has
+    p_alive, expected_order_value and pred_purchases_{h}d / pred_ltv_{h}d.
+    """
+    f, rec, T, m = (features[c].to_numpy() for c in ['frequency', 'recency', 'T', 'monetary'])
+    bg = fit_bgnbd(f, rec, T)
+    gg = fit_gamma_gamma(f, m)
+
+    # Purchase forecasts depend only on the (frequency, recency, T) tuple
+    (fu, ru, tu), _, where = _compress(f, rec, T, inverse=True)
+    out = pd.DataFrame(index=features.index)
+    out['p_alive'] = p_alive(bg, fu, ru, tu)[where].round(4)
+    value = expected_order_value(gg, f, m)
+    out['expected_order_value'] = value.round(2)
+    for h in horizons:
+        purchases = expected_purchases(bg, h, fu, ru, tu)[where]
+        out[f'pred_purchases_{h}d'] = purchases.round(3)
+        out[f'pred_ltv_{h}d'] = (purchases * value).round(2)
+    return out, bg, gg
+
+
+def cohort_ltv(predictions: pd.DataFrame, cohort) -> pd.DataFrame:
+    """Mean predicted LTV per customer for each cohort, plus cohort totals."""
+    ltv_cols = [c for c in predictions.columns if c.startswith('pred_ltv_')]
+    frame = predictions[['p_alive'] + ltv_cols].assign(cohort_month=np.asarray(cohort))
+    grouped = frame.groupby('cohort_month')
+    out = grouped[['p_alive'] + ltv_cols].mean().round(2)
+    out.insert(0, 'customers', grouped.size())
+    for col in ltv_cols:
+        out[col.replace('pred_ltv_', 'total_pred_ltv_')] = grouped[col].sum().round(2)
+    return out.reset_index()
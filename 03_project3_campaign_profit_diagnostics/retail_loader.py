@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import load_workbook
+
+SHEETS = ['Year 2009-2010', 'Year 2010-2011']
+
+# Column types of the cache. Invoice and StockCode mix numbers and text in the
+# workbook ('C489449', '85123A'), so both are stored as strings.
+DTYPES = {
+    'Invoice': 'string',
+    'StockCode': 'string',
+    'Description': 'string',
+    'Quantity': 'int64',
+    'Price': 'float64',
+    'Customer ID': 'float64',
+    'Country': 'string',
+}
+
+
+def workbook_hash(path, chunk_bytes: int = 1 << 20) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_bytes):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_sheet(path, sheet_name: str) -> pd.DataFrame:
+    """One sheet with openpyxl's streaming read-only parser (no styles, no cell objects)."""
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb[sheet_name].iter_rows(values_only=True)
+        header = next(rows)
+        frame = pd.DataFrame(list(rows), columns=header)
+    finally:
+        wb.close()
+    return _typed(frame)
+
+
+def _typed(frame: pd.DataFrame) -> pd.DataFrame:
+    frame = frame.dropna(how='all')
+    frame['InvoiceDate'] = pd.to_datetime(frame['InvoiceDate'])
+    return frame.astype({col: dtype for col, dtype in DTYPES.items() if col in frame})
+
+
+def _pool_context():
+    """Fork only: ltv_cohort.py runs at import time, so spawned workers would re-run it."""
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def retail_cache(path='online_retail_II.xlsx', sheets=SHEETS, cache_dir='.cache',
+                 parallel: bool = True) -> Path:
+    """Path of the workbook's Parquet cache, parsing the workbook first on a miss.
+
+    The cache file name carries the workbook's content hash, so editing or
+    replacing the workbook forces a re-parse. On a miss every sheet is
+    parsed in its own process (fork platforms; sequential elsewhere).
+    """
+    path = Path(path)
+    cache_dir = Path(cache_dir)
+    cache = cache_dir / f"{path.stem}-{workbook_hash(path)}.parquet"
+    if cache.exists():
+        return cache
+
+    ctx = _pool_context() if parallel and len(sheets) > 1 else None
+    if ctx is not None:
+        with ProcessPoolExecutor(max_workers=len(sheets), mp_context=ctx) as pool:
+            frames = list(pool.map(read_sheet, [path] * len(sheets), sheets))
+    else:
+        frames = [read_sheet(path, sheet) for sheet in sheets]
+    df = pd.concat(frames, ignore_index=True)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    for stale in cache_dir.glob(f"{path.stem}-*.parquet"):
+        stale.unlink()
+    tmp = cache.with_suffix('.tmp')
+    df.to_parquet(tmp, index=False)
+    tmp.replace(cache)
+    return cache
+
+
+def load_retail(path='online_retail_II.xlsx', sheets=SHEETS, cache_dir='.cache',
+                parallel: bool = True) -> pd.DataFrame:
+    """All sheets of the workbook as one typed frame, via the Parquet cache (retail_cache)."""
+    return pd.read_parquet(retail_cache(path, sheets, cache_dir, parallel))
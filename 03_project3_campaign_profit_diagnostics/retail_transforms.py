@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# Cleaning rules shared by every engine (ltv_cohort.py, polars_engine.py,
+# partitioned_cohorts.py): what a usable line item is
+CANCELLED_PREFIX = 'C'               # cancelled invoices ('C489449')
+REQUIRED_COLUMNS = ['Customer ID']   # cohorts need to know the customer
+POSITIVE_COLUMNS = ['Quantity', 'Price']
+
+ORDER_KEYS = ['Invoice', 'Customer ID', 'InvoiceDate', 'Country']
+
+
+def clean_lines(df: pd.DataFrame) -> pd.DataFrame:
+    """Usable line items with integer Customer ID and a revenue column."""
+    # Step 1: Remove cancelled orders (Invoice starting with C)
+    # In Shopify these would be refunded or cancelled orders
+    df = df[~df['Invoice'].astype(str).str.startswith(CANCELLED_PREFIX)]
+
+    # Step 2: Remove rows with missing Customer ID
+    # You cannot do cohort analysis without knowing who the customer is
+    df = df.dropna(subset=REQUIRED_COLUMNS)
+
+    # Steps 3-4: Remove negative quantities (returns/adjustments) and zero or
+    # negative prices
+    for column in POSITIVE_COLUMNS:
+        df = df[df[column] > 0]
+
+    # Step 5: Convert Customer ID to integer
+    df['Customer ID'] = df['Customer ID'].astype(int)
+
+    # Step 6: Parse invoice date
+    df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'])
+
+    # Step 7: Calculate revenue per line item
+    df['revenue'] = df['Quantity'] * df['Price']
+    return df
+
+
+def order_level(lines: pd.DataFrame) -> pd.DataFrame:
+    """Collapse line items into one row per order."""
+    return lines.groupby(ORDER_KEYS).agg(
+        order_revenue=('revenue', 'sum'),
+        items_purchased=('Quantity', 'sum'),
+        unique_products=('StockCode', 'nunique')
+    ).reset_index()
+
+
+def group_revenue(revenue, codes) -> np.ndarray:
+    """Revenue summed per integer group code 0..n-1, by pandas' groupby sum.
+
+    For engines that find the groups themselves: the values are added in
+    row order within each group exactly as order_level's groupby adds them,
+    so the sums are bit-identical.
+    """
+    return pd.Series(revenue).groupby(np.asarray(codes)).sum().to_numpy()
+
+
+def customer_level(orders: pd.DataFrame) -> pd.DataFrame:
+    """Total revenue, orders, AOV and first / last purchase per customer."""
+    customers = orders.groupby('Customer ID').agg(
+        total_revenue=('order_revenue', 'sum'),
+        total_orders=('Invoice', 'nunique'),
+        avg_order_value=('order_revenue', 'mean'),
+        first_purchase=('InvoiceDate', 'min'),
+        last_purchase=('InvoiceDate', 'max')
+    ).reset_index()
+    return finish_customer_level(customers)
+
+
+def finish_customer_level(customers: pd.DataFrame) -> pd.DataFrame:
+    """Round revenue to cents and add the customer lifetime in days."""
+    customers['avg_order_value'] = customers['avg_order_value'].round(2)
+    customers['total_revenue'] = customers['total_revenue'].round(2)
+    customers['customer_lifetime_days'] = (
+        customers['last_purchase'] - customers['first_purchase']
+    ).dt.days
+    return customers
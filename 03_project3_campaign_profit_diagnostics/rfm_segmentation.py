@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+VALUE_SEGMENTS = np.array(['Low Value', 'Mid Value', 'High Value'], dtype=object)
+
+# Classic RFM map: recency score (rows, 1-5) x mean of frequency and
+# monetary scores (columns, 1-5) -> segment name
+RFM_SEGMENTS = np.array([
+    # FM:  1              2              3                     4                     5
+    ['Lost',          'Lost',        'Hibernating',        "Can't Lose Them",    "Can't Lose Them"],  # R=1
+    ['Lost',          'Hibernating', 'At Risk',            'At Risk',            "Can't Lose Them"],  # R=2
+    ['About To Sleep', 'About To Sleep', 'Need Attention', 'Loyal Customers',    'Loyal Customers'],  # R=3
+    ['Promising',     'Potential Loyalist', 'Potential Loyalist', 'Loyal Customers', 'Champions'],    # R=4
+    ['New Customers', 'Potential Loyalist', 'Potential Loyalist', 'Champions',   'Champions'],        # R=5
+], dtype=object)
+SEGMENT_NAMES = ['Champions', 'Loyal Customers', 'Potential Loyalist', 'New Customers',
+                 'Promising', 'Need Attention', 'About To Sleep', 'At Risk',
+                 "Can't Lose Them", 'Hibernating', 'Lost']
+_SEGMENT_CODES = pd.Index(SEGMENT_NAMES).get_indexer(RFM_SEGMENTS.ravel()).reshape(RFM_SEGMENTS.shape)
+
+
+def value_segment(revenue, edges=None) -> np.ndarray:
+    """High / Mid / Low Value at the 75th / 25th revenue percentiles.
+
+    Same rule as the old per-row segment_customer (revenue >= q75 is High,
+    >= q25 Mid), with the two quantiles computed once. edges overrides them
+    with precomputed (q25, q75), e.g. from a merged quantile sketch.
+    """
+    revenue = np.asarray(revenue, dtype=float)
+    if edges is None:
+        edges = np.quantile(revenue, [0.25, 0.75])
+    return VALUE_SEGMENTS[np.searchsorted(edges, revenue, side='right')]
+
+
+def _summarize(values: np.ndarray, max_points: int):
+    """Sorted values as at most max_points weighted points (mean, count, min)."""
+    values = np.sort(values)
+    uniq, start, counts = np.unique(values, return_index=True, return_counts=True)
+    if len(uniq) <= max_points:
+        return uniq, counts.astype(float), uniq
+    # Equal-count chunks of the sorted data
+    bounds = np.linspace(0, len(values), max_points + 1).astype(np.int64)[:-1]
+    bounds = np.unique(bounds)
+    counts = np.diff(np.append(bounds, len(values))).astype(float)
+    means = np.add.reduceat(values, bounds) / counts
+    return means, counts, values[bounds]
+
+
+def jenks_breaks(values, n_bins: int, max_points: int = 512) -> np.ndarray:
+    """Fisher-Jenks natural breaks (minimum within-class squared deviation).
+
+    Exact dynamic programme over the distinct values, or over max_points
+    equal-count summary points when there are more distinct values, so cost
+    is O(n log n + n_bins * max_points^2) whatever the number of customers.
+    Returns the n_bins - 1 lower edges of classes 2..n_bins.
+    """
+    x, w, lows = _summarize(np.asarray(values, dtype=float), max_points)
+    m = len(x)
+    n_bins = min(n_bins, m)
+    if n_bins < 2:
+        return np.array([])
+    cw = np.concatenate([[0], np.cumsum(w)])
+    cx = np.concatenate([[0], np.cumsum(w * x)])
+    cxx = np.concatenate([[0], np.cumsum(w * x * x)])
+    i, j = np.triu_indices(m)
+    # cost[i, j]: squared deviation of points i..j as one class
+    cost = np.full((m, m), np.inf)
+    sw = cw[j + 1] - cw[i]
+    sx = cx[j + 1] - cx[i]
+    cost[i, j] = (cxx[j + 1] - cxx[i]) - sx * sx / sw
+
+    best = cost[0].copy()          # best[j]: points 0..j in c classes
+    start = np.zeros((n_bins, m), dtype=np.int64)
+    for c in range(1, n_bins):
+        # class c covers points i..j, earlier classes cover 0..i-1
+        total = np.full((m, m), np.inf)
+        total[1:] = best[:-1, None] + cost[1:]
+        start[c] = total.argmin(axis=0)
+        best = total.min(axis=0)
+
+    edges, j = [], m - 1
+    for c in range(n_bins - 1, 0, -1):
+        i = start[c, j]
+        edges.append(lows[i])
+        j = i - 1
+    return np.array(edges[::-1])
+
+
+def breakpoints(values, n_bins: int = 5, method: str = 'quantile') -> np.ndarray:
+    """Inner bin edges for scoring: 'quantile' (equal-count) or 'jenks'."""
+    values = np.asarray(values, dtype=float)
+    if method == 'quantile':
+        return np.unique(np.quantile(values, np.arange(1, n_bins) / n_bins))
+    if method == 'jenks':
+        return jenks_breaks(values, n_bins)
+    raise ValueError(f"Unknown breakpoint method: {method!r}")
+
+
+def score(values, edges: np.ndarray, reverse: bool = False) -> np.ndarray:
+    """1..len(edges)+1 by bin; reverse=True gives the lowest values the top score.
+
+    A value equal to an edge goes to the bin above it, so an edge at the
+    minimum would leave the bottom bin empty: drop those first (_occupied).
+    """
+    bins = np.searchsorted(edges, np.asarray(values, dtype=float), side='right')
+    if reverse:
+        bins = len(edges) - bins
+    return (bins + 1).astype(np.int8)
+
+
+def _occupied(edges: np.ndarray, values) -> np.ndarray:
+    """Edges above the smallest value, so that the lowest bin is never empty.
+
+    Quantile edges tie at the minimum when a quarter or more of the
+    customers share it (every one-order customer in frequency).
+    """
+    values = np.asarray(values, dtype=float)
+    edges = np.asarray(edges, dtype=float)
+    return edges[edges > values.min()] if values.size else edges
+
+
+def _to_five(scores: np.ndarray, n_bins: int) -> np.ndarray:
+    """Rescale 1..n_bins scores onto the 1-5 grid of RFM_SEGMENTS."""
+    if n_bins < 2:
+        return np.full(len(scores), 3, dtype=np.int64)
+    return np.rint(1 + (scores - 1) * 4 / (n_bins - 1)).astype(np.int64)
+
+
+def rfm_scores(recency_days, frequency, monetary, n_bins: int = 5,
+               method: str = 'quantile', edges=None) -> pd.DataFrame:
+    """Recency / frequency / monetary scores and named segments, for whole arrays.
+
+    Breakpoints are computed once per dimension and every customer is scored
+    with one searchsorted. rfm_score is R*100 + F*10 + M (e.g. 545). Ties can
+    leave fewer than n_bins bins (most customers order once, and all of them
+    score F=1); scores run 1..bins used and are rescaled onto 1-5 before the
+    segment lookup, so the lowest value maps to 1, the highest to 5, and the
+    map holds for any n_bins.
+    rfm_segment is categorical, ordered best (Champions) to worst (Lost).
+    edges: precomputed (recency, frequency, monetary) inner edges, in place
+    of breakpoints() over the arrays.
+    """
+    if not 2 <= n_bins <= 9:
+        raise ValueError("n_bins must be between 2 and 9")
+    if edges is None:
+        edges = [breakpoints(recency_days, n_bins, method),
+                 breakpoints(frequency, n_bins, method),
+                 breakpoints(monetary, n_bins, method)]
+    edges = [_occupied(e, v) for e, v in zip(edges, (recency_days, frequency, monetary))]
+    r = score(recency_days, edges[0], reverse=True)
+    f = score(frequency, edges[1])
+    m = score(monetary, edges[2])
+
+    r5 = _to_five(r, len(edges[0]) + 1)
+    fm5 = (_to_five(f, len(edges[1]) + 1) + _to_five(m, len(edges[2]) + 1)) // 2
+    return pd.DataFrame({
+        'r_score': r,
+        'f_score': f,
+        'm_score': m,
+        'rfm_score': r.astype(np.int16) * 100 + f * 10 + m,
+        'rfm_segment': pd.Categorical.from_codes(_SEGMENT_CODES[r5 - 1, fm5 - 1],
+                                                 categories=SEGMENT_NAMES),
+    })
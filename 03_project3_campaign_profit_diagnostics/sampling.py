@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from cohort_engine import CohortMatrices, build_cohorts
+
+
+def customer_hash(customer, salt: int = 0) -> np.ndarray:
+    """Uniform [0, 1) value per customer id (splitmix64), stable across runs and machines."""
+    with np.errstate(over='ignore'):
+        z = np.asarray(customer, dtype=np.int64).astype(np.uint64) + np.uint64(salt) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+@dataclass
+class CustomerSample:
+    """Customers sampled within each cohort, with the cohort population sizes."""
+    customer_ids: np.ndarray   # sorted sampled ids
+    cohorts: np.ndarray        # month_index() of each stratum
+    population: np.ndarray     # customers per stratum (N)
+    sampled: np.ndarray        # sampled customers per stratum (n)
+
+    def contains(self, customer) -> np.ndarray:
+        customer = np.asarray(customer, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.customer_ids, customer), len(self.customer_ids) - 1)
+        return self.customer_ids[pos] == customer
+
+    @property
+    def weights(self) -> np.ndarray:
+        """N / n per stratum: how many customers each sampled one stands for."""
+        return self.population / self.sampled
+
+
+def stratified_sample(customer, cohort, fraction: float, min_per_cohort: int = 30,
+                      salt: int = 0) -> CustomerSample:
+    """Sample customers, not rows, stratified by cohort (first-purchase month).
+
+    customer / cohort: one entry per customer. A customer is sampled when
+    customer_hash(id) < fraction, which depends on the id alone, so the
+    same customers are picked on every run and a picked customer stays
+    picked as its cohort grows. Cohorts where that picks fewer than
+    min_per_cohort customers are kept whole; their extra customers leave
+    the sample once the hash picks reach min_per_cohort.
+    """
+    customer = np.asarray(customer, dtype=np.int64)
+    cohort = np.asarray(cohort, dtype=np.int64)
+    cohorts, stratum, population = np.unique(cohort, return_inverse=True, return_counts=True)
+    picked = customer_hash(customer, salt) < fraction
+    hits = np.bincount(stratum, weights=picked, minlength=len(cohorts)).astype(np.int64)
+    whole = hits < min_per_cohort
+    keep = picked | whole[stratum]
+    sampled = np.where(whole, population, hits)
+    return CustomerSample(np.sort(customer[keep]), cohorts, population, sampled)
+
+
+@dataclass
+class SampledCohorts:
+    """Cohort matrices scaled up from a sample, with standard errors.
+
+    matrices holds population estimates (cohort sizes are exact, the other
+    cells are N / n times the sample counts); the *_se arrays are standard
+    errors of the per-customer cell values, with the finite population
+    correction since each cohort is sampled without replacement.
+    """
+    matrices: CohortMatrices
+    sampled: np.ndarray
+    retention_se: np.ndarray
+    revenue_per_customer_se: np.ndarray
+    cumulative_ltv_se: np.ndarray
+
+    def to_long(self) -> pd.DataFrame:
+        """Estimate and standard error per observed (cohort, age) cell."""
+        m = self.matrices
+        cohort, age = np.nonzero(m.customers)
+        return pd.DataFrame({
+            'cohort_month': m.cohort_months[cohort],
+            'months_since_first': age,
+            'sampled_customers': self.sampled[cohort],
+            'retention_rate': m.retention[cohort, age],
+            'retention_se': self.retention_se[cohort, age],
+            'revenue_per_customer': m.revenue_per_customer[cohort, age],
+            'revenue_per_customer_se': self.revenue_per_customer_se[cohort, age],
+            'cumulative_ltv': m.cumulative_ltv[cohort, age],
+            'cumulative_ltv_se': self.cumulative_ltv_se[cohort, age],
+        })
+
+
+def _mean_se(total, total_sq, n, fpc):
+    """Standard error of a sample mean from the sum and sum of squares."""
+    mean = total / n
+    var = np.maximum(total_sq - n * mean * mean, 0) / np.maximum(n - 1, 1)
+    return np.sqrt(var / n * fpc)
+
+
+def estimate_cohorts(sample: CustomerSample, customer, order_month, revenue):
+    """Cohort matrices for the sampled customers' orders, scaled to the population.
+
+    One row per sampled order; returns (sampled_cohorts, cohort_of_order,
+    age_of_order) like cohort_engine.build_cohorts. Per-customer revenue at each age is summed
+    from (customer, age) pairs; sums of squares give the standard errors,
+    and for cumulative LTV each customer's running total enters the sum of
+    squares from the age it changes onwards (a difference array cumsummed
+    over ages).
+    """
+    matrices, cohort_month, age = build_cohorts(customer, order_month, revenue)
+    shape = matrices.customers.shape
+    rows = np.searchsorted(sample.cohorts, matrices.first_month + np.arange(shape[0]))
+    rows = np.minimum(rows, len(sample.cohorts) - 1)
+    has_stratum = sample.cohorts[rows] == matrices.first_month + np.arange(shape[0])
+    n = np.where(has_stratum, sample.sampled[rows], 0).astype(float)[:, None]
+    population = np.where(has_stratum, sample.population[rows], 0).astype(float)[:, None]
+    fpc = np.where(population > 0, 1 - n / np.maximum(population, 1), 0)
+
+    # Revenue per (customer, age), sorted by customer then age
+    codes, _ = pd.factorize(np.asarray(customer))
+    pair, pair_of = np.unique(codes.astype(np.int64) * shape[1] + age, return_inverse=True)
+    pair_revenue = np.bincount(pair_of, weights=revenue)
+    pair_customer = pair // shape[1]
+    pair_age = pair % shape[1]
+    first = np.zeros(pair_customer.max() + 1 if len(pair) else 0, dtype=np.int64)
+    first[codes] = cohort_month - matrices.first_month
+    cell = first[pair_customer] * shape[1] + pair_age
+    size = shape[0] * shape[1]
+    revenue_sq = np.bincount(cell, weights=pair_revenue ** 2, minlength=size).reshape(shape)
+
+    running = np.cumsum(pair_revenue)
+    new_customer = np.insert(pair_customer[1:] != pair_customer[:-1], 0, True)
+    run_start = np.maximum.accumulate(np.where(new_customer, np.arange(len(pair)), 0))
+    running -= (running - pair_revenue)[run_start]
+    previous = np.where(new_customer, 0.0, np.roll(running, 1))
+    step = np.bincount(cell, weights=running ** 2 - previous ** 2, minlength=size).reshape(shape)
+    cumulative_sq = np.cumsum(step, axis=1)
+
+    p = matrices.customers / np.maximum(n, 1)
+    retention_se = np.sqrt(p * (1 - p) / np.maximum(n - 1, 1) * fpc) * 100
+    revenue_se = _mean_se(matrices.revenue, revenue_sq, np.maximum(n, 1), fpc)
+    cumulative_se = _mean_se(np.cumsum(matrices.revenue, axis=1), cumulative_sq, np.maximum(n, 1), fpc)
+
+    weight = np.divide(population, n, out=np.zeros_like(n), where=n > 0)
+    scaled = CohortMatrices(matrices.first_month, matrices.customers * weight,
+                            matrices.revenue * weight, matrices.orders * weight)
+    estimates = SampledCohorts(scaled, n.ravel().astype(np.int64), retention_se, revenue_se, cumulative_se)
+    return estimates, cohort_month, age
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from cohort_engine import month_index
+
+GRANULARITIES = {'D': 'day', 'W': 'week', 'M': 'month'}
+
+
+def period_index(dates, granularity: str = 'M') -> np.ndarray:
+    """Dates as int periods since 1970: days, Monday-start weeks, or months."""
+    if granularity == 'M':
+        return month_index(dates).astype(np.int64)
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    if granularity == 'D':
+        return days
+    if granularity == 'W':
+        # 1970-01-01 was a Thursday; shift so weeks start on Monday
+        return (days + 3) // 7
+    raise ValueError(f"Unknown granularity: {granularity!r} (use one of {list(GRANULARITIES)})")
+
+
+def period_start(periods, granularity: str = 'M') -> pd.DatetimeIndex:
+    """First day of each period from period_index()."""
+    periods = np.asarray(periods, dtype=np.int64)
+    if granularity == 'M':
+        return pd.DatetimeIndex(periods.astype('datetime64[M]').astype('datetime64[ns]'))
+    days = periods * 7 - 3 if granularity == 'W' else periods
+    return pd.DatetimeIndex(days.astype('datetime64[D]').astype('datetime64[ns]'))
+
+
+def _scale_rows(matrix: sparse.csr_matrix, factor: np.ndarray) -> sparse.csr_matrix:
+    return sparse.diags(factor).dot(matrix).tocsr()
+
+
+def _row_cumsum(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Running total along each row, stored only where the row has entries.
+
+    Between stored entries the running total is unchanged, so the dense
+    value at any age is the last stored entry at or before it.
+    """
+    matrix = matrix.tocsr()
+    matrix.sort_indices()
+    totals = np.cumsum(matrix.data)
+    row_start = np.repeat(matrix.indptr[:-1], np.diff(matrix.indptr))
+    before = np.concatenate([[0.0], totals])[row_start]
+    return sparse.csr_matrix((totals - before, matrix.indices, matrix.indptr), shape=matrix.shape)
+
+
+@dataclass
+class SparseCohorts:
+    """Cohort x age matrices at day, week or month granularity, as CSR.
+
+    Row i is the cohort whose first order fell in period first_period + i,
+    column j is j periods since that first order. Only cells with orders are
+    stored; last_period marks the data end, so cells beyond it are unobserved
+    rather than zero.
+    """
+    granularity: str
+    first_period: int
+    last_period: int
+    customers: sparse.csr_matrix  # distinct active customers per cell
+    revenue: sparse.csr_matrix
+    orders: sparse.csr_matrix
+
+    @property
+    def cohort_size(self) -> np.ndarray:
+        return self.customers[:, 0].toarray().ravel()
+
+    @property
+    def cohort_starts(self) -> pd.DatetimeIndex:
+        return period_start(self.first_period + np.arange(self.customers.shape[0]), self.granularity)
+
+    def _per_customer(self, matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+        size = self.cohort_size.astype(float)
+        return _scale_rows(matrix, np.divide(1.0, size, out=np.zeros_like(size), where=size > 0))
+
+    @property
+    def retention(self) -> sparse.csr_matrix:
+        """Active customers / cohort size, in percent."""
+        return self._per_customer(self.customers) * 100
+
+    @property
+    def revenue_per_customer(self) -> sparse.csr_matrix:
+        return self._per_customer(self.revenue)
+
+    @property
+    def cumulative_ltv(self) -> sparse.csr_matrix:
+        """Cumulative revenue per customer, stored at the ages with revenue (see window(fill=True))."""
+        return _row_cumsum(self.revenue_per_customer)
+
+    def window(self, values: sparse.csr_matrix, start=None, end=None, max_age: int | None = None,
+               fill: bool = False) -> pd.DataFrame:
+        """Densify cohorts starting in [start, end] and ages 0..max_age only.
+
+        Empty cohorts are dropped and cells past the data end are NaN.
+        fill=True carries each row's last stored value forward, which turns
+        cumulative_ltv into the full running total.
+        """
+        starts = self.cohort_starts
+        rows = np.flatnonzero(self.cohort_size > 0)
+        if start is not None:
+            rows = rows[starts[rows] >= pd.Timestamp(start)]
+        if end is not None:
+            rows = rows[starts[rows] <= pd.Timestamp(end)]
+        n_ages = self.customers.shape[1] if max_age is None else min(max_age + 1, self.customers.shape[1])
+
+        block = values[rows][:, :n_ages]
+        if fill:
+            block = block.tocoo()
+            dense = np.full((len(rows), n_ages), np.nan)
+            dense[:, 0] = 0.0
+            dense[block.row, block.col] = block.data
+            dense = pd.DataFrame(dense).ffill(axis=1).to_numpy(copy=True)
+        else:
+            dense = block.toarray().astype(float)
+        ages = np.arange(n_ages)
+        observed = (self.first_period + rows)[:, None] + ages[None, :] <= self.last_period
+        dense[~observed] = np.nan
+        return pd.DataFrame(dense, index=starts[rows].rename('cohort_start'),
+                            columns=pd.RangeIndex(n_ages, name=f'{GRANULARITIES[self.granularity]}s_since_first'))
+
+
+def build_sparse_cohorts(customer, order_date, revenue, granularity: str = 'M'):
+    """Sparse cohort matrices from one row per order.
+
+    Returns (matrices, cohort_period, age) like cohort_engine.build_cohorts.
+    Storage grows with the number of occupied (cohort, age) cells, not with
+    cohorts x ages, so daily cohorts over years of data stay small.
+    """
+    period = period_index(order_date, granularity)
+    codes, _ = pd.factorize(np.asarray(customer))
+    n_customers = int(codes.max()) + 1 if len(codes) else 0
+    first = np.full(n_customers, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first, codes, period)
+    first_period = int(first.min()) if n_customers else 0
+    last_period = int(period.max()) if len(period) else 0
+    cohort = first[codes] - first_period
+    age = period - first[codes]
+    shape = (int(cohort.max()) + 1 if len(cohort) else 0, last_period - first_period + 1)
+
+    # Duplicate (cohort, age) entries are summed by the COO -> CSR conversion
+    revenue_m = sparse.coo_matrix((np.asarray(revenue, dtype=float), (cohort, age)), shape=shape).tocsr()
+    orders_m = sparse.coo_matrix((np.ones(len(cohort), dtype=np.int64), (cohort, age)), shape=shape).tocsr()
+
+    # Distinct (customer, age) pairs; hash-based, order does not matter for COO
+    pair = pd.unique(codes.astype(np.int64) * shape[1] + age)
+    pair_customer, pair_age = np.divmod(pair, shape[1])
+    customers_m = sparse.coo_matrix(
+        (np.ones(len(pair), dtype=np.int64), (first[pair_customer] - first_period, pair_age)),
+        shape=shape).tocsr()
+
+    matrices = SparseCohorts(granularity, first_period, last_period, customers_m, revenue_m, orders_m)
+    return matrices, cohort + first_period, age
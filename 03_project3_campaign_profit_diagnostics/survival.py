@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from cohort_engine import month_index
+
+
+def purchase_gaps(customer, order_date):
+    """Days from each order to the same customer's next order.
+
+    Orders are sorted by (customer, date) once and differenced; the last
+    order of each customer has no next order (NaN). Returns (order, gap_days,
+    is_first) in sorted order, where order indexes the input rows.
+    """
+    codes, _ = pd.factorize(np.asarray(customer))
+    dates = np.asarray(order_date, dtype='datetime64[ns]')
+    order = np.lexsort((dates, codes))
+    codes, dates = codes[order], dates[order]
+    same_next = np.append(codes[1:] == codes[:-1], False)
+    gap = np.full(len(order), np.nan)
+    gap[:-1] = (dates[1:] - dates[:-1]) / np.timedelta64(1, 'D')
+    gap[~same_next] = np.nan
+    is_first = np.insert(codes[1:] != codes[:-1], 0, True) if len(codes) else np.zeros(0, bool)
+    return order, gap, is_first
+
+
+def time_to_second_purchase(customer, order_date, end_date=None) -> pd.DataFrame:
+    """Per customer: first purchase day, days to the next purchase day, and whether it happened.
+
+    Purchases are counted per calendar day, so a second invoice on the day
+    of the first order is not a repeat purchase. Customers without a second
+    purchase day are right-censored at end_date (default: the last order in
+    the data): their duration is the days observed so far and event is False.
+    """
+    customer = np.asarray(customer)
+    dates = np.asarray(order_date, dtype='datetime64[D]').astype('datetime64[ns]')
+    order, gap, is_first = purchase_gaps(customer, dates)
+    # Same-day orders sort together; skip to each customer's next purchase day
+    next_gap = np.where(gap == 0, np.nan, gap)
+    day_change = np.flatnonzero(~(gap == 0))
+    gap = next_gap[day_change[np.searchsorted(day_change, np.arange(len(gap)))]]
+    end = (np.asarray(order_date, dtype='datetime64[ns]').max() if end_date is None
+           else np.datetime64(pd.Timestamp(end_date), 'ns'))
+    first = dates[order][is_first]
+    gap = gap[is_first]
+    event = ~np.isnan(gap)
+    observed = (end - first) / np.timedelta64(1, 'D')
+    return pd.DataFrame({
+        'customer': customer[order][is_first],
+        'first_purchase': first,
+        'duration_days': np.floor(np.where(event, gap, observed)).astype(np.int64),
+        'event': event,
+    })
+
+
+def kaplan_meier(duration, event, group) -> pd.DataFrame:
+    """Kaplan-Meier survival curves for every group in one vectorized pass.
+
+    Rows are sorted by (group, duration) and collapsed to one row per
+    distinct (group, time) with events and removals; at-risk counts come
+    from removals cumulated within each group, and S(t) = prod(1 - d/n) is
+    a within-group cumulative sum of log(1 - d/n). Returns one row per
+    (group, time) with at_risk, events, censored and survival.
+    """
+    duration = np.asarray(duration, dtype=np.int64)
+    event = np.asarray(event, dtype=bool)
+    group_codes, groups = pd.factorize(np.asarray(group), sort=True)
+    if len(duration) == 0:
+        return pd.DataFrame(columns=['group', 'time', 'at_risk', 'events', 'censored', 'survival'])
+
+    span = int(duration.max()) + 1
+    key = group_codes.astype(np.int64) * span + duration
+    cells, cell_of = np.unique(key, return_inverse=True)
+    removed = np.bincount(cell_of).astype(np.int64)
+    events = np.bincount(cell_of, weights=event).astype(np.int64)
+    cell_group, time = np.divmod(cells, span)
+
+    # Customers removed before each time within the group
+    group_size = np.bincount(group_codes, minlength=len(groups))
+    start = np.flatnonzero(np.insert(cell_group[1:] != cell_group[:-1], 0, True))
+    seg = np.repeat(np.arange(len(start)), np.diff(np.append(start, len(cells))))
+    removed_before = np.cumsum(removed) - removed
+    at_risk = group_size[cell_group] - (removed_before - removed_before[start][seg])
+
+    hazard = events / at_risk
+    wiped = hazard >= 1  # everyone left had the event: S drops to 0
+    log_s = np.cumsum(np.where(wiped, 0.0, np.log1p(-np.minimum(hazard, 1 - 1e-12))))
+    log_s -= np.concatenate([[0.0], log_s])[start][seg]
+    zeroed = np.cumsum(wiped)
+    zeroed -= np.concatenate([[0], zeroed])[start][seg]
+    survival = np.where(zeroed > 0, 0.0, np.exp(log_s))
+
+    return pd.DataFrame({
+        'group': groups[cell_group],
+        'time': time,
+        'at_risk': at_risk,
+        'events': events,
+        'censored': removed - events,
+        'survival': survival,
+    })
+
+
+def survival_at(curves: pd.DataFrame, times) -> pd.DataFrame:
+    """S(t) per group at each of times (step function), plus the median time.
+
+    The median is the first time S(t) <= 0.5, NaN when a group never gets there.
+    """
+    groups, group_of = np.unique(curves['group'].to_numpy(), return_inverse=True)
+    time = curves['time'].to_numpy()
+    survival = curves['survival'].to_numpy()
+    span = int(max(time.max(), max(times))) + 1
+    key = group_of.astype(np.int64) * span + time
+
+    out = pd.DataFrame(index=pd.Index(groups, name='group'))
+    for t in times:
+        # Last curve row at or before t in each group; S = 1 before the first event
+        pos = np.searchsorted(key, np.arange(len(groups)) * span + t, side='right') - 1
+        valid = (pos >= 0) & (group_of[np.maximum(pos, 0)] == np.arange(len(groups)))
+        out[f'survival_{t}d'] = np.where(valid, survival[np.maximum(pos, 0)], 1.0)
+
+    median = np.full(len(groups), np.nan)
+    below = np.flatnonzero(survival <= 0.5)
+    g, first = np.unique(group_of[below], return_index=True)
+    median[g] = time[below[first]]
+    out['median_days'] = median
+    return out
+
+
+def repeat_purchase_survival(customer, order_date, end_date=None,
+                             times=(30, 60, 90, 180, 365)):
+    """Time to second purchase by first-purchase month (cohort).
+
+    Returns (curves, table): the long Kaplan-Meier curves for all cohorts and
+    a cohort table with customers, repeat buyers, S(t) at times (share still
+    without a second order) and the median days to a second order.
+    """
+    ttsp = time_to_second_purchase(customer, order_date, end_date)
+    cohort = month_index(ttsp['first_purchase'])
+    curves = kaplan_meier(ttsp['duration_days'], ttsp['event'], cohort)
+    table = survival_at(curves, times)
+    counts = ttsp.groupby(cohort).agg(customers=('event', 'size'), repeat_customers=('event', 'sum'),
+                                      follow_up=('duration_days', 'max'))
+    # A cohort observed for less than t days has no S(t) yet
+    for t in times:
+        table.loc[counts['follow_up'].to_numpy() < t, f'survival_{t}d'] = np.nan
+    table.insert(0, 'customers', counts['customers'].to_numpy())
+    table.insert(1, 'repeat_customers', counts['repeat_customers'].to_numpy())
+    table.index = pd.PeriodIndex.from_ordinals(table.index.to_numpy(), freq='M').rename('cohort_month')
+
+    curves['group'] = pd.PeriodIndex.from_ordinals(curves['group'].to_numpy(), freq='M')
+    curves = curves.rename(columns={'group': 'cohort_month'})
+    return curves, table.round(4).reset_index()
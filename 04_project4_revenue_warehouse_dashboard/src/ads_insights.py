@@ -0,0 +1,426 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import email.utils
+import json
+import os
+import random
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import aiohttp
+import pandas as pd
+
+# Daily ad-level insights from the Meta Graph API and the Google Ads REST API,
+# normalized to one schema and written as Parquet per platform / month / account.
+COLUMNS = ["date", "platform", "account_id", "campaign_id", "campaign_name", "ad_id",
+           "impressions", "clicks", "conversions", "spend"]
+
+# Graph API throttling arrives as HTTP 400 with one of these error codes
+META_THROTTLE_CODES = {4, 17, 32, 613, 80000, 80004}
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str, retryable: bool, retry_after: float | None = None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class Account:
+    platform: str  # 'meta' or 'google'
+    account_id: str
+
+
+class RateLimiter:
+    """Token bucket: `rate` requests per second with bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# ── PLATFORM ADAPTERS ──────────────────────────────────────
+
+class MetaInsights:
+    """GET /act_{id}/insights?level=ad&time_increment=1, paged with `after` cursors."""
+    platform = "meta"
+
+    def __init__(self, base_url: str, version: str = "v19.0", page_size: int = 500):
+        self.base_url = base_url.rstrip("/")
+        self.version = version
+        self.page_size = page_size
+        self.token = os.environ.get("META_ACCESS_TOKEN", "")
+
+    def first_request(self, account: Account, since: date, until: date) -> dict:
+        return {
+            "method": "GET",
+            "url": f"{self.base_url}/{self.version}/act_{account.account_id}/insights",
+            "params": {
+                "level": "ad",
+                "time_increment": "1",
+                "fields": "account_id,campaign_id,campaign_name,ad_id,impressions,clicks,spend,actions",
+                "time_range": json.dumps({"since": since.isoformat(), "until": until.isoformat()}),
+                "limit": str(self.page_size),
+                "access_token": self.token,
+            },
+        }
+
+    def parse(self, account: Account, payload: dict, request: dict):
+        rows = [{
+            "date": item["date_start"],
+            "campaign_id": item["campaign_id"],
+            "campaign_name": item.get("campaign_name"),
+            "ad_id": item["ad_id"],
+            "impressions": item.get("impressions", 0),
+            "clicks": item.get("clicks", 0),
+            "conversions": sum(float(a["value"]) for a in item.get("actions", [])
+                               if a.get("action_type") == "purchase"),
+            "spend": item.get("spend", 0),
+        } for item in payload.get("data", [])]
+        paging = payload.get("paging", {})
+        if "next" not in paging:
+            return rows, None
+        params = dict(request["params"], after=paging["cursors"]["after"])
+        return rows, dict(request, params=params)
+
+    def check_error(self, status: int, payload: dict) -> ApiError | None:
+        error = payload.get("error") if isinstance(payload, dict) else None
+        if status < 400 and not error:
+            return None
+        code = (error or {}).get("code")
+        retryable = status >= 500 or status == 429 or code in META_THROTTLE_CODES
+        return ApiError(status, (error or {}).get("message", ""), retryable)
+
+
+class GoogleAdsInsights:
+    """POST /customers/{id}/googleAds:search with a GAQL query, paged with nextPageToken."""
+    platform = "google"
+
+    QUERY = (
+        "SELECT campaign.id, campaign.name, ad_group_ad.ad.id, segments.date, "
+        "metrics.impressions, metrics.clicks, metrics.conversions, metrics.cost_micros "
+        "FROM ad_group_ad WHERE segments.date BETWEEN '{since}' AND '{until}'"
+    )
+
+    def __init__(self, base_url: str, version: str = "v16", page_size: int = 10_000):
+        self.base_url = base_url.rstrip("/")
+        self.version = version
+        self.page_size = page_size
+        self.headers = {
+            "developer-token": os.environ.get("GOOGLE_ADS_DEVELOPER_TOKEN", ""),
+            "Authorization": f"Bearer {os.environ.get('GOOGLE_ADS_ACCESS_TOKEN', '')}",
+        }
+        login_customer = os.environ.get("GOOGLE_ADS_LOGIN_CUSTOMER_ID")
+        if login_customer:
+            self.headers["login-customer-id"] = login_customer
+
+    def first_request(self, account: Account, since: date, until: date) -> dict:
+        return {
+            "method": "POST",
+            "url": f"{self.base_url}/{self.version}/customers/{account.account_id}/googleAds:search",
+            "headers": self.headers,
+            "json": {"query": self.QUERY.format(since=since.isoformat(), until=until.isoformat()),
+                     "pageSize": self.page_size},
+        }
+
+    def parse(self, account: Account, payload: dict, request: dict):
+        rows = [{
+            "date": item["segments"]["date"],
+            "campaign_id": item["campaign"]["id"],
+            "campaign_name": item["campaign"].get("name"),
+            "ad_id": item["adGroupAd"]["ad"]["id"],
+            "impressions": item["metrics"].get("impressions", 0),
+            "clicks": item["metrics"].get("clicks", 0),
+            "conversions": item["metrics"].get("conversions", 0),
+            "spend": int(item["metrics"].get("costMicros", 0)) / 1_000_000,
+        } for item in payload.get("results", [])]
+        token = payload.get("nextPageToken")
+        if not token:
+            return rows, None
+        return rows, dict(request, json=dict(request["json"], pageToken=token))
+
+    def check_error(self, status: int, payload: dict) -> ApiError | None:
+        if status < 400:
+            return None
+        error = payload.get("error", {}) if isinstance(payload, dict) else {}
+        retryable = status in (429, 500, 502, 503, 504) or error.get("status") == "RESOURCE_EXHAUSTED"
+        return ApiError(status, error.get("message", ""), retryable)
+
+
+# ── CLIENT ─────────────────────────────────────────────────
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Retry-After as seconds (delta-seconds or an HTTP date); None when absent or unparseable."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def non_json_error(status: int) -> ApiError:
+    """A response whose body is not JSON (e.g. a proxy's HTML 502 page)."""
+    retryable = status >= 500 or status == 429
+    return ApiError(status, "response body is not JSON", retryable)
+
+
+class InsightsClient:
+    """Shared session with a global concurrency cap, per-account rate limits and retries."""
+
+    def __init__(self, session: aiohttp.ClientSession, sources: dict, max_concurrency: int = 32,
+                 account_rate: float = 5.0, max_retries: int = 6, backoff: float = 0.5):
+        self.session = session
+        self.sources = sources
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.account_rate = account_rate
+        self.limiters: dict[Account, RateLimiter] = {}
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.requests = 0
+        self.retries = 0
+
+    async def request(self, account: Account, request: dict) -> dict:
+        source = self.sources[account.platform]
+        limiter = self.limiters.setdefault(account, RateLimiter(self.account_rate))
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire()
+            try:
+                async with self.semaphore:
+                    self.requests += 1
+                    async with self.session.request(**request) as resp:
+                        status = resp.status
+                        retry_after = retry_after_seconds(resp.headers.get("Retry-After"))
+                        try:
+                            payload = await resp.json(content_type=None)
+                        except ValueError:
+                            payload = None
+                error = (source.check_error(status, payload) if payload is not None
+                         else non_json_error(status))
+                if error is None:
+                    return payload
+                error.retry_after = retry_after
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                error = ApiError(0, repr(exc), retryable=True)
+            if not error.retryable or attempt == self.max_retries:
+                raise error
+            self.retries += 1
+            # Exponential backoff with full jitter, or the server's Retry-After
+            delay = error.retry_after or self.backoff * 2 ** attempt * random.random()
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def pull_slice(self, account: Account, since: date, until: date) -> list:
+        """All pages of one account's insights for [since, until]."""
+        source = self.sources[account.platform]
+        request = source.first_request(account, since, until)
+        rows = []
+        while request is not None:
+            payload = await self.request(account, request)
+            page, request = source.parse(account, payload, request)
+            rows.extend(page)
+        return rows
+
+    async def pull_account(self, account: Account, since: date, until: date,
+                           slice_days: int = 7) -> pd.DataFrame:
+        """Pull a date window as concurrent slices; cursors are sequential only within a slice."""
+        slices = []
+        start = since
+        while start <= until:
+            end = min(start + timedelta(days=slice_days - 1), until)
+            slices.append(self.pull_slice(account, start, end))
+            start = end + timedelta(days=1)
+        rows = [row for part in await asyncio.gather(*slices) for row in part]
+        return normalize(rows, account)
+
+
+def normalize(rows: list, account: Account) -> pd.DataFrame:
+    frame = pd.DataFrame(rows, columns=[c for c in COLUMNS if c not in ("platform", "account_id")])
+    frame.insert(1, "platform", account.platform)
+    frame.insert(2, "account_id", account.account_id)
+    frame["date"] = pd.to_datetime(frame["date"])
+    for col in ["campaign_id", "campaign_name", "ad_id"]:
+        frame[col] = frame[col].astype("string")
+    for col in ["impressions", "clicks"]:
+        frame[col] = pd.to_numeric(frame[col]).astype("int64")
+    for col in ["conversions", "spend"]:
+        frame[col] = pd.to_numeric(frame[col]).astype("float64")
+    return frame[COLUMNS]
+
+
+# ── CHECKPOINTS & OUTPUT ───────────────────────────────────
+
+class Checkpoints:
+    """Last fully written date per account, persisted as JSON (atomic replace)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.state = json.loads(path.read_text()) if path.exists() else {}
+
+    @staticmethod
+    def key(account: Account) -> str:
+        return f"{account.platform}:{account.account_id}"
+
+    def get(self, account: Account) -> date | None:
+        value = self.state.get(self.key(account))
+        return date.fromisoformat(value) if value else None
+
+    def set(self, account: Account, day: date) -> None:
+        self.state[self.key(account)] = day.isoformat()
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.state, indent=2, sort_keys=True))
+        tmp.replace(self.path)
+
+
+def write_partitions(frame: pd.DataFrame, out_dir: Path, account: Account) -> int:
+    """Merge rows into {out_dir}/{platform}/month=YYYY-MM/{account}.parquet.
+
+    Dates present in `frame` replace those dates in the existing file, so
+    re-pulling a lookback window never duplicates rows.
+    """
+    written = 0
+    for month, part in frame.groupby(frame["date"].dt.strftime("%Y-%m")):
+        path = out_dir / account.platform / f"month={month}" / f"{account.account_id}.parquet"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            existing = pd.read_parquet(path)
+            part = pd.concat([existing[~existing["date"].isin(part["date"])], part])
+        part = part.sort_values(["date", "campaign_id", "ad_id"])
+        tmp = path.with_suffix(".tmp")
+        part.to_parquet(tmp, index=False)
+        tmp.replace(path)
+        written += len(part)
+    return written
+
+
+# ── RUN ────────────────────────────────────────────────────
+
+def load_accounts(path: str | None, mock_accounts: int) -> list:
+    if path:
+        accounts = pd.read_csv(path, dtype=str)
+        return [Account(p.strip().lower(), a.strip())
+                for p, a in zip(accounts["platform"], accounts["account_id"])]
+    # Half Meta, half Google, with ids the mock server accepts
+    return ([Account("meta", str(1000 + i)) for i in range(mock_accounts // 2)]
+            + [Account("google", str(1_000_000_000 + i)) for i in range(mock_accounts - mock_accounts // 2)])
+
+
+def pull_window_start(last: date | None, default_since: date, lookback_days: int) -> date:
+    """First date to pull for an account with checkpoint `last`.
+
+    A checkpointed account re-pulls the lookback_days days ending on its
+    checkpoint (last - (lookback_days - 1) onwards; with 0, the day after
+    it), however old the checkpoint is, so no day up to `until` is skipped.
+    default_since only applies to accounts that were never pulled.
+    """
+    if lookback_days < 0:
+        raise ValueError("lookback_days must be >= 0")
+    if last is None:
+        return default_since
+    return last - timedelta(days=lookback_days - 1)
+
+
+async def pull_all(accounts: list, base_url: str, out_dir: Path, checkpoints: Checkpoints,
+                   default_since: date, until: date, lookback_days: int = 3, slice_days: int = 7,
+                   max_concurrency: int = 32, account_rate: float = 5.0) -> pd.DataFrame:
+    """Pull every account from its checkpoint (minus lookback) to `until`.
+
+    Accounts run concurrently; each account's checkpoint advances only after
+    its whole window is written, so an interrupted run resumes where it
+    stopped. Returns a per-account run log.
+    """
+    sources = {"meta": MetaInsights(base_url), "google": GoogleAdsInsights(base_url)}
+    timeout = aiohttp.ClientTimeout(total=120)
+    connector = aiohttp.TCPConnector(limit=max_concurrency)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        client = InsightsClient(session, sources, max_concurrency=max_concurrency,
+                                account_rate=account_rate)
+
+        async def one(account: Account) -> dict:
+            last = checkpoints.get(account)
+            since = pull_window_start(last, default_since, lookback_days)
+            entry = {"platform": account.platform, "account_id": account.account_id,
+                     "checkpoint": last, "since": since, "until": until}
+            if since > until:
+                return {**entry, "rows": 0, "status": "up to date"}
+            try:
+                frame = await client.pull_account(account, since, until, slice_days)
+            except ApiError as exc:
+                return {**entry, "rows": 0, "status": f"failed: {exc}"}
+            await asyncio.to_thread(write_partitions, frame, out_dir, account)
+            checkpoints.set(account, until)
+            return {**entry, "rows": len(frame), "status": "ok"}
+
+        start = time.perf_counter()
+        log = pd.DataFrame(await asyncio.gather(*(one(a) for a in accounts)))
+        log.attrs.update(seconds=time.perf_counter() - start, requests=client.requests,
+                         retries=client.retries)
+    return log
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Pull daily ad insights from Meta / Google Ads into Parquet")
+    ap.add_argument("--base_url", default="http://127.0.0.1:8765",
+                    help="API root (the mock server by default; https://graph.facebook.com or "
+                         "https://googleads.googleapis.com for the real APIs)")
+    ap.add_argument("--accounts", default=None, help="CSV with platform,account_id columns")
+    ap.add_argument("--mock_accounts", type=int, default=200, help="account count when --accounts is not given")
+    ap.add_argument("--since", default=None, help="first date for accounts without a checkpoint (default: 30 days ago)")
+    ap.add_argument("--until", default=None, help="last date (default: yesterday)")
+    ap.add_argument("--lookback_days", type=int, default=3, help="re-pull this many days up to and including each checkpoint")
+    ap.add_argument("--slice_days", type=int, default=7)
+    ap.add_argument("--max_concurrency", type=int, default=32)
+    ap.add_argument("--account_rate", type=float, default=5.0, help="requests/s per account")
+    ap.add_argument("--out_dir", default="outputs/ads_insights")
+    args = ap.parse_args()
+
+    until = date.fromisoformat(args.until) if args.until else date.today() - timedelta(days=1)
+    since = date.fromisoformat(args.since) if args.since else until - timedelta(days=29)
+    out_dir = Path(args.out_dir).resolve()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    checkpoints = Checkpoints(out_dir / "_checkpoints.json")
+    accounts = load_accounts(args.accounts, args.mock_accounts)
+
+    log = asyncio.run(pull_all(accounts, args.base_url, out_dir, checkpoints, since, until,
+                               lookback_days=args.lookback_days, slice_days=args.slice_days,
+                               max_concurrency=args.max_concurrency, account_rate=args.account_rate))
+    print(log["status"].str.split(":").str[0].value_counts().to_string())
+    print(f"\nRows written: {log['rows'].sum():,} from {len(accounts)} accounts "
+          f"in {log.attrs['seconds']:.1f}s ({log.attrs['requests']:,} requests, "
+          f"{log.attrs['retries']:,} retries)")
+    failed = log[log["status"].str.startswith("failed")]
+    if not failed.empty:
+        print(failed.to_string(index=False))
+        raise SystemExit(1)
+    print(f"OK: insights at {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
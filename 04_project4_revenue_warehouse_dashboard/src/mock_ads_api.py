@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import argparse
+import base64
+import random
+import re
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from aiohttp import web
+
+# Local stand-in for the two reporting APIs ads_insights.py pulls from:
+#   GET  /{version}/act_{account}/insights          (Meta Graph API, cursor paging)
+#   POST /{version}/customers/{customer}/googleAds:search  (Google Ads REST, page tokens)
+# Numbers are deterministic per (account, date, ad); rate limits and 5xx errors
+# are injected so retries and backoff can be exercised offline.
+
+CAMPAIGNS_PER_ACCOUNT = 5
+ADS_PER_CAMPAIGN = 4
+GAQL_DATES = re.compile(r"segments\.date\s+BETWEEN\s+'(\d{4}-\d{2}-\d{2})'\s+AND\s+'(\d{4}-\d{2}-\d{2})'", re.I)
+
+
+def _encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(str(offset).encode()).decode()
+
+
+def _decode_cursor(cursor: str | None) -> int:
+    return int(base64.urlsafe_b64decode(cursor.encode()).decode()) if cursor else 0
+
+
+def daily_rows(account: str, since: date, until: date) -> list:
+    """Ad-level daily metrics for one account, ordered by date then ad."""
+    account_num = int(re.sub(r'\D', '', account) or 0)
+    n_ads = CAMPAIGNS_PER_ACCOUNT * ADS_PER_CAMPAIGN
+    rows = []
+    day = since
+    while day <= until:
+        rng = np.random.default_rng([account_num, day.toordinal()])
+        impressions = rng.integers(200, 20_000, n_ads)
+        clicks = rng.binomial(impressions, rng.uniform(0.005, 0.04, n_ads))
+        conversions = rng.binomial(clicks, rng.uniform(0.01, 0.08, n_ads))
+        spend = np.round(impressions * rng.uniform(4, 14, n_ads) / 1000, 2)
+        for i in range(n_ads):
+            campaign = i // ADS_PER_CAMPAIGN
+            rows.append({
+                'date': day.isoformat(),
+                'campaign_id': f"{account_num}{campaign:03d}",
+                'campaign_name': f"Account_{account_num}_Campaign_{campaign + 1}",
+                'ad_id': f"{account_num}{i:05d}",
+                'impressions': int(impressions[i]),
+                'clicks': int(clicks[i]),
+                'conversions': int(conversions[i]),
+                'spend': float(spend[i]),
+            })
+        day += timedelta(days=1)
+    return rows
+
+
+class MockState:
+    def __init__(self, account_rate: float, error_rate: float, seed: int):
+        self.account_rate = account_rate
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.buckets: dict[str, tuple[float, float]] = {}
+        self.requests = 0
+
+    def throttled(self, account: str) -> bool:
+        """Token bucket per account: account_rate requests/s, burst of the same size."""
+        now = time.monotonic()
+        tokens, last = self.buckets.get(account, (self.account_rate, now))
+        tokens = min(self.account_rate, tokens + (now - last) * self.account_rate)
+        if tokens < 1:
+            self.buckets[account] = (tokens, now)
+            return True
+        self.buckets[account] = (tokens - 1, now)
+        return False
+
+    def fails(self) -> bool:
+        self.requests += 1
+        return self.random.random() < self.error_rate
+
+
+async def meta_insights(request: web.Request) -> web.Response:
+    state: MockState = request.app['state']
+    account = request.match_info['account']
+    if state.throttled(account):
+        # Graph API reports throttling as a 400 with an error code, not a 429
+        return web.json_response({'error': {'message': 'User request limit reached', 'code': 17,
+                                            'type': 'OAuthException'}}, status=400)
+    if state.fails():
+        return web.json_response({'error': {'message': 'An unexpected error has occurred',
+                                            'code': 2}}, status=500)
+
+    time_range = request.query.get('time_range', '')
+    match = re.search(r'"since"\s*:\s*"([\d-]+)".*"until"\s*:\s*"([\d-]+)"', time_range)
+    if not match:
+        return web.json_response({'error': {'message': 'time_range is required', 'code': 100}},
+                                 status=400)
+    rows = daily_rows(account, date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2)))
+    limit = min(int(request.query.get('limit', 25)), 500)
+    offset = _decode_cursor(request.query.get('after'))
+    page = rows[offset:offset + limit]
+
+    data = [{
+        'account_id': account,
+        'campaign_id': row['campaign_id'],
+        'campaign_name': row['campaign_name'],
+        'ad_id': row['ad_id'],
+        'date_start': row['date'],
+        'date_stop': row['date'],
+        # Graph API returns metrics as strings
+        'impressions': str(row['impressions']),
+        'clicks': str(row['clicks']),
+        'spend': f"{row['spend']:.2f}",
+        'actions': [{'action_type': 'purchase', 'value': str(row['conversions'])}],
+    } for row in page]
+    body = {'data': data, 'paging': {'cursors': {'before': _encode_cursor(offset),
+                                                 'after': _encode_cursor(offset + len(page))}}}
+    if offset + limit < len(rows):
+        body['paging']['next'] = str(request.url.update_query({'after': _encode_cursor(offset + limit)}))
+    return web.json_response(body)
+
+
+async def google_search(request: web.Request) -> web.Response:
+    state: MockState = request.app['state']
+    customer = request.match_info['customer']
+    if state.throttled(customer):
+        return web.json_response({'error': {'code': 429, 'status': 'RESOURCE_EXHAUSTED',
+                                            'message': 'Too many requests'}},
+                                 status=429, headers={'Retry-After': '1'})
+    if state.fails():
+        return web.json_response({'error': {'code': 503, 'status': 'UNAVAILABLE',
+                                            'message': 'The service is currently unavailable'}},
+                                 status=503)
+
+    payload = await request.json()
+    match = GAQL_DATES.search(payload.get('query', ''))
+    if not match:
+        return web.json_response({'error': {'code': 400, 'status': 'INVALID_ARGUMENT',
+                                            'message': 'segments.date BETWEEN is required'}},
+                                 status=400)
+    rows = daily_rows(customer, date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2)))
+    page_size = min(int(payload.get('pageSize', 10_000)), 10_000)
+    offset = _decode_cursor(payload.get('pageToken'))
+    page = rows[offset:offset + page_size]
+
+    results = [{
+        'customer': {'id': customer},
+        'campaign': {'id': row['campaign_id'], 'name': row['campaign_name']},
+        'adGroupAd': {'ad': {'id': row['ad_id']}},
+        'segments': {'date': row['date']},
+        # int64 fields are JSON strings in the REST API; cost is in micros
+        'metrics': {'impressions': str(row['impressions']), 'clicks': str(row['clicks']),
+                    'conversions': float(row['conversions']),
+                    'costMicros': str(int(round(row['spend'] * 1_000_000)))},
+    } for row in page]
+    body = {'results': results, 'totalResultsCount': str(len(rows))}
+    if offset + page_size < len(rows):
+        body['nextPageToken'] = _encode_cursor(offset + page_size)
+    return web.json_response(body)
+
+
+def make_app(account_rate: float = 10.0, error_rate: float = 0.02, seed: int = 0) -> web.Application:
+    app = web.Application()
+    app['state'] = MockState(account_rate, error_rate, seed)
+    app.router.add_get('/{version}/act_{account}/insights', meta_insights)
+    app.router.add_post('/{version}/customers/{customer}/googleAds:search', google_search)
+    return app
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Offline mock of the Meta / Google Ads reporting APIs")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--account_rate", type=float, default=10.0, help="requests/s per account before throttling")
+    ap.add_argument("--error_rate", type=float, default=0.02, help="share of requests failing with 5xx")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    web.run_app(make_app(args.account_rate, args.error_rate, args.seed), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()